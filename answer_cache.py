@@ -0,0 +1,187 @@
+# answer_cache.py
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config import ANSWER_CACHE_PATH, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_THRESHOLD
+from query_cache import current_version
+
+
+def chunk_signature(records):
+    """Sidik jari himpunan chunk hasil retrieval (urutan tidak berpengaruh)."""
+    ids = sorted(str((r if isinstance(r, dict) else r.data()).get("chunk_id")) for r in records)
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """Cache jawaban LLM di disk (SQLite), dicari berdasarkan kemiripan embedding query.
+
+    Jawaban dipakai ulang hanya jika cosine embedding pertanyaan >= threshold DAN
+    himpunan chunk hasil retrieval sama persis, sehingga konteks prompt-nya identik.
+    Setiap entri menyimpan versi korpus; entri dari versi lama dibuang setelah
+    re-ingest. Jika jumlah entri melebihi max_entries, yang paling lama tidak
+    dipakai dihapus.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 threshold=ANSWER_CACHE_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.corpus_version = None
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                chunk_signature TEXT NOT NULL,
+                corpus_version TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_signature ON answers(chunk_signature)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used)")
+        self.conn.commit()
+
+    def _check_corpus_version(self):
+        # Dipanggil dengan lock dipegang; buang jawaban dari korpus versi lama
+        version = current_version()
+        if version != self.corpus_version:
+            deleted = self.conn.execute("DELETE FROM answers WHERE corpus_version != ?", (version,)).rowcount
+            self.conn.commit()
+            if deleted:
+                print(f"🧹 Cache jawaban: {deleted} entri dari korpus lama dihapus")
+            self.corpus_version = version
+        return version
+
+    def get(self, query_vector, records):
+        """Kembalikan jawaban tersimpan yang cocok, atau None."""
+        signature = chunk_signature(records)
+        with self.lock:
+            self._check_corpus_version()
+            rows = self.conn.execute(
+                "SELECT id, query, vector, answer FROM answers WHERE chunk_signature = ?", (signature,)
+            ).fetchall()
+            if rows:
+                matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob, _ in rows])
+                similarities = matrix @ _unit(query_vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id, cached_query, _, answer = rows[best]
+                    self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+                    self.conn.commit()
+                    self.hits += 1
+                    print(f"♻️ Jawaban diambil dari cache (mirip '{cached_query}', cosine {similarities[best]:.3f})")
+                    return answer
+            self.misses += 1
+            return None
+
+    def put(self, query_text, query_vector, records, answer):
+        with self.lock:
+            version = self._check_corpus_version()
+            self.conn.execute(
+                "INSERT INTO answers (query, vector, chunk_signature, corpus_version, answer, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (query_text, _unit(query_vector).tobytes(), chunk_signature(records), version, answer, time.time())
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM answers")
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": entries,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def load_warm_queries(path):
+    """Pertanyaan untuk pre-warm: ground_truth.json (key = pertanyaan), JSON list,
+    JSON-lines dengan field "query", atau file teks satu pertanyaan per baris."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        data = json.loads(content)
+        return list(data) if isinstance(data, (dict, list)) else []
+
+    queries = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = json.loads(line).get("query", "")
+        if line:
+            queries.append(line)
+    return queries
+
+
+def warm(path, limit=None):
+    from search import process_query, search_cache_stats
+
+    queries = list(dict.fromkeys(load_warm_queries(path)))[:limit]
+    print(f"🔥 Pre-warm cache jawaban dengan {len(queries)} pertanyaan dari {path}")
+    start = time.perf_counter()
+    for query in queries:
+        process_query(query)
+    print(f"✅ Selesai dalam {time.perf_counter() - start:.1f} detik")
+    for name, stats in search_cache_stats().items():
+        print(f"🗄️ Cache {name}: hit rate {stats['hit_rate']:.1%} ({stats['hits']} hit, {stats['misses']} miss)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kelola cache jawaban semantik")
+    parser.add_argument("--warm", metavar="PATH",
+                        help="Isi cache dari ground_truth.json atau log pertanyaan (teks/JSON-lines)")
+    parser.add_argument("--limit", type=int, default=None, help="Jumlah maksimum pertanyaan untuk pre-warm")
+    parser.add_argument("--clear", action="store_true", help="Kosongkan cache jawaban")
+    args = parser.parse_args()
+
+    if args.clear:
+        AnswerCache().clear()
+        print("🧹 Cache jawaban dikosongkan")
+    if args.warm:
+        warm(args.warm, limit=args.limit)
+    if not args.clear and not args.warm:
+        print(AnswerCache().stats())
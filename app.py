@@ -1,7 +1,7 @@
 # app.py
 
 import streamlit as st
-from search import process_query
+from search import process_query_stream
 from config import GROQ_API_KEY, GROQ_MODEL
 
 # Konfigurasi halaman
@@ -88,39 +88,45 @@ if prompt := st.chat_input("Masukkan pertanyaan Anda..."):
         st.markdown(f'<div class="user-message">{prompt}</div>', unsafe_allow_html=True)
 
     # Proses pertanyaan
-    with st.spinner("🔍 Mencari jawaban..."):
-        try:
-            answer = process_query(prompt)
-
-            if answer.startswith("❌"):
-                error_msg = answer.replace("❌", "").strip()
-                with st.chat_message("assistant", avatar="❌"):
-                    st.markdown(f'<div class="error-message">{error_msg}</div>', unsafe_allow_html=True)
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": answer,
-                    "avatar": "❌"
-                })
-                st.stop()
-
-            processed_answer = answer.replace('\n', '<br>')
-            formatted_answer = f'<div class="assistant-message">{processed_answer}</div>'
-
-            with st.chat_message("assistant", avatar="💡"):
-                st.markdown(formatted_answer, unsafe_allow_html=True)
-
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": answer,
-                "avatar": "💡"
-            })
-
-        except Exception as e:
-            error_msg = f"❌ Terjadi kesalahan sistem: {str(e)}"
+    try:
+        # Spinner hanya tampil sampai token pertama tiba; sisanya dirender bertahap
+        with st.spinner("🔍 Mencari jawaban..."):
+            stream = process_query_stream(prompt)
+            answer = next(stream, "")
+
+        if answer.startswith("❌"):
+            error_msg = answer.replace("❌", "").strip()
             with st.chat_message("assistant", avatar="❌"):
                 st.markdown(f'<div class="error-message">{error_msg}</div>', unsafe_allow_html=True)
             st.session_state.messages.append({
                 "role": "assistant",
-                "content": error_msg,
+                "content": answer,
                 "avatar": "❌"
-            })
\ No newline at end of file
+            })
+            st.stop()
+
+        with st.chat_message("assistant", avatar="💡"):
+            placeholder = st.empty()
+            processed_answer = answer.replace('\n', '<br>')
+            placeholder.markdown(f'<div class="assistant-message">{processed_answer}</div>', unsafe_allow_html=True)
+            for token in stream:
+                # Tambahkan token dulu, baru tampilkan, agar tampilan tidak tertinggal satu token
+                answer += token
+                processed_answer = answer.replace('\n', '<br>')
+                placeholder.markdown(f'<div class="assistant-message">{processed_answer}</div>', unsafe_allow_html=True)
+
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": answer,
+            "avatar": "💡"
+        })
+
+    except Exception as e:
+        error_msg = f"❌ Terjadi kesalahan sistem: {str(e)}"
+        with st.chat_message("assistant", avatar="❌"):
+            st.markdown(f'<div class="error-message">{error_msg}</div>', unsafe_allow_html=True)
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": error_msg,
+            "avatar": "❌"
+        })
\ No newline at end of file
@@ -0,0 +1,191 @@
+# approx_knn.py
+import argparse
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from config import driver, KNN_MEMORY_LIMIT_MB, KNN_WRITE_BATCH_SIZE
+from embedding_store import load_embedding_matrix
+from knn import knn_blocks, knn_block_size
+from schema import ensure_schema
+
+DEFAULT_K = 10
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_NPROBE = 8  # Jumlah list yang diperiksa: makin besar makin akurat, makin lambat
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 20_000
+
+# Relasi antar chunk, dicari lewat constraint unik Chunk.id
+CHUNK_RELATION_WRITE_QUERY = """
+UNWIND $batch AS relation
+MATCH (a:Chunk {id: relation.id_1})
+MATCH (b:Chunk {id: relation.id_2})
+MERGE (a)-[r1:RELATED_TO]->(b)
+SET r1.similarity = relation.similarity
+MERGE (b)-[r2:RELATED_TO]->(a)
+SET r2.similarity = relation.similarity
+"""
+
+CHUNK_RELATION_CLEANUP_QUERY = """
+MATCH (:Chunk)-[r:RELATED_TO]->(:Chunk)
+CALL { WITH r DELETE r } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class IVFIndex:
+    """Inverted-file index sederhana: k-means sferis membagi vektor ke n_lists list.
+
+    Tetangga sebuah vektor hanya dicari di antara anggota nprobe list yang
+    centroid-nya paling dekat dengan centroid list vektor tersebut.
+    """
+
+    def __init__(self, n_lists, iterations=KMEANS_ITERATIONS, sample_size=KMEANS_SAMPLE_SIZE, seed=0):
+        self.n_lists = n_lists
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.labels = None
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _assign(self, matrix, block_size=4096):
+        labels = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), block_size):
+            labels[start:start + block_size] = np.argmax(matrix[start:start + block_size] @ self.centroids.T, axis=1)
+        return labels
+
+    def fit(self, matrix):
+        """Latih centroid pada sampel lalu tetapkan list untuk semua vektor (matrix ternormalisasi)."""
+        n = len(matrix)
+        sample = matrix[np.sort(self.rng.choice(n, size=min(n, self.sample_size), replace=False))]
+        self.centroids = sample[self.rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=self.n_lists) == 0
+            # List kosong diisi ulang dengan titik acak agar semua centroid terpakai
+            sums[empty] = sample[self.rng.choice(len(sample), size=int(empty.sum()))]
+            self.centroids = self._normalize(sums)
+        self.labels = self._assign(matrix)
+        return self
+
+    def members(self):
+        order = np.argsort(self.labels, kind="stable")
+        bounds = np.searchsorted(self.labels[order], np.arange(self.n_lists + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+
+
+def approximate_knn(matrix, k, nprobe=DEFAULT_NPROBE, n_lists=None, memory_limit_mb=KNN_MEMORY_LIMIT_MB):
+    """KNN graph perkiraan di atas matrix ternormalisasi.
+
+    Mengembalikan (neighbours int32 (n, k), scores float32 (n, k)), terurut menurun;
+    slot yang tidak terisi bernilai -1 / -inf.
+    """
+    n = len(matrix)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    nprobe = min(nprobe, n_lists)
+    index = IVFIndex(n_lists).fit(matrix)
+    lists = index.members()
+    probes = np.argsort(-(index.centroids @ index.centroids.T), axis=1)[:, :nprobe]
+
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+    for list_id in tqdm(range(n_lists), desc="Memproses List IVF"):
+        rows = lists[list_id]
+        if not len(rows):
+            continue
+        candidates = np.concatenate([lists[p] for p in probes[list_id]])
+        kk = min(k, len(candidates) - 1)
+        if kk <= 0:
+            continue
+        block = max(1, int(memory_limit_mb * 2**20 // (len(candidates) * 4 * 2)))
+        for start in range(0, len(rows), block):
+            row_ids = rows[start:start + block]
+            similarities = matrix[row_ids] @ matrix[candidates].T
+            similarities[candidates[None, :] == row_ids[:, None]] = -np.inf
+
+            top = np.argpartition(similarities, -kk, axis=1)[:, -kk:]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            neighbours[row_ids, :kk] = candidates[np.take_along_axis(top, order, axis=1)]
+            scores[row_ids, :kk] = np.take_along_axis(top_scores, order, axis=1)
+    return neighbours, scores
+
+
+def measure_recall(matrix, neighbours, k, sample_size=500, seed=0, memory_limit_mb=KNN_MEMORY_LIMIT_MB):
+    """Recall@k hasil perkiraan dibandingkan KNN eksak (knn.knn_blocks) pada sampel baris."""
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(matrix), size=min(sample_size, len(matrix)), replace=False))
+    start = time.time()
+    found = total = 0
+    for row_ids, exact, _ in knn_blocks(matrix, k, knn_block_size(len(matrix), memory_limit_mb), rows=rows):
+        for row, exact_row in zip(row_ids, exact):
+            found += len(set(exact_row.tolist()) & set(neighbours[row].tolist()))
+            total += len(exact_row)
+    exact_seconds = (time.time() - start) * len(matrix) / max(1, len(rows))
+    return found / total if total else 1.0, exact_seconds
+
+
+def write_chunk_relations(driver, ids, neighbours, scores, threshold, write_batch_size=KNN_WRITE_BATCH_SIZE):
+    """Tulis relasi RELATED_TO antar chunk (dua arah) untuk tetangga di atas threshold."""
+    pairs = {}
+    for row in range(len(neighbours)):
+        for neighbour, similarity in zip(neighbours[row], scores[row]):
+            if neighbour < 0 or similarity < threshold:
+                break
+            pairs[(min(row, neighbour), max(row, neighbour))] = float(similarity)
+
+    rows = [
+        {"id_1": ids[i], "id_2": ids[j], "similarity": similarity}
+        for (i, j), similarity in pairs.items()
+    ]
+    for start in tqdm(range(0, len(rows), write_batch_size), desc="Menulis Relasi Chunk"):
+        driver.execute_query(CHUNK_RELATION_WRITE_QUERY, {"batch": rows[start:start + write_batch_size]})
+    return len(rows) * 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bangun relasi RELATED_TO antar Chunk dengan KNN perkiraan (IVF)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Jumlah tetangga per chunk")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Similarity minimum relasi")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE,
+                        help="Jumlah list IVF yang diperiksa (trade-off recall vs waktu)")
+    parser.add_argument("--n-lists", type=int, default=None, help="Jumlah list IVF (default √n)")
+    parser.add_argument("--check-recall", type=int, default=0, metavar="N",
+                        help="Ukur recall terhadap KNN eksak pada N chunk sampel")
+    parser.add_argument("--dry-run", action="store_true", help="Hitung (dan ukur recall) tanpa menulis relasi")
+    parser.add_argument("--mmap", action="store_true", help="Simpan matriks embedding chunk di disk (memory-mapped)")
+    args = parser.parse_args()
+
+    timings = {}
+    start = time.time()
+    store = load_embedding_matrix(driver, "Chunk", mmap=args.mmap)
+    timings["load"] = time.time() - start
+
+    start = time.time()
+    neighbours, scores = approximate_knn(store.matrix, args.k, nprobe=args.nprobe, n_lists=args.n_lists)
+    timings["compute"] = time.time() - start
+
+    if args.check_recall:
+        recall, exact_seconds = measure_recall(store.matrix, neighbours, args.k, sample_size=args.check_recall)
+        print(f"🎯 Recall@{args.k} (nprobe={args.nprobe}): {recall:.4f} "
+              f"— KNN eksak diperkirakan {exact_seconds:.1f} detik vs {timings['compute']:.1f} detik")
+
+    if not args.dry_run:
+        ensure_schema(driver)  # Lookup Chunk.id saat menulis relasi butuh constraint
+        start = time.time()
+        with driver.session() as session:
+            # CALL { ... } IN TRANSACTIONS hanya bisa di transaksi implisit (session.run)
+            session.run(CHUNK_RELATION_CLEANUP_QUERY).consume()
+        total = write_chunk_relations(driver, store.keys(), neighbours, scores, args.threshold)
+        timings["write"] = time.time() - start
+        print(f"✅ Relasi chunk berhasil dibuat! Total relasi: {total}")
+
+    print("⏱️ Waktu per fase: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
@@ -0,0 +1,295 @@
+# async_search.py
+import asyncio
+import sys
+import traceback
+
+import httpx
+from neo4j import AsyncGraphDatabase
+
+from config import (
+    URI,
+    AUTH,
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    GROQ_API_URL,
+    ASYNC_EMBED_CONCURRENCY,
+    ASYNC_NEO4J_CONCURRENCY,
+    ASYNC_LLM_CONCURRENCY,
+    ASYNC_EMBED_TIMEOUT,
+    ASYNC_NEO4J_TIMEOUT,
+    ASYNC_LLM_TIMEOUT,
+    SEARCH_MODE,
+    HYBRID_CANDIDATE_FACTOR,
+    HYBRID_VECTOR_BUDGET,
+    HYBRID_LEXICAL_BUDGET,
+    VERSE_REF_FAST_PATH,
+    GRAPH_NEIGHBOURS,
+    GRAPH_MIN_SIMILARITY,
+)
+from groq_embedder import Embedder
+from embedding_transform import Transform
+from query_cache import normalize_query
+from hybrid import build_lucene_query
+from query_cache import current_version
+from graph_expansion import (
+    RELATIONS_QUERY,
+    AdjacencyCache,
+    AyatAdjacency,
+    plan_expansion,
+    attach_neighbour_chunks,
+    rescore,
+)
+from verse_ref import (
+    SURAH_NAMES_QUERY,
+    REFERENCE_CHUNK_QUERY,
+    SurahNameIndex,
+    parse_verse_query,
+    order_reference_records,
+    reference_params,
+    merge_with_remainder,
+)
+from search import (
+    CHUNK_VECTOR_QUERY,
+    CHUNK_FULLTEXT_QUERY,
+    NO_CONTEXT_ANSWER,
+    API_ERROR_ANSWER,
+    build_prompt,
+    report_usage,
+    answer_cache,
+    store_answer,
+    filter_and_report,
+    get_cached_results,
+    query_embedding_cache,
+    search_result_cache,
+    fuse_legs,
+)
+
+
+class AsyncQuranSearch:
+    """Versi async vector_search_chunks/process_query untuk banyak pertanyaan bersamaan.
+
+    Setiap dependensi (Ollama, Neo4j, Groq) memakai klien dengan pool koneksi
+    persisten, semaphore pembatas konkurensi, dan timeout sendiri. Cache query
+    dan hasil pencarian dipakai bersama dengan search.py.
+    """
+
+    def __init__(self, uri=URI, auth=AUTH, embed_concurrency=ASYNC_EMBED_CONCURRENCY,
+                 neo4j_concurrency=ASYNC_NEO4J_CONCURRENCY, llm_concurrency=ASYNC_LLM_CONCURRENCY):
+        self.driver = AsyncGraphDatabase.driver(uri, auth=auth, max_connection_pool_size=neo4j_concurrency)
+        self.embed_client = httpx.AsyncClient(
+            base_url=Embedder.host,
+            timeout=ASYNC_EMBED_TIMEOUT,
+            limits=httpx.Limits(max_connections=embed_concurrency, max_keepalive_connections=embed_concurrency),
+        )
+        self.llm_client = httpx.AsyncClient(
+            timeout=ASYNC_LLM_TIMEOUT,
+            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
+            limits=httpx.Limits(max_connections=llm_concurrency, max_keepalive_connections=llm_concurrency),
+        )
+        self.embed_semaphore = asyncio.Semaphore(embed_concurrency)
+        self.neo4j_semaphore = asyncio.Semaphore(neo4j_concurrency)
+        self.llm_semaphore = asyncio.Semaphore(llm_concurrency)
+        self.surah_index = None
+        self.adjacency_cache = AdjacencyCache()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.embed_client.aclose()
+        await self.llm_client.aclose()
+        await self.driver.close()
+
+    async def embed_query(self, query_text):
+        key = normalize_query(query_text)
+        vector = query_embedding_cache.get(key)
+        if vector is not None:
+            return vector
+
+        # Cache embedding di disk (SQLite) dibaca di thread lain agar event loop tidak terblokir
+        if Embedder.cache is not None:
+            vector = await asyncio.to_thread(Embedder.cache.get, Embedder.model, query_text)
+        if vector is None:
+            async with self.embed_semaphore:
+                response = await self.embed_client.post(
+                    "/api/embed", json={"model": Embedder.model, "input": [query_text]}
+                )
+            response.raise_for_status()
+            vector = response.json()["embeddings"][0]
+            if Embedder.cache is not None:
+                await asyncio.to_thread(Embedder.cache.put, Embedder.model, query_text, vector)
+
+        vector = Transform.apply(vector)
+        query_embedding_cache.put(key, vector)
+        return vector
+
+    async def _query(self, cypher, params, timeout=ASYNC_NEO4J_TIMEOUT):
+        async with self.neo4j_semaphore:
+            result = await asyncio.wait_for(self.driver.execute_query(cypher, params), timeout=timeout)
+        return result.records or []
+
+    async def _vector_leg(self, query_text, top_k, min_score):
+        vector = await self.embed_query(query_text)
+        records = await self._query(CHUNK_VECTOR_QUERY, {"query_vector": vector, "top_k": top_k})
+        return [r for r in records if r["score"] >= min_score]
+
+    async def _lexical_leg(self, query_text, top_k):
+        lucene_query = build_lucene_query(query_text)
+        if not lucene_query:
+            return []
+        return await self._query(CHUNK_FULLTEXT_QUERY, {"query": lucene_query, "top_k": top_k})
+
+    @staticmethod
+    async def _leg_within_budget(coro, budget, name):
+        # (records, ok) seperti search._leg_result
+        try:
+            return await asyncio.wait_for(coro, timeout=budget), True
+        except asyncio.TimeoutError:
+            print(f"⏱️ Leg {name} melewati anggaran waktu, dilewati")
+        except Exception:
+            print(f"❌ Leg {name} error: {traceback.format_exc()}")
+        return [], False
+
+    async def get_surah_index(self):
+        if self.surah_index is None:
+            self.surah_index = SurahNameIndex.from_records(await self._query(SURAH_NAMES_QUERY, {}))
+        return self.surah_index
+
+    async def get_adjacency(self):
+        if self.adjacency_cache.is_stale():
+            version = current_version("relations")
+            records = await self._query(RELATIONS_QUERY, {}, timeout=None)
+            self.adjacency_cache.set(AyatAdjacency.from_records(records), version)
+        return self.adjacency_cache.adjacency
+
+    async def _graph_search(self, query_text, top_k, min_score):
+        hits, _ = await self._search_free_text(query_text, top_k, min_score, "vector")
+        hits = [h if isinstance(h, dict) else h.data() for h in hits]
+        if not hits:
+            return [], False
+        planned = plan_expansion(await self.get_adjacency(), hits, GRAPH_NEIGHBOURS, GRAPH_MIN_SIMILARITY)
+        expanded = []
+        if planned:
+            records = await self._query(REFERENCE_CHUNK_QUERY, reference_params(list(planned)))
+            expanded = attach_neighbour_chunks(planned, records)
+        combined = rescore(hits, expanded, top_k)
+        added = sum(1 for r in combined if "expanded_from" in r)
+        print(f"🕸️ Ekspansi graph menambahkan {added} chunk dari ayat tetangga")
+        return combined, False
+
+    async def _search_free_text(self, query_text, top_k, min_score, mode):
+        # (records, degraded) seperti search._search_free_text
+        if mode == "graph":
+            return await self._graph_search(query_text, top_k, min_score)
+        if mode == "hybrid":
+            candidates = top_k * HYBRID_CANDIDATE_FACTOR
+            vector_leg, lexical_leg = await asyncio.gather(
+                self._leg_within_budget(self._vector_leg(query_text, candidates, min_score), HYBRID_VECTOR_BUDGET, "vector"),
+                self._leg_within_budget(self._lexical_leg(query_text, candidates), HYBRID_LEXICAL_BUDGET, "lexical"),
+            )
+            return fuse_legs(vector_leg, lexical_leg, top_k)
+
+        vector = await self.embed_query(query_text)
+        records = await self._query(CHUNK_VECTOR_QUERY, {"query_vector": vector, "top_k": top_k})
+        return filter_and_report(records, min_score), False
+
+    async def _search_verse_reference(self, verse_query, top_k, min_score, mode):
+        remainder = (
+            self._search_free_text(verse_query.remainder, top_k, min_score, mode)
+            if verse_query.has_free_text() else asyncio.sleep(0, result=([], False))
+        )
+        ref_records, (remainder_records, degraded) = await asyncio.gather(
+            self._query(REFERENCE_CHUNK_QUERY, reference_params(verse_query.refs)), remainder
+        )
+        return merge_with_remainder(order_reference_records(ref_records), remainder_records, top_k), degraded
+
+    async def vector_search_chunks(self, query_text, top_k=5, min_score=0.6, mode=None):
+        mode = mode or SEARCH_MODE
+        cache_key = (normalize_query(query_text), top_k, min_score, mode)
+        cached = get_cached_results(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            verse_query = parse_verse_query(query_text, await self.get_surah_index()) if VERSE_REF_FAST_PATH else None
+            if verse_query and verse_query.refs:
+                records, degraded = await self._search_verse_reference(verse_query, top_k, min_score, mode)
+            else:
+                records, degraded = await self._search_free_text(query_text, top_k, min_score, mode)
+
+            if not degraded:
+                search_result_cache.put(cache_key, records)
+            return list(records)
+
+        except Exception:
+            print(f"❌ Vector search chunk error: {traceback.format_exc()}")
+            return []
+
+    async def call_groq_api(self, prompt):
+        try:
+            async with self.llm_semaphore:
+                response = await self.llm_client.post(
+                    GROQ_API_URL,
+                    json={
+                        "model": GROQ_MODEL,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": 0.3,
+                        "max_tokens": 2000
+                    },
+                )
+            response.raise_for_status()
+            payload = response.json()
+            report_usage(payload.get("usage"))
+            return payload["choices"][0]["message"]["content"]
+
+        except Exception as e:
+            print(f"❌ Groq API error: {str(e)}")
+            return API_ERROR_ANSWER
+
+    async def process_query(self, query_text):
+        print(f"\n💬 Query: '{query_text}'")
+        records = await self.vector_search_chunks(query_text, top_k=10, min_score=0.6)
+
+        if not records:
+            return NO_CONTEXT_ANSWER
+
+        vector, answer = await self.lookup_answer(query_text, records)
+        if answer is not None:
+            return answer
+
+        answer = await self.call_groq_api(build_prompt(query_text, records))
+        await asyncio.to_thread(store_answer, query_text, vector, records, answer)
+        return answer
+
+    async def lookup_answer(self, query_text, records):
+        """Versi async search.lookup_answer: pertanyaan dengan referensi ayat tidak di-embed
+        dan tidak dicocokkan dengan cache jawaban."""
+        if answer_cache is None:
+            return None, None
+        try:
+            if VERSE_REF_FAST_PATH and parse_verse_query(query_text, await self.get_surah_index()).refs:
+                return None, None
+            vector = await self.embed_query(query_text)
+            return vector, await asyncio.to_thread(answer_cache.get, vector, records)
+        except Exception:
+            print(f"❌ Cache jawaban error: {traceback.format_exc()}")
+            return None, None
+
+
+async def answer_all(questions):
+    """Jawab banyak pertanyaan secara bersamaan dalam satu proses."""
+    async with AsyncQuranSearch() as searcher:
+        return await asyncio.gather(*(searcher.process_query(q) for q in questions))
+
+
+if __name__ == "__main__":
+    questions = sys.argv[1:] or [
+        "Jelaskan makna Surat Al-Fatihah ayat 1",
+        "Apa hukum riba dalam Islam?",
+        "Jelaskan tafsir Surat Al-Baqarah ayat 255",
+    ]
+    for question, answer in zip(questions, asyncio.run(answer_all(questions))):
+        print(f"\n🧐 {question}\n{answer}")
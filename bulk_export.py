@@ -0,0 +1,245 @@
+# bulk_export.py
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+
+ARRAY_DELIMITER = ";"
+
+# File header terpisah dari data (format neo4j-admin database import).
+# Kolom :ID tanpa nama properti tidak disimpan sebagai properti node.
+NODE_FILES = {
+    "Quran": ("quran", [":ID(Quran)", "name"]),
+    "Surah": ("surah", [":ID(Surah)", "number:int", "name", "name_latin", "number_of_ayah:int", "embedding:float[]"]),
+    "Ayat": ("ayat", [":ID(Ayat)", "number:int", "surah_number:int", "text", "translation", "tafsir", "content_hash",
+                      "embedding:float[]", "embedding_hash"]),
+    "Chunk": ("chunk", ["id:ID(Chunk)", "text", "embedding:float[]", "source", "ayat_number:int",
+                        "surah_name", "surah_number:int"]),
+}
+
+RELATIONSHIP_FILES = {
+    "HAS_SURAH": ("has_surah", [":START_ID(Quran)", ":END_ID(Surah)"]),
+    "HAS_AYAT": ("has_ayat", [":START_ID(Surah)", ":END_ID(Ayat)"]),
+    "HAS_CHUNK": ("has_chunk", [":START_ID(Ayat)", ":END_ID(Chunk)"]),
+    "RELATED_TO": ("related_to", [":START_ID(Ayat)", ":END_ID(Ayat)", "similarity:float"]),
+}
+
+# Embedding Surah/Ayat dari insert_word2vec.py --export-csv; digabung ke surah.csv/ayat.csv
+# oleh CsvExport dan dipakai knn.py --export-csv untuk menghitung relasi tanpa membaca Neo4j
+EMBEDDING_FILES = {"Surah": "surah_embeddings.npz", "Ayat": "ayat_embeddings.npz"}
+
+QURAN_ID = "quran"
+
+
+def ayat_id(surah_number, ayat_number):
+    return f"{surah_number}:{ayat_number}"
+
+
+def chunk_id(surah_number, ayat_number, source, index):
+    """ID chunk deterministik: sama untuk input yang sama di setiap run."""
+    return f"{surah_number}:{ayat_number}:{source}:{index}"
+
+
+def encode_array(vector):
+    # float32 cukup 7 digit signifikan
+    return ARRAY_DELIMITER.join(f"{value:.7g}" for value in vector)
+
+
+def _paths(directory, name):
+    return os.path.join(directory, f"{name}_header.csv"), os.path.join(directory, f"{name}.csv")
+
+
+def _open_csv(directory, name, header):
+    header_path, data_path = _paths(directory, name)
+    with open(header_path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerow(header)
+    handle = open(data_path, "w", encoding="utf-8", newline="")
+    return handle, csv.writer(handle)
+
+
+def write_relationship_csv(directory, rel_type, rows):
+    """Tulis satu file relasi (mis. RELATED_TO dari knn.py) beserta header-nya."""
+    os.makedirs(directory, exist_ok=True)
+    name, header = RELATIONSHIP_FILES[rel_type]
+    handle, writer = _open_csv(directory, name, header)
+    with handle:
+        writer.writerows(rows)
+    return len(rows)
+
+
+def save_embeddings(directory, label, ids, hashes, vectors):
+    """Simpan embedding Surah/Ayat (float32, urutan sesuai ids) untuk rebuild offline."""
+    os.makedirs(directory, exist_ok=True)
+    np.savez(
+        os.path.join(directory, EMBEDDING_FILES[label]),
+        ids=np.asarray(ids, dtype=np.int32),
+        hashes=np.asarray(hashes),
+        embeddings=np.asarray(vectors, dtype=np.float32),
+    )
+
+
+def load_embeddings(directory, label):
+    """(ids, hashes, matriks) dari save_embeddings, atau None jika belum diekspor."""
+    try:
+        data = np.load(os.path.join(directory, EMBEDDING_FILES[label]))
+    except FileNotFoundError:
+        return None
+    return data["ids"], data["hashes"], data["embeddings"]
+
+
+def import_command(directory, database="neo4j"):
+    """Perintah neo4j-admin untuk semua file CSV yang ada di directory."""
+    parts = [
+        f"neo4j-admin database import full {database}",
+        f'--array-delimiter="{ARRAY_DELIMITER}"',
+        "--multiline-fields=true",
+        "--overwrite-destination=true",
+    ]
+    for flag, files in (("nodes", NODE_FILES), ("relationships", RELATIONSHIP_FILES)):
+        for label, (name, _) in files.items():
+            header_path, data_path = _paths(directory, name)
+            if os.path.exists(data_path):
+                parts.append(f"--{flag}={label}={header_path},{data_path}")
+    return " \\\n    ".join(parts)
+
+
+class CsvExport:
+    """Ekspor graph Al-Quran ke CSV node/relasi untuk neo4j-admin database import.
+
+    Satu instance berbagi file antar writer (aman antar-thread); writer() membuat
+    objek dengan antarmuka BatchWriter sehingga bisa dipasang ke IngestPipeline.
+
+    Urutan rebuild offline ke satu directory:
+    1. insert_word2vec.py --export-csv DIR  (embedding Surah/Ayat)
+    2. insert_data.py --export-csv DIR      (node, chunk, embedding Surah/Ayat dari langkah 1)
+    3. knn.py --export-csv DIR              (RELATED_TO dari embedding langkah 1)
+    4. neo4j-admin database import (perintah dicetak oleh close())
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.counts = {}
+        for label, (name, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items():
+            if label == "RELATED_TO":
+                continue  # Ditulis terpisah oleh knn.py --export-csv
+            self.files[label] = _open_csv(directory, name, header)
+            self.counts[label] = 0
+        self._write("Quran", [[QURAN_ID, "Al-Quran"]])
+        self.embeddings = {}
+        for label in EMBEDDING_FILES:
+            exported = load_embeddings(directory, label)
+            if exported is None:
+                print(f"⚠️ {EMBEDDING_FILES[label]} tidak ada di {directory}: {label} diekspor tanpa embedding "
+                      f"(jalankan insert_word2vec.py --export-csv {directory} lebih dulu)")
+                self.embeddings[label] = {}
+                continue
+            ids, hashes, matrix = exported
+            keys = [tuple(k) if isinstance(k, list) else k for k in ids.tolist()]
+            self.embeddings[label] = dict(zip(keys, zip(matrix, hashes.tolist())))
+        self.closed = False
+
+    def _embedding(self, label, key):
+        """(embedding terenkode, embedding_hash) dari insert_word2vec.py --export-csv, atau kosong."""
+        vector, embedding_hash = self.embeddings[label].get(key, (None, ""))
+        return ("" if vector is None else encode_array(vector)), embedding_hash
+
+    def _write(self, label, rows):
+        handle, writer = self.files[label]
+        writer.writerows(rows)
+        self.counts[label] += len(rows)
+
+    def write_surahs(self, rows):
+        with self.lock:
+            self._write("Surah", [
+                [row["number"], row["number"], row["name"], row["name_latin"], row["number_of_ayah"],
+                 self._embedding("Surah", row["number"])[0]]
+                for row in rows
+            ])
+            self._write("HAS_SURAH", [[QURAN_ID, row["number"]] for row in rows])
+
+    def write_ayat(self, rows):
+        with self.lock:
+            for row in rows:
+                node_id = ayat_id(row["surah_number"], row["number"])
+                self._write("Ayat", [[
+                    node_id, row["number"], row["surah_number"], row["text"],
+                    row["translation"], row["tafsir"], row["content_hash"],
+                    *self._embedding("Ayat", (row["surah_number"], row["number"]))
+                ]])
+                self._write("HAS_AYAT", [[row["surah_number"], node_id]])
+                self._write("Chunk", [
+                    [chunk["id"], chunk["text"], encode_array(chunk["embedding"]), chunk["source"],
+                     row["number"], row["surah_name"], row["surah_number"]]
+                    for chunk in row["chunks"]
+                ])
+                self._write("HAS_CHUNK", [[node_id, chunk["id"]] for chunk in row["chunks"]])
+
+    def writer(self, batch_size=200):
+        return CsvExportWriter(self, batch_size=batch_size)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            for handle, _ in self.files.values():
+                handle.close()
+            self.closed = True
+        print("📦 CSV siap diimpor: " + ", ".join(f"{label} {count}" for label, count in self.counts.items()))
+        print("Jalankan (database harus berhenti), lalu create_index.py untuk membuat index:")
+        print(import_command(self.directory))
+
+
+class CsvExportWriter:
+    """Pengganti BatchWriter yang menulis ke CsvExport alih-alih ke Neo4j."""
+
+    def __init__(self, export, batch_size=200):
+        self.export = export
+        self.batch_size = batch_size
+        self.surah_rows = []
+        self.ayat_rows = []
+        self.pending_rows = 0
+        self.rows_written = 0
+        self.write_time = 0.0
+        self.start_time = time.time()
+
+    def add_surah(self, row):
+        self.surah_rows.append(row)
+        self.pending_rows += 1
+
+    def add_ayat(self, row):
+        self.ayat_rows.append(row)
+        self.pending_rows += 1 + len(row.get("chunks", []))
+        if self.pending_rows >= self.batch_size:
+            self.flush()
+
+    def end_surah(self):
+        pass
+
+    def flush(self):
+        if not self.surah_rows and not self.ayat_rows:
+            return
+        start = time.time()
+        if self.surah_rows:
+            self.export.write_surahs(self.surah_rows)
+        if self.ayat_rows:
+            self.export.write_ayat(self.ayat_rows)
+        self.write_time += time.time() - start
+        self.rows_written += self.pending_rows
+        self.surah_rows = []
+        self.ayat_rows = []
+        self.pending_rows = 0
+
+    def rows_per_second(self):
+        return self.rows_written / self.write_time if self.write_time else 0.0
+
+    def close(self):
+        self.flush()
+        print(
+            f"📝 {self.rows_written} baris ditulis ke CSV "
+            f"({self.rows_per_second():.1f} baris/detik, total {time.time() - self.start_time:.2f} detik)"
+        )
@@ -1,56 +1,87 @@
 # chunking.py
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Callable
+
+from utils import iter_chunk_spans, span_text
+
+
+class ChunkSpan(NamedTuple):
+    """Record chunk ringan: metadata + offset ke teks sumber (teks chunk tidak disalin)."""
+    surah_number: int
+    verse_number: str
+    type: str
+    index: int
+    start: int
+    end: int
+    source_text: str
+
+    @property
+    def text(self) -> str:
+        # Spasi dinormalisasi seperti utils.chunk_text
+        return span_text(self.source_text, self.start, self.end)
+
+
+def iter_verse_sources(surah: Dict[str, Any]) -> Iterator[tuple]:
+    """(verse_number, type, teks) untuk teks Arab, terjemahan, dan tafsir Kemenag satu surah."""
+    for verse_num, verse_text in surah['text'].items():
+        yield verse_num, 'arabic_text', verse_text
+    for verse_num, verse_translation in surah['translations']['id']['text'].items():
+        yield verse_num, 'translation', verse_translation
+    if 'tafsir' in surah and 'id' in surah['tafsir']:
+        for verse_num, tafsir_text in surah['tafsir']['id']['kemenag']['text'].items():
+            yield verse_num, 'tafsir', tafsir_text
+
+
+def iter_quran_chunks(quran_data, max_tokens: int = 514, overlap: int = 50,
+                      count_tokens: Optional[Callable[[List[str]], List[int]]] = None) -> Iterator[ChunkSpan]:
+    """Hasilkan ChunkSpan untuk seluruh korpus satu per satu.
+
+    Tidak ada list seluruh korpus yang dibangun: pemakai (mis. embedding) bisa
+    mulai dari chunk pertama dan memori puncak tetap datar. quran_data boleh
+    berupa generator surah (quran_reader.iter_surahs).
+    """
+    for surah in quran_data:
+        for verse_num, chunk_type, text in iter_verse_sources(surah):
+            for index, (start, end) in enumerate(iter_chunk_spans(text, max_tokens, overlap, count_tokens)):
+                yield ChunkSpan(surah['number'], verse_num, chunk_type, index, start, end, text)
+
+
+# Awalan chunk_id dan bahasa per jenis sumber
+SOURCE_PREFIXES = {'arabic_text': ('ar', 'ar'), 'translation': ('tr', 'id'), 'tafsir': ('tf', 'id')}
+
 
 class QuranTextChunker:
     def __init__(self, chunk_size: int = 2000, chunk_overlap: int = 200):
+        # langchain hanya dibutuhkan kelas ini; iter_quran_chunks bisa dipakai tanpa langchain
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
             is_separator_regex=False,
         )
-    
-    def split_quran_data(self, quran_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        chunks_with_metadata = []
-        
+
+    def iter_quran_data(self, quran_data: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Versi generator split_quran_data: record dihasilkan per ayat, bukan satu list besar."""
         for surah in quran_data:
             print(f"Processing Surah {surah['name_latin']} ({surah['number']})...")
-            
-            # Process Arabic text
-            for verse_num, verse_text in surah['text'].items():
-                chunks_with_metadata.append({
-                    'text': verse_text,
-                    'type': 'arabic_text',
-                    'surah_number': surah['number'],
-                    'verse_number': verse_num,
-                    'chunk_id': f"ar_s{surah['number']}_v{verse_num}",
-                    'language': 'ar'
-                })
-            
-            # Process Indonesian translation
-            for verse_num, verse_translation in surah['translations']['id']['text'].items():
-                chunks_with_metadata.append({
-                    'text': verse_translation,
-                    'type': 'translation',
+
+            # Teks Arab, terjemahan Indonesia, lalu tafsir Kemenag
+            for verse_num, chunk_type, text in iter_verse_sources(surah):
+                prefix, language = SOURCE_PREFIXES[chunk_type]
+                record = {
+                    'text': text,
+                    'type': chunk_type,
                     'surah_number': surah['number'],
                     'verse_number': verse_num,
-                    'chunk_id': f"tr_s{surah['number']}_v{verse_num}",
-                    'language': 'id',
-                    'translation_name': surah['translations']['id']['name']
-                })
-            
-            # Process Kemenag tafsir
-            if 'tafsir' in surah and 'id' in surah['tafsir']:
-                for verse_num, tafsir_text in surah['tafsir']['id']['kemenag']['text'].items():
-                    chunks_with_metadata.append({
-                        'text': tafsir_text,
-                        'type': 'tafsir',
-                        'surah_number': surah['number'],
-                        'verse_number': verse_num,
-                        'chunk_id': f"tf_s{surah['number']}_v{verse_num}",
-                        'language': 'id',
-                        'tafsir_source': surah['tafsir']['id']['kemenag']['source']
-                    })
-        
-        return chunks_with_metadata
\ No newline at end of file
+                    'chunk_id': f"{prefix}_s{surah['number']}_v{verse_num}",
+                    'language': language
+                }
+                if chunk_type == 'translation':
+                    record['translation_name'] = surah['translations']['id']['name']
+                elif chunk_type == 'tafsir':
+                    record['tafsir_source'] = surah['tafsir']['id']['kemenag']['source']
+                yield record
+
+    def split_quran_data(self, quran_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return list(self.iter_quran_data(quran_data))
@@ -10,8 +10,88 @@ DIMENSION = 3584  # Disesuaikan dengan model embedding yang digunakan
 LABEL = "Tafsir"  # Label node di Neo4j
 EMBEDDING_PROPERTY = "embedding"  # Properti yang menyimpan embedding
 
+# Konfigurasi reduksi dimensi dan kuantisasi embedding chunk
+EMBEDDING_TRANSFORM = "none"  # "none", "truncate" (Matryoshka), atau "pca"
+EMBEDDING_TARGET_DIM = None  # Dimensi target untuk "truncate" (PCA mengikuti modelnya)
+EMBEDDING_STORAGE_DTYPE = "float32"  # "float32", "float16", atau "int8" (presisi simulasi; Neo4j tetap float32)
+PCA_MODEL_PATH = "pca_model.npz"
+
+# Konfigurasi cache embedding di disk
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_ENTRIES = 100_000  # ~1.4 GB untuk vektor 3584 dimensi (float32)
+
+# Konfigurasi cache query (embedding query dan hasil vector search) di search.py
+QUERY_CACHE_SIZE = 512  # Jumlah entri maksimum per cache
+QUERY_CACHE_TTL = 3600  # Umur entri dalam detik
+DATA_VERSION_DIR = "."  # Lokasi file penanda versi korpus untuk invalidasi lintas-proses
+
+# Konfigurasi pencarian hybrid (vektor + full-text) di search.py
+SEARCH_MODE = "hybrid"  # "vector", "hybrid", atau "graph" (vektor + ekspansi RELATED_TO)
+RRF_K = 60  # Konstanta Reciprocal Rank Fusion
+HYBRID_CANDIDATE_FACTOR = 2  # Tiap leg mengambil top_k * faktor kandidat sebelum digabung
+HYBRID_VECTOR_BUDGET = 8.0  # Anggaran waktu leg vektor (embedding + ANN), detik
+HYBRID_LEXICAL_BUDGET = 1.0  # Anggaran waktu leg full-text, detik
+VERSE_REF_FAST_PATH = True  # Pertanyaan yang menyebut surah/ayat langsung diambil lewat lookup index
+GRAPH_NEIGHBOURS = 3  # Mode graph: jumlah tetangga RELATED_TO maksimum per hit
+GRAPH_MIN_SIMILARITY = 0.8  # Mode graph: similarity minimum relasi yang diikuti
+
+# Pembangunan relasi RELATED_TO (knn.py)
+KNN_MEMORY_LIMIT_MB = 512  # Batas memori matriks similarity per blok
+KNN_WRITE_BATCH_SIZE = 5000  # Jumlah pasangan ayat per transaksi UNWIND
+EMBEDDING_MATRIX_DIR = "embedding_matrix"  # Matriks embedding float32 + array ID yang dipakai ulang antar run
+
+# Penyusunan konteks prompt (context_builder.py)
+CONTEXT_TOKEN_BUDGET = 3000  # Batas perkiraan token konteks yang dikirim ke LLM
+CONTEXT_CHARS_PER_TOKEN = 4  # Rata-rata karakter per token untuk perkiraan
+
+# Cache jawaban semantik (answer_cache.py): pertanyaan mirip + chunk sama → jawaban dipakai ulang
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_PATH = "answer_cache.sqlite"
+ANSWER_CACHE_MAX_ENTRIES = 5_000
+ANSWER_CACHE_THRESHOLD = 0.92  # Cosine minimum antar embedding pertanyaan
+
+# Konfigurasi jalur async (async_search.py): batas konkurensi dan timeout per dependensi
+ASYNC_EMBED_CONCURRENCY = 4  # Request embedding Ollama bersamaan
+ASYNC_NEO4J_CONCURRENCY = 16  # Query Neo4j bersamaan
+ASYNC_LLM_CONCURRENCY = 8  # Request Groq bersamaan
+ASYNC_EMBED_TIMEOUT = 30  # Detik
+ASYNC_NEO4J_TIMEOUT = 10  # Detik
+ASYNC_LLM_TIMEOUT = 60  # Detik
+
+# Deteksi batas unit makna tafsir lewat Groq (groq_llm.py)
+GROQ_REQUESTS_PER_MINUTE = 30  # Kuota awal; diperbarui dari header x-ratelimit-* setiap respons
+GROQ_TOKENS_PER_MINUTE = 6000
+GROQ_BREAK_CONCURRENCY = 4  # Request Groq bersamaan
+GROQ_PACK_MAX_SECTIONS = 8  # Jumlah bagian tafsir maksimum per prompt
+GROQ_PACK_MAX_TOKENS = 2500  # Perkiraan token prompt maksimum per request
+GROQ_MAX_RETRIES = 5  # Percobaan per request (429/5xx/error jaringan)
+GROQ_BREAK_CACHE_PATH = "break_cache.sqlite"  # Cache posisi batas per hash teks
+
+# Sumber data Al-Quran: quran.json, salinan .gz, JSON-lines, direktori shard, atau pola glob
+QURAN_DATA_PATH = "quran.json"
+
+# Pemotongan teks menjadi chunk (insert_data.py)
+CHUNK_MAX_TOKENS = 514  # Ukuran jendela chunk insert_data.py
+CHUNK_OVERLAP = 50  # Overlap antar jendela; juga overlap minimum saat context_builder menyambung jendela
+CHUNKER = "window"  # "window" (jendela kata tetap, utils.chunk_text) atau "semantic" (semantic_chunker.py)
+CHUNK_TOKENIZER = None  # Nama tokenizer Hugging Face untuk ukuran jendela dalam token asli (None = hitung kata)
+SEMANTIC_CHUNK_EMBEDDER = "ollama"  # Embedder kalimat: "ollama" (groq_embedder + cache) atau "fasttext" (word2vec.py)
+SEMANTIC_CHUNK_MIN_TOKENS = 40  # Ukuran chunk minimum (kata)
+SEMANTIC_CHUNK_MAX_TOKENS = 300  # Ukuran chunk maksimum (kata)
+SEMANTIC_BREAK_PERCENTILE = 25  # Potong di similarity antar kalimat di bawah persentil ini (per teks)
+
+# Konfigurasi penulisan batch ke Neo4j
+WRITE_BATCH_SIZE = 200  # Jumlah baris (Ayat + Chunk) per transaksi UNWIND
+
+# Konfigurasi pipeline ingestion (parse → chunk/embed → tulis)
+EMBED_WORKERS = 2  # Worker embedding yang berjalan bersamaan
+WRITE_WORKERS = 1  # Worker penulis Neo4j
+PIPELINE_QUEUE_SIZE = 8  # Kapasitas antrean antar-stage (dalam batch ayat)
+
 # Koneksi ke Neo4j
 driver = GraphDatabase.driver(URI, auth=AUTH)
 
 GROQ_API_KEY = "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"
-GROQ_MODEL = "llama-3.3-70b-versatile"  # Pastikan model ini benar
\ No newline at end of file
+GROQ_MODEL = "llama-3.3-70b-versatile"  # Pastikan model ini benar
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"  # Bisa diarahkan ke stub lokal untuk pengujian
\ No newline at end of file
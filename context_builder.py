@@ -0,0 +1,173 @@
+# context_builder.py
+import math
+import re
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_CHARS_PER_TOKEN, CHUNK_OVERLAP
+
+# Prefix "[tafsir Al-Baqarah:255] " ditambahkan insert_data.build_chunk_rows ke setiap chunk;
+# informasi yang sama sudah ada di header ayat sehingga cukup ditulis sekali
+CHUNK_PREFIX = re.compile(r"^\[[^\]]*\]\s*")
+
+# Urutan sumber di dalam satu ayat
+SOURCE_ORDER = {"translation": 0, "tafsir": 1, "text": 2}
+
+MIN_SECTION_TOKENS = 40  # Potongan yang lebih pendek dari ini tidak layak dimasukkan
+
+
+def estimate_tokens(text):
+    """Perkiraan jumlah token tanpa tokenizer model (rata-rata karakter per token)."""
+    return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN) if text else 0
+
+
+def strip_chunk_prefix(text):
+    return CHUNK_PREFIX.sub("", text or "", count=1)
+
+
+def _overlap_length(left, right):
+    """Panjang overlap terpanjang: akhir `left` sama dengan awal `right` (dalam kata)."""
+    if not left or not right:
+        return 0
+    first = right[0]
+    for pos, word in enumerate(left):
+        if word == first:
+            size = len(left) - pos
+            if size <= len(right) and left[pos:] == right[:size]:
+                return size
+    return 0
+
+
+def _contains(words, part):
+    if len(part) > len(words):
+        return False
+    text = " " + " ".join(words) + " "
+    return " " + " ".join(part) + " " in text
+
+
+def merge_windows(texts, min_overlap=CHUNK_OVERLAP):
+    """Gabungkan jendela chunk yang saling overlap (chunk_text memakai overlap antar jendela).
+
+    Dua jendela hanya disambung jika overlap-nya minimal min_overlap kata, sehingga
+    kata yang kebetulan sama di ujung dan awal (mis. "Allah") tidak menyatukan
+    potongan yang tidak bersambung. Jendela yang seluruhnya termuat di jendela lain
+    dibuang; jendela yang tidak bersambung tetap menjadi segmen terpisah.
+    """
+    segments = []
+    for text in texts:
+        words = text.split()
+        if not words or any(_contains(s, words) for s in segments):
+            continue
+        segments = [s for s in segments if not _contains(words, s)]
+        segments.append(words)
+
+    merged = True
+    while merged and len(segments) > 1:
+        merged = False
+        for i, left in enumerate(segments):
+            for j, right in enumerate(segments):
+                if i == j:
+                    continue
+                size = _overlap_length(left, right)
+                if size and size >= min_overlap:
+                    segments[i] = left + right[size:]
+                    del segments[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [" ".join(words) for words in segments]
+
+
+class AyatContext:
+    """Semua hit untuk satu (surah, ayat), sudah dideduplikasi per sumber."""
+
+    def __init__(self, surah, ayat_number):
+        self.surah = surah
+        self.ayat_number = ayat_number
+        self.score = float("-inf")
+        self.texts = {}  # sumber → [teks chunk]
+
+    def add(self, record):
+        self.score = max(self.score, record.get("score") or 0.0)
+        text = strip_chunk_prefix(record.get("chunk_text"))
+        texts = self.texts.setdefault(record.get("source"), [])
+        if text and text not in texts:
+            texts.append(text)
+
+    def sections(self):
+        ordered = sorted(self.texts, key=lambda s: SOURCE_ORDER.get(s, len(SOURCE_ORDER)))
+        return [(source, "\n…\n".join(merge_windows(self.texts[source]))) for source in ordered]
+
+    def header(self):
+        return f"\n📖 Surah: {self.surah}\nAyat {self.ayat_number} | Sumber: {', '.join(s for s, _ in self.sections())}\n"
+
+    def render(self, token_budget=None):
+        """Teks konteks ayat ini; jika melebihi anggaran, bagian paling akhir dipotong per kata."""
+        header = self.header()
+        used = estimate_tokens(header)
+        lines = []
+        for source, text in self.sections():
+            line = f"➷ ({source}) \"{text}\"\n"
+            cost = estimate_tokens(line)
+            if token_budget is not None and used + cost > token_budget:
+                remaining = token_budget - used
+                if remaining < MIN_SECTION_TOKENS:
+                    break
+                words = text.split()
+                keep = int(len(words) * remaining / cost)
+                line = f"➷ ({source}) \"{' '.join(words[:keep])} …\"\n"
+                cost = estimate_tokens(line)
+            lines.append(line)
+            used += cost
+        if not lines:
+            return "", 0
+        return header + "".join(lines), used
+
+
+class BuiltContext:
+    def __init__(self, text, tokens, raw_tokens, ayat_used, ayat_total):
+        self.text = text
+        self.tokens = tokens
+        self.raw_tokens = raw_tokens  # Perkiraan token jika semua chunk digabung apa adanya
+        self.ayat_used = ayat_used
+        self.ayat_total = ayat_total
+
+    def report(self):
+        saved = 1 - self.tokens / self.raw_tokens if self.raw_tokens else 0.0
+        print(
+            f"🧮 Konteks: {self.ayat_used}/{self.ayat_total} ayat, ±{self.tokens} token "
+            f"(tanpa dedup ±{self.raw_tokens}, hemat {saved:.0%})"
+        )
+
+
+def group_by_ayat(records):
+    groups = {}
+    for r in records:
+        row = r if isinstance(r, dict) else r.data()
+        key = (row.get("surah_number") or row.get("surah"), row.get("ayat_number"))
+        if key not in groups:
+            groups[key] = AyatContext(row.get("surah"), row.get("ayat_number"))
+        groups[key].add(row)
+    return sorted(groups.values(), key=lambda g: g.score, reverse=True)
+
+
+def build_context(records, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Susun konteks prompt: kelompokkan per ayat, buang overlap, isi sesuai anggaran token.
+
+    Ayat dengan skor tertinggi dimasukkan lebih dulu; ayat yang tidak muat
+    dipotong atau dilewati.
+    """
+    raw_tokens = sum(
+        estimate_tokens((r if isinstance(r, dict) else r.data()).get("chunk_text") or "") for r in records
+    )
+    groups = group_by_ayat(records)
+
+    parts = []
+    used = 0
+    for group in groups:
+        text, cost = group.render(token_budget - used if token_budget is not None else None)
+        if not text:
+            continue
+        parts.append(text)
+        used += cost
+
+    return BuiltContext("".join(parts), used, raw_tokens, len(parts), len(groups))
@@ -1,55 +1,29 @@
-from neo4j import GraphDatabase
-from config import driver, DIMENSION
+from config import driver
+from schema import apply_schema, drop_mismatched_vector_indexes, verify_schema, expected_objects, LATEST_VERSION, VECTOR_DIMENSIONS
 import sys
 
 def create_indices():
     try:
-        with driver.session() as session:
-            # Index untuk embedding Ayat (menggunakan VECTOR INDEX)
-            session.run("""
-                CREATE VECTOR INDEX ayat_embeddings IF NOT EXISTS
-                FOR (a:Ayat) 
-                ON (a.embedding)
-                OPTIONS {
-                    indexConfig: {
-                        `vector.dimensions`: $dim,
-                        `vector.similarity_function`: 'cosine'
-                    }
-                }
-            """, dim=DIMENSION)
+        # Terapkan semua migrasi skema (constraint, range, vector, dan full-text index)
+        drop_mismatched_vector_indexes(driver)
+        apply_schema(driver, from_version=0)
 
-            # Index untuk embedding Surah (menggunakan VECTOR INDEX)
-            session.run("""
-                CREATE VECTOR INDEX surah_embeddings IF NOT EXISTS
-                FOR (s:Surah) 
-                ON (s.embedding)
-                OPTIONS {
-                    indexConfig: {
-                        `vector.dimensions`: $dim,
-                        `vector.similarity_function`: 'cosine'
-                    }
-                }
-            """, dim=DIMENSION)
+        # Verifikasi indeks yang berhasil dibuat
+        problems = verify_schema(driver)
 
-            # Verifikasi indeks yang berhasil dibuat
-            check = session.run("""
-                SHOW INDEXES 
-                WHERE name IN ['ayat_embeddings', 'surah_embeddings'] 
-                AND type = 'VECTOR'
-            """)
-
-            created_indexes = [record["name"] for record in check]
-
-            if "ayat_embeddings" in created_indexes and "surah_embeddings" in created_indexes:
-                print("✅ Semua indeks vektor berhasil dibuat")
-                print("Detail Index:")
-                print(f"- Nama: ayat_embeddings (Ayat)")
-                print(f"- Nama: surah_embeddings (Surah)")
-                print(f"- Dimensi: {DIMENSION}")
-                print(f"- Similarity Function: cosine")
-            else:
-                print("❌ Gagal membuat salah satu indeks!")
-                sys.exit(1)
+        if not problems:
+            print(f"✅ Skema v{LATEST_VERSION} lengkap")
+            print("Detail Index:")
+            for name, kind in expected_objects().items():
+                print(f"- {kind}: {name}")
+            for name, dim in VECTOR_DIMENSIONS.items():
+                print(f"- Dimensi {name}: {dim}")
+            print(f"- Similarity Function: cosine")
+        else:
+            print("❌ Gagal membuat sebagian skema:")
+            for problem in problems:
+                print(f"- {problem}")
+            sys.exit(1)
 
     except Exception as e:
         print(f"❌ Error saat membuat indeks: {str(e)}")
@@ -58,4 +32,4 @@ def create_indices():
         driver.close()
 
 if __name__ == "__main__":
-    create_indices()
\ No newline at end of file
+    create_indices()
@@ -0,0 +1,142 @@
+# embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Normalisasi Unicode (NFC) dan spasi agar teks yang sama menghasilkan key yang sama."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache embedding di disk (SQLite), key = (nama model, hash teks ternormalisasi).
+
+    Vektor disimpan sebagai blob float32 (~14 KB untuk 3584 dimensi). Jika jumlah
+    entri melebihi max_entries, entri yang paling lama tidak dipakai dihapus.
+    """
+
+    def __init__(self, path="embedding_cache.sqlite", max_entries=100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+
+    def get_many(self, model, texts):
+        """Kembalikan list vektor (atau None jika belum ada di cache) sesuai urutan texts."""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self.lock:
+            # SQLite membatasi jumlah parameter per query
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self.conn.commit()
+
+            results = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+            return results
+
+    def get(self, model, text):
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((cache_key(model, text), model, len(vector), blob, now))
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self.conn.commit()
+
+    def put(self, model, text, vector):
+        self.put_many(model, [text], [vector])
+
+    def load_vectors(self, model, limit=None):
+        """Ambil sampel acak vektor mentah satu model sebagai matriks float32 (n, dim)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT vector FROM embeddings WHERE model = ? ORDER BY RANDOM() LIMIT ?",
+                (model, limit if limit else -1)
+            ).fetchall()
+        return np.vstack([np.frombuffer(blob, dtype=np.float32) for (blob,) in rows]) if rows else np.empty((0, 0), np.float32)
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def report(self):
+        s = self.stats()
+        print(
+            f"🗄️ Cache embedding: {s['hits']} hit, {s['misses']} miss "
+            f"(hit rate {s['hit_rate']:.1%}), {s['entries']} entri tersimpan"
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
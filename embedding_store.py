@@ -0,0 +1,284 @@
+# embedding_store.py
+import json
+import os
+import time
+
+import numpy as np
+
+from config import DIMENSION, EMBEDDING_MATRIX_DIR
+from embedding_transform import Transform
+from query_cache import current_version
+
+# Sumber matriks per label: query jumlah baris, query baris (urutan stabil), dimensi, dan dtype ID.
+# Hash Ayat adalah embedding_hash dari insert_word2vec.py (pipeline yang menulis a.embedding),
+# bukan content_hash milik pipeline chunk.
+MATRIX_SOURCES = {
+    "Ayat": {
+        "count": "MATCH (a:Ayat) WHERE a.embedding IS NOT NULL RETURN count(a) AS n",
+        "rows": """
+            MATCH (a:Ayat) WHERE a.embedding IS NOT NULL
+            RETURN [a.surah_number, a.number] AS id, a.embedding_hash AS content_hash, a.embedding AS embedding
+            ORDER BY a.surah_number, a.number
+        """,
+        # Untuk sinkronisasi inkremental: daftar ID + hash tanpa embedding, dan baris per ID
+        "hashes": """
+            MATCH (a:Ayat) WHERE a.embedding IS NOT NULL
+            RETURN [a.surah_number, a.number] AS id, a.embedding_hash AS content_hash
+            ORDER BY a.surah_number, a.number
+        """,
+        "rows_by_id": """
+            UNWIND $ids AS id
+            MATCH (a:Ayat {surah_number: id[0], number: id[1]})
+            RETURN [a.surah_number, a.number] AS id, a.embedding_hash AS content_hash, a.embedding AS embedding
+        """,
+        "dim": DIMENSION,
+    },
+    "Chunk": {
+        "count": "MATCH (c:Chunk) WHERE c.embedding IS NOT NULL RETURN count(c) AS n",
+        "rows": """
+            MATCH (c:Chunk) WHERE c.embedding IS NOT NULL
+            RETURN c.id AS id, null AS content_hash, c.embedding AS embedding
+            ORDER BY c.surah_number, c.ayat_number, c.id
+        """,
+        # Chunk disimpan setelah EMBEDDING_TRANSFORM (bisa direduksi/dikuantisasi)
+        "dim": Transform.output_dim,
+    },
+}
+
+
+class EmbeddingMatrix:
+    """Embedding satu label sebagai matriks float32 (n, dim) ditambah array ID dan content_hash.
+
+    ids: int32 (n, 2) berisi (surah_number, number) untuk Ayat, atau string Chunk.id.
+    Baris matriks sudah dinormalisasi L2 jika meta["normalized"] bernilai True.
+    """
+
+    def __init__(self, label, ids, hashes, matrix, meta):
+        self.label = label
+        self.ids = ids
+        self.hashes = hashes
+        self.matrix = matrix
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def keys(self):
+        """ID sebagai nilai Python (tuple untuk Ayat) agar bisa langsung dikirim ke Neo4j."""
+        return [tuple(k) if isinstance(k, list) else k for k in self.ids.tolist()]
+
+    def nbytes(self):
+        return self.matrix.nbytes + self.ids.nbytes + self.hashes.nbytes
+
+
+def _paths(directory, label):
+    prefix = os.path.join(directory, label.lower())
+    return {
+        "matrix": f"{prefix}_embeddings.npy",
+        "ids": f"{prefix}_ids.npy",
+        "hashes": f"{prefix}_hashes.npy",
+        "meta": f"{prefix}_meta.json",
+    }
+
+
+def _count(driver, label):
+    records, _, _ = driver.execute_query(MATRIX_SOURCES[label]["count"])
+    return records[0]["n"]
+
+
+def _load_saved(paths, label, count, normalized, mmap):
+    try:
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    expected = {
+        "label": label,
+        "count": count,
+        "normalized": normalized,
+        "corpus_version": current_version(),
+        "transform": Transform.signature() if label == "Chunk" else None,
+    }
+    if any(meta.get(key) != value for key, value in expected.items()):
+        return None
+    matrix = np.load(paths["matrix"], mmap_mode="r" if mmap else None)[:count]
+    return EmbeddingMatrix(label, np.load(paths["ids"]), np.load(paths["hashes"]), matrix, meta)
+
+
+def _save(paths, label, ids, hashes, matrix, normalized, mmap):
+    meta = {
+        "label": label,
+        "count": len(matrix),
+        "dim": matrix.shape[1],
+        "normalized": normalized,
+        "corpus_version": current_version(),
+        "transform": Transform.signature() if label == "Chunk" else None,
+        "created_at": time.time(),
+    }
+    if mmap:
+        matrix.flush()
+    else:
+        np.save(paths["matrix"], matrix)
+    np.save(paths["ids"], ids)
+    np.save(paths["hashes"], hashes)
+    with open(paths["meta"], "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return EmbeddingMatrix(label, ids, hashes, matrix, meta)
+
+
+def _normalize_row(vector):
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def load_embedding_matrix(driver, label="Ayat", directory=EMBEDDING_MATRIX_DIR, normalize=True,
+                          mmap=False, reuse=True):
+    """Muat embedding satu label ke matriks float32 yang dialokasikan sekali di depan.
+
+    Jumlah baris dihitung lebih dulu, lalu record dari Neo4j dialirkan langsung
+    ke baris matriks tanpa list Python perantara. Dengan mmap=True matriks ditulis
+    ke file .npy di disk (np.memmap) sehingga tidak harus muat di RAM. Hasil selalu
+    disimpan di `directory`; run berikutnya memakai file tersebut tanpa membaca
+    embedding dari database selama jumlah node dan versi korpus tidak berubah.
+    """
+    source = MATRIX_SOURCES[label]
+    paths = _paths(directory, label)
+    start = time.time()
+    count = _count(driver, label)
+
+    if reuse:
+        saved = _load_saved(paths, label, count, normalize, mmap)
+        if saved is not None:
+            print(f"♻️ Matriks embedding {label} dimuat dari {paths['matrix']} ({len(saved)} baris)")
+            return saved
+
+    os.makedirs(directory, exist_ok=True)
+    dim = source["dim"]
+    if mmap:
+        matrix = np.lib.format.open_memmap(paths["matrix"], mode="w+", dtype=np.float32, shape=(count, dim))
+    else:
+        matrix = np.empty((count, dim), dtype=np.float32)
+    ids = []
+    hashes = []
+
+    row = 0
+    with driver.session() as session:
+        for record in session.run(source["rows"]):
+            if row >= count:
+                break  # Node baru ditulis setelah penghitungan; diambil pada run berikutnya
+            embedding = record["embedding"]
+            if len(embedding) != dim:
+                raise ValueError(f"❌ Dimensi embedding {label} {record['id']} = {len(embedding)}, seharusnya {dim}")
+            matrix[row] = embedding
+            if normalize:
+                _normalize_row(matrix[row])
+            ids.append(record["id"])
+            hashes.append(record["content_hash"] or "")
+            row += 1
+
+    if row < count:
+        matrix = matrix[:row]
+    ids = np.asarray(ids, dtype=np.int32 if label == "Ayat" else None).reshape((row, 2) if label == "Ayat" else (row,))
+    hashes = np.asarray(hashes)
+
+    store = _save(paths, label, ids, hashes, matrix, normalize, mmap)
+    print(
+        f"✅ Matriks embedding {label}: {row} × {dim} float32 "
+        f"({store.nbytes() / 2**20:.1f} MB) dalam {time.time() - start:.1f} detik"
+    )
+    return store
+
+
+def fetch_id_hashes(driver, label="Ayat"):
+    """Daftar (ID, content_hash) terkini tanpa membaca embedding."""
+    records, _, _ = driver.execute_query(MATRIX_SOURCES[label]["hashes"])
+    return [(tuple(r["id"]), r["content_hash"] or "") for r in records]
+
+
+def sync_embedding_matrix(driver, label="Ayat", directory=EMBEDDING_MATRIX_DIR, mmap=False, batch_size=500):
+    """Perbarui matriks tersimpan: hanya baris yang baru atau embedding_hash-nya berubah
+    yang dibaca dari Neo4j; baris lain disalin dari matriks lama.
+
+    Hanya untuk label yang punya hash (Ayat); tanpa matriks tersimpan,
+    jatuh kembali ke load_embedding_matrix penuh.
+    """
+    source = MATRIX_SOURCES[label]
+    paths = _paths(directory, label)
+    try:
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        saved = EmbeddingMatrix(
+            label, np.load(paths["ids"]), np.load(paths["hashes"]),
+            np.load(paths["matrix"], mmap_mode="r")[:meta["count"]], meta
+        )
+    except FileNotFoundError:
+        saved = None
+    if "hashes" not in source or saved is None or not saved.meta.get("normalized"):
+        return load_embedding_matrix(driver, label, directory, mmap=mmap, reuse=False)
+
+    start = time.time()
+    current = fetch_id_hashes(driver, label)
+    old_index = {key: i for i, key in enumerate(saved.keys())}
+    stale = [key for key, h in current if key not in old_index or saved.hashes[old_index[key]] != h]
+    if not stale and len(current) == len(saved):
+        print(f"♻️ Matriks embedding {label} masih sesuai dengan Neo4j ({len(saved)} baris)")
+        if mmap:
+            return saved
+        saved.matrix = np.array(saved.matrix)
+        return saved
+
+    fresh = {}
+    for i in range(0, len(stale), batch_size):
+        records, _, _ = driver.execute_query(source["rows_by_id"], {"ids": [list(k) for k in stale[i:i + batch_size]]})
+        for r in records:
+            fresh[tuple(r["id"])] = _normalize_row(np.asarray(r["embedding"], dtype=np.float32))
+
+    dim = source["dim"]
+    if mmap:
+        # Tulis ke file sementara lalu ganti, karena matriks lama masih dibaca dari file aslinya
+        tmp_path = paths["matrix"] + ".tmp.npy"
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(current), dim))
+    else:
+        matrix = np.empty((len(current), dim), dtype=np.float32)
+    for row, (key, _) in enumerate(current):
+        matrix[row] = fresh[key] if key in fresh else saved.matrix[old_index[key]]
+
+    ids = np.asarray([list(key) for key, _ in current], dtype=np.int32).reshape((len(current), 2))
+    hashes = np.asarray([h for _, h in current])
+    if mmap:
+        matrix.flush()
+        del saved
+        os.replace(tmp_path, paths["matrix"])
+        matrix = np.load(paths["matrix"], mmap_mode="r+")
+    store = _save(paths, label, ids, hashes, matrix, True, mmap)
+    print(
+        f"🔄 Matriks embedding {label} disinkronkan: {len(fresh)} baris dibaca ulang, "
+        f"{len(current) - len(fresh)} dipakai ulang ({time.time() - start:.1f} detik)"
+    )
+    return store
+
+
+def _snapshot_paths(directory, name):
+    prefix = os.path.join(directory, name)
+    return f"{prefix}_ids.npy", f"{prefix}_hashes.npy"
+
+
+def save_snapshot(store, name, directory=EMBEDDING_MATRIX_DIR):
+    """Simpan ID + content_hash yang dipakai sebuah proses (mis. relasi KNN terakhir)."""
+    os.makedirs(directory, exist_ok=True)
+    ids_path, hashes_path = _snapshot_paths(directory, name)
+    np.save(ids_path, store.ids)
+    np.save(hashes_path, store.hashes)
+
+
+def load_snapshot(name, directory=EMBEDDING_MATRIX_DIR):
+    """{ID: content_hash} dari save_snapshot, atau None jika belum pernah disimpan."""
+    ids_path, hashes_path = _snapshot_paths(directory, name)
+    try:
+        ids, hashes = np.load(ids_path), np.load(hashes_path)
+    except FileNotFoundError:
+        return None
+    keys = [tuple(k) if isinstance(k, list) else k for k in ids.tolist()]
+    return dict(zip(keys, hashes.tolist()))
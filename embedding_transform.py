@@ -0,0 +1,160 @@
+# embedding_transform.py
+import argparse
+
+import numpy as np
+
+from config import (
+    DIMENSION,
+    EMBEDDING_TRANSFORM,
+    EMBEDDING_TARGET_DIM,
+    EMBEDDING_STORAGE_DTYPE,
+    PCA_MODEL_PATH,
+)
+
+METHODS = ("none", "truncate", "pca")
+DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+class EmbeddingTransform:
+    """Proyeksi dimensi (truncate ala Matryoshka atau PCA) + kuantisasi nilai vektor.
+
+    Transformasi yang sama wajib diterapkan ke embedding chunk saat ingestion
+    dan ke embedding query saat pencarian. Hasil selalu dinormalisasi L2 agar
+    cosine similarity di vector index tetap bermakna.
+
+    Neo4j menyimpan embedding sebagai float32, jadi dtype float16/int8 hanya
+    mensimulasikan kehilangan presisinya: nilai dibulatkan lalu tetap ditulis
+    sebagai float32. Penghematan memori hanya datang dari output_dim.
+    """
+
+    def __init__(self, method="none", target_dim=None, dtype="float32", mean=None, components=None):
+        if method not in METHODS:
+            raise ValueError(f"❌ Metode transformasi tidak dikenal: {method}")
+        if dtype not in DTYPES:
+            raise ValueError(f"❌ Tipe penyimpanan tidak dikenal: {dtype}")
+        if method == "pca" and components is None:
+            raise ValueError("❌ Transformasi PCA butuh model (mean + components)")
+
+        self.method = method
+        self.dtype = dtype
+        self.mean = mean
+        self.components = components  # (target_dim, DIMENSION)
+        if method == "none":
+            self.output_dim = DIMENSION
+        elif method == "pca":
+            self.output_dim = components.shape[0]
+        else:
+            self.output_dim = target_dim or DIMENSION
+            if not 0 < self.output_dim <= DIMENSION:
+                raise ValueError(f"❌ Dimensi truncate harus 1..{DIMENSION}, bukan {self.output_dim}")
+
+    @classmethod
+    def load_pca(cls, path, dtype="float32"):
+        model = np.load(path)
+        return cls("pca", dtype=dtype, mean=model["mean"], components=model["components"])
+
+    @classmethod
+    def fit_pca(cls, vectors, target_dim, dtype="float32"):
+        """Fit PCA dari matriks embedding (n, DIMENSION) lewat eigendecomposition kovarians.
+
+        Vektor dinormalisasi L2 dulu, sama seperti di project().
+        """
+        x = _normalize_rows(np.asarray(vectors, dtype=np.float64))
+        mean = x.mean(axis=0)
+        centered = x - mean
+        cov = centered.T @ centered / max(len(x) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        order = np.argsort(eigenvalues)[::-1][:target_dim]
+        explained = eigenvalues[order].sum() / eigenvalues.sum()
+        print(f"📐 PCA {DIMENSION} → {target_dim} dimensi, variansi terjelaskan {explained:.2%}")
+        return cls(
+            "pca",
+            dtype=dtype,
+            mean=mean.astype(np.float32),
+            components=eigenvectors[:, order].T.astype(np.float32),
+        )
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, components=self.components)
+
+    def signature(self):
+        return f"{self.method}:{self.output_dim}:{self.dtype}"
+
+    def bytes_per_vector(self):
+        # Ukuran yang benar-benar disimpan di Neo4j (float32), apa pun dtype simulasinya
+        return self.output_dim * np.dtype(np.float32).itemsize
+
+    def project(self, vectors):
+        """Proyeksikan matriks (n, DIMENSION) ke (n, output_dim) float32 ternormalisasi."""
+        x = np.asarray(vectors, dtype=np.float32)
+        if self.method == "truncate":
+            x = x[:, :self.output_dim]
+        elif self.method == "pca":
+            # Mean PCA dihitung dari vektor ternormalisasi; vektor mentah harus disamakan skalanya dulu
+            x = (_normalize_rows(x) - self.mean) @ self.components.T
+        return _normalize_rows(x)
+
+    def encode(self, projected):
+        """Kodekan vektor terproyeksi ke dtype penyimpanan ringkas (+ skala untuk int8)."""
+        if self.dtype == "int8":
+            scale = np.abs(projected).max(axis=1, keepdims=True) / 127.0
+            scale[scale == 0] = 1.0
+            return np.round(projected / scale).astype(np.int8), scale.astype(np.float32)
+        return projected.astype(self.dtype), None
+
+    def decode(self, encoded, scale=None):
+        if self.dtype == "int8":
+            return encoded.astype(np.float32) * scale
+        return encoded.astype(np.float32)
+
+    def transform(self, vectors):
+        """Proyeksi + kuantisasi bolak-balik; menghasilkan nilai yang ditulis (sebagai float32)."""
+        projected = self.project(vectors)
+        if self.dtype == "float32":
+            return projected
+        return self.decode(*self.encode(projected))
+
+    def apply(self, vector):
+        """Transformasi satu vektor (list) untuk disimpan di Neo4j / dipakai sebagai query."""
+        if self.method == "none" and self.dtype == "float32":
+            return vector
+        return self.transform([vector])[0].tolist()
+
+    def apply_many(self, vectors):
+        if not vectors or (self.method == "none" and self.dtype == "float32"):
+            return vectors
+        return self.transform(vectors).tolist()
+
+
+def load_transform(method=EMBEDDING_TRANSFORM, target_dim=EMBEDDING_TARGET_DIM,
+                   dtype=EMBEDDING_STORAGE_DTYPE, pca_path=PCA_MODEL_PATH):
+    if method == "pca":
+        return EmbeddingTransform.load_pca(pca_path, dtype=dtype)
+    return EmbeddingTransform(method, target_dim=target_dim, dtype=dtype)
+
+
+Transform = load_transform()
+
+
+if __name__ == "__main__":
+    from groq_embedder import Embedder
+
+    parser = argparse.ArgumentParser(description="Fit model PCA dari embedding mentah di cache embedding")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_TARGET_DIM or 512, help="Dimensi target")
+    parser.add_argument("--sample", type=int, default=20000, help="Jumlah vektor maksimum untuk fitting")
+    parser.add_argument("--output", default=PCA_MODEL_PATH)
+    args = parser.parse_args()
+
+    if Embedder.cache is None:
+        raise SystemExit("❌ Cache embedding tidak aktif; PCA di-fit dari vektor mentah di cache")
+
+    vectors = Embedder.cache.load_vectors(Embedder.model, limit=args.sample)
+    print(f"📦 {len(vectors)} vektor dimuat dari cache embedding")
+    EmbeddingTransform.fit_pca(vectors, args.dim).save(args.output)
+    print(f"✅ Model PCA disimpan ke {args.output}")
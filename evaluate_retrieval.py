@@ -1,5 +1,20 @@
+import argparse
 import json
-from search import vector_search_chunks
+import os
+import time
+
+import numpy as np
+
+from config import (
+    driver, DIMENSION, PCA_MODEL_PATH, QURAN_DATA_PATH, CHUNK_OVERLAP, SEMANTIC_CHUNK_MIN_TOKENS,
+    SEMANTIC_CHUNK_MAX_TOKENS
+)
+from search import vector_search_chunks, vector_search_chunks_batch
+from groq_embedder import Embedder
+from embedding_transform import EmbeddingTransform
+from semantic_chunker import get_chunker, WindowChunker
+from quran_reader import iter_ayat_records, iter_surahs
+from chunking import iter_quran_chunks
 
 TOP_K = 5
 GROUND_TRUTH_PATH = "ground_truth.json"
@@ -10,20 +25,10 @@ def clean_key(surah, ayat):
     ayat = str(ayat).strip()
     return f"{surah}:{ayat}"
 
-def evaluate_query(query_text, relevant_set):
-    retrieved = vector_search_chunks(query_text, top_k=TOP_K)
-    
-    # Normalisasi hasil retrieval
-    retrieved_keys = [
-        clean_key(r['surah'], r['ayat_number']) for r in retrieved
-    ]
-    
-    # Normalisasi ground truth
-    relevant_keys = set(k.replace("’", "'").replace("‘", "'").replace(" ", "").lower() for k in relevant_set)
-
-    print("🔍 Retrieved keys:", retrieved_keys)
-    print("🎯 Relevant keys:", relevant_keys)
+def normalize_relevant(relevant_set):
+    return set(k.replace("’", "'").replace("‘", "'").replace(" ", "").lower() for k in relevant_set)
 
+def compute_metrics(retrieved_keys, relevant_keys):
     # Precision@k
     relevant_retrieved = [rk for rk in retrieved_keys if rk in relevant_keys]
     precision = len(relevant_retrieved) / TOP_K if TOP_K else 0
@@ -38,6 +43,27 @@ def evaluate_query(query_text, relevant_set):
             mrr = 1 / i
             break
 
+    return precision, recall, mrr
+
+def evaluate_query(query_text, relevant_set, mode=None, retrieved=None, verbose=True):
+    if retrieved is None:
+        retrieved = vector_search_chunks(query_text, top_k=TOP_K, mode=mode)
+    
+    # Normalisasi hasil retrieval
+    retrieved_keys = [
+        clean_key(r['surah'], r['ayat_number']) for r in retrieved
+    ]
+    
+    # Normalisasi ground truth
+    relevant_keys = normalize_relevant(relevant_set)
+
+    precision, recall, mrr = compute_metrics(retrieved_keys, relevant_keys)
+    if not verbose:
+        return precision, recall, mrr
+
+    print("🔍 Retrieved keys:", retrieved_keys)
+    print("🎯 Relevant keys:", relevant_keys)
+
     # Optional error analysis
     for rk in retrieved_keys:
         if rk not in relevant_keys:
@@ -48,22 +74,188 @@ def evaluate_query(query_text, relevant_set):
 
     return precision, recall, mrr
 
-def main():
-    with open(GROUND_TRUTH_PATH, "r", encoding="utf-8") as f:
-        ground_truth = json.load(f)
+# Pengaturan (metode, dimensi target, dtype) yang dibandingkan oleh --compare-transforms
+TRANSFORM_SETTINGS = [
+    ("none", None, "float32"),
+    ("none", None, "float16"),
+    ("none", None, "int8"),
+    ("truncate", 1024, "float32"),
+    ("truncate", 512, "float32"),
+    ("truncate", 512, "int8"),
+    ("truncate", 256, "float32"),
+    ("pca", None, "float32"),
+    ("pca", None, "int8"),
+]
+
+def embed_matrix(texts, batch_size=1000):
+    """Embed (lewat cache) langsung ke matriks float32 tanpa menyimpan list Python besar."""
+    matrix = np.empty((len(texts), DIMENSION), dtype=np.float32)
+    for i in range(0, len(texts), batch_size):
+        matrix[i:i + batch_size] = Embedder.embed_texts(texts[i:i + batch_size])
+    return matrix
+
+def brute_force_search(query_matrix, corpus_matrix, top_k):
+    scores = query_matrix @ corpus_matrix.T
+    top = np.argpartition(-scores, min(top_k, scores.shape[1] - 1), axis=1)[:, :top_k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+def compare_transforms(ground_truth):
+    """Bandingkan recall/MRR tiap pengaturan reduksi dimensi + kuantisasi secara offline.
+
+    Embedding mentah chunk dan query diambil dari cache embedding, ditransformasi
+    per pengaturan, lalu dicari secara brute force sehingga tidak perlu ingest ulang.
+    dtype float16/int8 hanya mensimulasikan kehilangan presisi; Neo4j tetap menyimpan
+    float32, sehingga kolom memori hanya bergantung pada dimensi.
+    """
+    records, _, _ = driver.execute_query(
+        "MATCH (c:Chunk) RETURN c.text AS text, c.surah_name AS surah, c.ayat_number AS ayat_number"
+    )
+    corpus_keys = [clean_key(r["surah"], r["ayat_number"]) for r in records]
+    raw_corpus = embed_matrix([r["text"] for r in records])
+    queries = list(ground_truth)
+    raw_queries = embed_matrix(queries)
+    relevant = [normalize_relevant(ground_truth[q]) for q in queries]
+    baseline_bytes = len(records) * DIMENSION * 4  # Vektor float32 di Neo4j
 
+    print(f"📊 Perbandingan transformasi embedding ({len(records)} chunk, {len(queries)} query):")
+    print("-" * 100)
+    print(f"{'Pengaturan':<24}{'Recall@' + str(TOP_K):>10}{'MRR':>8}{'Δ Recall':>10}{'Δ MRR':>8}"
+          f"{'Memori':>12}{'Hemat':>8}{'ms/query':>10}")
+
+    base = None
+    for method, target_dim, dtype in TRANSFORM_SETTINGS:
+        if method == "pca":
+            if not os.path.exists(PCA_MODEL_PATH):
+                continue
+            transform = EmbeddingTransform.load_pca(PCA_MODEL_PATH, dtype=dtype)
+        else:
+            transform = EmbeddingTransform(method, target_dim=target_dim, dtype=dtype)
+
+        corpus = transform.transform(raw_corpus)
+        start = time.time()
+        query_matrix = transform.transform(raw_queries)
+        top = brute_force_search(query_matrix, corpus, TOP_K)
+        latency_ms = (time.time() - start) * 1000 / len(queries)
+
+        total_r, total_mrr = 0, 0
+        for row, relevant_keys in zip(top, relevant):
+            _, r, mrr = compute_metrics([corpus_keys[i] for i in row], relevant_keys)
+            total_r += r
+            total_mrr += mrr
+        recall, mrr = total_r / len(queries), total_mrr / len(queries)
+        base = base or (recall, mrr)
+
+        memory = len(records) * transform.bytes_per_vector()
+        label = f"{method}:{transform.output_dim}:{dtype}" + ("*" if dtype != "float32" else "")
+        print(f"{label:<24}{recall:>10.4f}{mrr:>8.4f}{recall - base[0]:>+10.4f}{mrr - base[1]:>+8.4f}"
+              f"{memory / 2**20:>10.1f}MB{1 - memory / baseline_bytes:>8.1%}{latency_ms:>10.2f}")
+    print("* presisi float16/int8 disimulasikan; disimpan sebagai float32 sehingga memorinya tidak berkurang")
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+# Nama sumber chunking.iter_verse_sources → nama sumber chunk insert_data
+SPAN_SOURCES = {"arabic_text": "text", "translation": "translation", "tafsir": "tafsir"}
+
+def iter_window_corpus(data_path, chunker):
+    """(teks chunk, key ayat) jendela tetap, dialirkan dari offset chunking.iter_quran_chunks."""
+    from insert_data import extract_ayah_number
+
+    names = {}
+
+    def surahs():
+        for surah in iter_surahs(data_path):
+            names[surah["number"]] = surah["name_latin"]
+            yield surah
+
+    for span in iter_quran_chunks(surahs(), chunker.max_tokens, chunker.overlap, chunker.count_tokens):
+        name = names[span.surah_number]
+        ayah_num = extract_ayah_number(span.verse_number)
+        yield f"[{SPAN_SOURCES[span.type]} {name}:{ayah_num}] {span.text}", clean_key(name, ayah_num)
+
+def build_chunk_corpus(data_path, chunker):
+    """Teks chunk (format sama dengan insert_data) dan key ayat-nya untuk satu chunker."""
+    from insert_data import build_chunk_rows, extract_ayah_number
+
+    if isinstance(chunker, WindowChunker):
+        pairs = list(iter_window_corpus(data_path, chunker))
+        return [text for text, _ in pairs], [key for _, key in pairs]
+
+    texts, keys = [], []
+    for record in iter_ayat_records(data_path):
+        surah = record["surah"]
+        ayah_num = extract_ayah_number(record["ayah_key"])
+        sources = {"text": record["text"], "translation": record["translation"], "tafsir": record["tafsir"]}
+        for row in build_chunk_rows(surah["number"], surah["name_latin"], ayah_num, sources, chunker=chunker):
+            texts.append(row["text"])
+            keys.append(clean_key(surah["name_latin"], ayah_num))
+    return texts, keys
+
+def compare_chunkers(ground_truth, chunkers=("window", "semantic")):
+    """Bandingkan recall/MRR chunker jendela tetap dan chunker semantik secara offline.
+
+    Korpus dipotong ulang dari quran.json dengan tiap chunker, di-embed lewat cache
+    embedding, lalu dicari secara brute force sehingga Neo4j tidak perlu diisi ulang.
+    Jendela tetap memakai batas maksimum yang sama dengan chunker semantik
+    (SEMANTIC_CHUNK_MAX_TOKENS kata) agar yang dibandingkan hanya cara memotongnya.
+    """
+    sizes = {
+        "window": f"≤{SEMANTIC_CHUNK_MAX_TOKENS}",
+        "semantic": f"{SEMANTIC_CHUNK_MIN_TOKENS}–{SEMANTIC_CHUNK_MAX_TOKENS}",
+    }
+
+    queries = list(ground_truth)
+    query_matrix = normalize_rows(embed_matrix(queries))
+    relevant = [normalize_relevant(ground_truth[q]) for q in queries]
+
+    print(f"📊 Perbandingan chunker ({len(queries)} query):")
+    print("-" * 100)
+    print(f"{'Chunker':<12}{'Batas kata':>10}{'Chunk':>9}{'Kata/chunk':>12}{'Recall@' + str(TOP_K):>10}{'MRR':>8}"
+          f"{'Δ Recall':>10}{'Δ MRR':>8}{'Potong (s)':>12}")
+
+    base = None
+    for name in chunkers:
+        chunker = get_chunker(name, max_tokens=SEMANTIC_CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP)
+        start = time.time()
+        texts, keys = build_chunk_corpus(QURAN_DATA_PATH, chunker)
+        chunk_seconds = time.time() - start
+
+        corpus = normalize_rows(embed_matrix(texts))
+        top = brute_force_search(query_matrix, corpus, TOP_K)
+        total_r, total_mrr = 0, 0
+        for row, relevant_keys in zip(top, relevant):
+            _, r, mrr = compute_metrics([keys[i] for i in row], relevant_keys)
+            total_r += r
+            total_mrr += mrr
+        recall, mrr = total_r / len(queries), total_mrr / len(queries)
+        base = base or (recall, mrr)
+
+        words = sum(len(t.split()) for t in texts) / len(texts) if texts else 0
+        print(f"{name:<12}{sizes.get(name, ''):>10}{len(texts):>9}{words:>12.1f}{recall:>10.4f}{mrr:>8.4f}"
+              f"{recall - base[0]:>+10.4f}{mrr - base[1]:>+8.4f}{chunk_seconds:>12.1f}")
+
+def run_evaluation(ground_truth, mode=None, verbose=True):
     total_p, total_r, total_mrr = 0, 0, 0
     n = len(ground_truth)
+    start = time.time()
 
-    print("📊 Evaluasi Retrieval:")
+    print(f"📊 Evaluasi Retrieval{f' (mode {mode})' if mode else ''}:")
     print("-" * 60)
 
-    for query, relevant in ground_truth.items():
-        print(f"\n💬 Query: {query}")
-        p, r, mrr = evaluate_query(query, relevant)
-        print(f"✅ Precision@{TOP_K}: {p:.4f}")
-        print(f"✅ Recall@{TOP_K}: {r:.4f}")
-        print(f"✅ MRR: {mrr:.4f}")
+    # Semua query di-embed sekaligus; mode vector juga menggabungkan lookup index-nya
+    batch_results = vector_search_chunks_batch(list(ground_truth), top_k=TOP_K, mode=mode)
+
+    for query, relevant, retrieved in zip(ground_truth, ground_truth.values(), batch_results):
+        if verbose:
+            print(f"\n💬 Query: {query}")
+        p, r, mrr = evaluate_query(query, relevant, mode=mode, retrieved=retrieved, verbose=verbose)
+        if verbose:
+            print(f"✅ Precision@{TOP_K}: {p:.4f}")
+            print(f"✅ Recall@{TOP_K}: {r:.4f}")
+            print(f"✅ MRR: {mrr:.4f}")
 
         total_p += p
         total_r += r
@@ -75,5 +267,53 @@ def main():
     print(f"📌 Mean Recall@{TOP_K}: {total_r / n:.4f}")
     print(f"📌 Mean MRR: {total_mrr / n:.4f}")
 
+    return {
+        "precision": total_p / n,
+        "recall": total_r / n,
+        "mrr": total_mrr / n,
+        "ms_per_query": (time.time() - start) * 1000 / n,
+    }
+
+def compare_modes(ground_truth, modes, verbose=True):
+    """Jalankan evaluasi untuk beberapa mode pencarian dan tampilkan lift terhadap mode pertama."""
+    results = {mode: run_evaluation(ground_truth, mode=mode, verbose=verbose) for mode in modes}
+    base = results[modes[0]]
+
+    print(f"\n📊 Perbandingan mode pencarian (lift terhadap '{modes[0]}'):")
+    print("-" * 60)
+    print(f"{'Mode':<10}{'P@' + str(TOP_K):>10}{'R@' + str(TOP_K):>10}{'MRR':>10}{'Δ R':>10}{'Δ MRR':>10}{'ms/query':>10}")
+    for mode, m in results.items():
+        print(f"{mode:<10}{m['precision']:>10.4f}{m['recall']:>10.4f}{m['mrr']:>10.4f}"
+              f"{m['recall'] - base['recall']:>+10.4f}{m['mrr'] - base['mrr']:>+10.4f}{m['ms_per_query']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluasi retrieval terhadap ground truth")
+    parser.add_argument("--mode", choices=["vector", "hybrid", "graph"], default=None,
+                        help="Mode pencarian (default: SEARCH_MODE di config)")
+    parser.add_argument("--compare-modes", action="store_true",
+                        help="Bandingkan mode vector, hybrid, dan graph serta tampilkan lift-nya")
+    parser.add_argument("--compare-transforms", action="store_true",
+                        help="Bandingkan biaya recall/MRR tiap pengaturan reduksi dimensi dan kuantisasi")
+    parser.add_argument("--compare-chunkers", action="store_true",
+                        help="Bandingkan recall/MRR chunker jendela tetap dan semantik (offline, dari quran.json)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Hanya tampilkan ringkasan, tanpa detail per query")
+    args = parser.parse_args()
+
+    with open(GROUND_TRUTH_PATH, "r", encoding="utf-8") as f:
+        ground_truth = json.load(f)
+
+    if args.compare_transforms:
+        compare_transforms(ground_truth)
+    elif args.compare_chunkers:
+        compare_chunkers(ground_truth)
+    elif args.compare_modes:
+        compare_modes(ground_truth, ["vector", "hybrid", "graph"], verbose=not args.quiet)
+    else:
+        run_evaluation(ground_truth, mode=args.mode, verbose=not args.quiet)
+
+    if Embedder.cache is not None:
+        Embedder.cache.report()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
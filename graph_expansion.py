@@ -0,0 +1,162 @@
+# graph_expansion.py
+import threading
+import time
+
+import numpy as np
+
+from query_cache import current_version
+from verse_ref import REFERENCE_CHUNK_QUERY, SOURCE_ORDER, reference_params
+
+RELATIONS_QUERY = """
+MATCH (a:Ayat)-[r:RELATED_TO]->(b:Ayat)
+RETURN a.surah_number AS surah_1, a.number AS ayat_1,
+       b.surah_number AS surah_2, b.number AS ayat_2,
+       r.similarity AS similarity
+"""
+
+
+class AyatAdjacency:
+    """Tetangga RELATED_TO dalam format CSR (compressed sparse row).
+
+    Tetangga ayat ke-i ada di indices[indptr[i]:indptr[i + 1]] dengan bobot
+    similarity di weights, terurut dari yang paling mirip.
+    """
+
+    def __init__(self, keys, indptr, indices, weights):
+        self.keys = keys  # [(nomor surah, nomor ayat), ...]
+        self.position = {key: i for i, key in enumerate(keys)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_records(cls, records):
+        edges = [
+            ((r["surah_1"], r["ayat_1"]), (r["surah_2"], r["ayat_2"]), r["similarity"])
+            for r in records
+        ]
+        keys = sorted({key for a, b, _ in edges for key in (a, b)})
+        position = {key: i for i, key in enumerate(keys)}
+
+        src = np.fromiter((position[a] for a, _, _ in edges), dtype=np.int32, count=len(edges))
+        dst = np.fromiter((position[b] for _, b, _ in edges), dtype=np.int32, count=len(edges))
+        weights = np.fromiter((w for _, _, w in edges), dtype=np.float32, count=len(edges))
+
+        # Urutkan per ayat asal, lalu similarity menurun
+        order = np.lexsort((-weights, src))
+        src, dst, weights = src[order], dst[order], weights[order]
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(keys)), out=indptr[1:])
+        return cls(keys, indptr, dst, weights)
+
+    @classmethod
+    def load(cls, driver):
+        records, _, _ = driver.execute_query(RELATIONS_QUERY)
+        return cls.from_records(records)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def neighbours(self, key, limit, min_similarity):
+        i = self.position.get(key)
+        if i is None:
+            return []
+        start, end = self.indptr[i], self.indptr[i + 1]
+        weights = self.weights[start:end][:limit]
+        indices = self.indices[start:end][:limit]
+        return [
+            (self.keys[j], float(w))
+            for j, w in zip(indices, weights)
+            if w >= min_similarity
+        ]
+
+
+class AdjacencyCache:
+    """Adjacency dimuat sekali per proses dan dimuat ulang hanya jika knn.py
+    menaikkan versi "relations" (lihat query_cache.bump_version)."""
+
+    def __init__(self):
+        self.adjacency = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return self.adjacency is None or self.version != current_version("relations")
+
+    def set(self, adjacency, version):
+        self.adjacency = adjacency
+        self.version = version
+        print(f"🕸️ Adjacency RELATED_TO dimuat: {len(adjacency.keys)} ayat, {adjacency.edge_count} relasi")
+
+    def get(self, driver):
+        with self.lock:
+            if self.is_stale():
+                version = current_version("relations")
+                start = time.perf_counter()
+                self.set(AyatAdjacency.load(driver), version)
+                print(f"⏱️ Dimuat dalam {time.perf_counter() - start:.2f} detik")
+            return self.adjacency
+
+
+def plan_expansion(adjacency, hits, neighbours_per_hit, min_similarity):
+    """Tentukan ayat tetangga yang ditambahkan beserta skornya (skor hit × similarity).
+
+    Ayat yang sudah ada di hasil awal tidak ditambahkan lagi; jika satu ayat
+    bertetangga dengan beberapa hit, skor tertinggi yang dipakai.
+    """
+    hit_keys = {(h["surah_number"], h["ayat_number"]) for h in hits}
+    planned = {}
+    for hit in hits:
+        key = (hit["surah_number"], hit["ayat_number"])
+        for neighbour, similarity in adjacency.neighbours(key, neighbours_per_hit, min_similarity):
+            if neighbour in hit_keys:
+                continue
+            score = hit["score"] * similarity
+            if neighbour not in planned or score > planned[neighbour][0]:
+                planned[neighbour] = (score, key, similarity)
+    return planned
+
+
+def attach_neighbour_chunks(planned, records):
+    """Satu chunk per ayat tetangga (terjemahan lebih dulu) dengan skor hasil ekspansi."""
+    refs = list(planned)
+    best = {}
+    for r in records:
+        row = r if isinstance(r, dict) else r.data()
+        i = row.pop("ref_index")
+        rank = SOURCE_ORDER.get(row["source"], len(SOURCE_ORDER))
+        if i not in best or rank < best[i][0]:
+            best[i] = (rank, row)
+
+    expanded = []
+    for i, (_, row) in best.items():
+        score, origin, similarity = planned[refs[i]]
+        expanded.append({
+            **row,
+            "score": score,
+            "expanded_from": f"{origin[0]}:{origin[1]}",
+            "similarity": similarity,
+        })
+    return expanded
+
+
+def rescore(hits, expanded, top_k):
+    combined = [dict(h) for h in hits] + expanded
+    combined.sort(key=lambda r: r["score"], reverse=True)
+    return combined[:top_k]
+
+
+def expand_hits(driver, adjacency, hits, top_k, neighbours_per_hit, min_similarity):
+    """Perluas hit dengan tetangga RELATED_TO satu hop lalu urutkan ulang.
+
+    Tetangga dicari di adjacency dalam memori; chunk-nya diambil dengan satu
+    query berindeks Chunk(surah_number, ayat_number).
+    """
+    hits = [h if isinstance(h, dict) else h.data() for h in hits]
+    planned = plan_expansion(adjacency, hits, neighbours_per_hit, min_similarity)
+    if not planned:
+        return rescore(hits, [], top_k)
+
+    records, _, _ = driver.execute_query(REFERENCE_CHUNK_QUERY, reference_params(list(planned)))
+    return rescore(hits, attach_neighbour_chunks(planned, records), top_k)
@@ -1,29 +1,81 @@
 # embedder.py
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from neo4j_graphrag.embeddings.base import Embedder as BaseEmbedder
+from config import EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from embedding_cache import EmbeddingCache
 
 class OllamaEmbedder(BaseEmbedder):
-    def __init__(self, model_name="gte-qwen2-7b-instruct", host="http://localhost:11434"):
+    def __init__(self, model_name="gte-qwen2-7b-instruct", host="http://localhost:11434",
+                 batch_size=32, max_workers=4, timeout=120, cache=None):
         self.model = model_name
         self.host = host
         self.max_tokens = 8192
         self.chunk_overlap = 128
+        self.batch_size = batch_size  # Jumlah teks per request ke /api/embed
+        self.max_workers = max_workers  # Jumlah request yang boleh berjalan bersamaan
+        self.timeout = timeout
+        self.cache = cache  # EmbeddingCache opsional di depan semua pemanggilan embed
+
+        # Satu Session dengan pool koneksi agar koneksi keep-alive dipakai ulang
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-    def _embed(self, text: str):
-        response = requests.post(
-            f"{self.host}/api/embeddings",
+    def _embed_batch(self, texts):
+        # Semua jalur memakai /api/embed (vektor ternormalisasi L2); /api/embeddings yang lama
+        # mengembalikan vektor tanpa normalisasi, padahal cache-nya memakai key yang sama
+        response = self.session.post(
+            f"{self.host}/api/embed",
             json={
                 "model": self.model,
-                "prompt": text
-            }
+                "input": texts
+            },
+            timeout=self.timeout
         )
         response.raise_for_status()
-        return response.json()["embedding"]
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"❌ Jumlah embedding ({len(embeddings)}) tidak sama dengan jumlah teks ({len(texts)})")
+        return embeddings
+
+    def _embed_texts_uncached(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_workers <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # executor.map menjaga urutan batch walaupun selesai tidak berurutan
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+
+        return [vector for batch in results for vector in batch]
+
+    def embed_texts(self, texts):
+        """Embed banyak teks sekaligus; urutan hasil sama dengan urutan input."""
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed_texts_uncached(texts)
+
+        vectors = self.cache.get_many(self.model, texts)
+        # Teks yang belum ada di cache (tanpa duplikat) di-embed sekali saja
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = dict(zip(missing, self._embed_texts_uncached(missing)))
+            self.cache.put_many(self.model, missing, [computed[t] for t in missing])
+            vectors = [v if v is not None else computed[t] for t, v in zip(texts, vectors)]
+        return vectors
 
     def embed_text(self, text: str):
-        return self._embed(text)
+        return self.embed_texts([text])[0]
 
     def embed_query(self, query: str):
-        return self._embed(query)
+        return self.embed_texts([query])[0]
 
-Embedder = OllamaEmbedder()
+Embedder = OllamaEmbedder(
+    cache=EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES) if EMBEDDING_CACHE_ENABLED else None
+)
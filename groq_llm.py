@@ -1,57 +1,508 @@
 # groq_llm.py
-import requests
-import time
+import argparse
+import asyncio
+from itertools import islice
+import json
 import random
-from config import GROQ_API_KEY, GROQ_MODEL
+import re
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    GROQ_API_URL,
+    CONTEXT_CHARS_PER_TOKEN,
+    GROQ_REQUESTS_PER_MINUTE,
+    GROQ_TOKENS_PER_MINUTE,
+    GROQ_BREAK_CONCURRENCY,
+    GROQ_PACK_MAX_SECTIONS,
+    GROQ_PACK_MAX_TOKENS,
+    GROQ_MAX_RETRIES,
+    GROQ_BREAK_CACHE_PATH,
+    QURAN_DATA_PATH,
+)
+from embedding_cache import cache_key
+from quran_reader import iter_ayat_records
+from utils import split_sentences
+
+BREAK_PROMPT = """
+Berikut adalah beberapa bagian tafsir yang bernomor. Untuk setiap bagian, tandai kalimat keberapa yang merupakan akhir dari satu unit makna/penjelasan.
+Kembalikan hanya JSON dengan key nomor bagian dan value daftar nomor kalimat.
+
+{sections}
+
+Contoh output:
+{{"1": [2, 5, 9], "2": [3]}}
+
+Jawaban:
+"""
+
+# Perkiraan token output per bagian (daftar angka dalam JSON)
+OUTPUT_TOKENS_PER_SECTION = 30
+RESPONSE_TIMEOUT = 60  # Detik
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+NUMBER_PATTERN = re.compile(r"\d+")
+SECTION_LINE_PATTERN = re.compile(r"^\W*(?:bagian\s*)?(\d+)\W*[:=\-]\s*(.*)$", re.IGNORECASE)
 
-def detect_semantic_breaks(sentences, max_retries=5):
-    prompt = f"""
-    Berikut adalah daftar kalimat dari sebuah tafsir. Tandai kalimat keberapa yang merupakan akhir dari satu unit makna/penjelasan. Kembalikan hanya daftar angka.
 
-    Kalimat-kalimat:
-    {chr(10).join([f"{i+1}. {s}" for i, s in enumerate(sentences)])}
+def estimate_tokens(text):
+    return len(text) // CONTEXT_CHARS_PER_TOKEN + 1
 
-    Contoh output:
-    [2, 5, 9]
 
-    Jawaban:
+def parse_duration(value):
+    """Durasi dari header rate limit ("2m59.56s", "7.66s", "250ms", atau angka detik)."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = DURATION_PATTERN.findall(value)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+
+def parse_breaks(content, n_sentences=None):
+    """Ambil nomor kalimat akhir unit makna dari jawaban LLM ("[2, 5, 9]", satu angka per baris, dll).
+
+    Nomor di luar 1..n_sentences dibuang; hasil terurut tanpa duplikat.
     """
+    numbers = {int(n) for n in NUMBER_PATTERN.findall(str(content))}
+    return sorted(n for n in numbers if n >= 1 and (n_sentences is None or n <= n_sentences))
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.3
-    }
-
-    for attempt in range(max_retries):
+
+def first_json_object(content):
+    """Objek JSON pertama di dalam teks (mis. di dalam ```json ... ``` diikuti catatan), atau None."""
+    decoder = json.JSONDecoder()
+    start = content.find("{")
+    while start != -1:
         try:
-            response = requests.post(url, headers=headers, json=data)
+            value, _ = decoder.raw_decode(content, start)
+        except ValueError:
+            value = None
+        if isinstance(value, dict):
+            return value
+        start = content.find("{", start + 1)
+    return None
+
+
+def parse_packed_breaks(content, sizes):
+    """Pecah jawaban prompt berisi banyak bagian menjadi daftar batas per bagian.
+
+    Utamanya JSON {"1": [...], "2": [...]}; jika LLM menjawab per baris
+    ("Bagian 1: 2, 5") itu juga diterima. Bagian yang tidak ada di jawaban
+    bernilai None agar bisa dicoba ulang.
+    """
+    sections = {}
+    data = first_json_object(content)
+    if data is not None:
+        sections = {str(key).strip(): value for key, value in data.items()}
+    if not sections:
+        for line in content.splitlines():
+            line_match = SECTION_LINE_PATTERN.match(line.strip())
+            if line_match:
+                sections[line_match.group(1)] = line_match.group(2)
+    if not sections and len(sizes) == 1:
+        # Prompt satu bagian sering dijawab tanpa nomor bagian, mis. "[2, 5, 9]"
+        return [parse_breaks(content, sizes[0])]
+
+    results = []
+    for i, size in enumerate(sizes, start=1):
+        value = sections.get(str(i))
+        results.append(None if value is None else parse_breaks(json.dumps(value), size))
+    return results
+
+
+def chunks_from_breaks(sentences, breaks):
+    """Gabungkan kalimat menjadi unit makna yang berakhir di setiap nomor batas."""
+    chunks = []
+    start = 0
+    for end in breaks + [len(sentences)]:
+        if end > start:
+            chunks.append(" ".join(sentences[start:end]))
+            start = end
+    return chunks
+
+
+class BreakCache:
+    """Cache posisi batas unit makna di disk (SQLite), key = hash (model, daftar kalimat)."""
+
+    def __init__(self, path=GROQ_BREAK_CACHE_PATH, model=GROQ_MODEL):
+        self.path = path
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS breaks (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                breaks TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def key(self, sentences):
+        # JSON mempertahankan batas antar kalimat walaupun spasi dinormalisasi
+        return cache_key(f"{self.model}|breaks", json.dumps(sentences, ensure_ascii=False))
+
+    def get_many(self, passages):
+        keys = [self.key(sentences) for sentences in passages]
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                found.update(self.conn.execute(
+                    f"SELECT key, breaks FROM breaks WHERE key IN ({placeholders})", part
+                ).fetchall())
+        results = []
+        for key in keys:
+            if key in found:
+                self.hits += 1
+                results.append(json.loads(found[key]))
+            else:
+                self.misses += 1
+                results.append(None)
+        return results
+
+    def put_many(self, passages, breaks_list):
+        now = time.time()
+        rows = [
+            (self.key(sentences), self.model, json.dumps(breaks), now)
+            for sentences, breaks in zip(passages, breaks_list)
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO breaks (key, model, breaks, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM breaks").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TokenBucket:
+    """Bucket kuota yang terisi kembali secara kontinu (capacity per window detik)."""
+
+    def __init__(self, capacity, window=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / window
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def sync(self, limit, remaining, reset, now):
+        """Samakan dengan header provider: sisa kuota dan waktu sampai kuota penuh kembali."""
+        if limit:
+            self.capacity = float(limit)
+        if remaining is None:
+            return
+        self.level = min(self.capacity, float(remaining))
+        self.updated = now
+        if reset and self.capacity > self.level:
+            self.rate = (self.capacity - self.level) / reset
+
+
+class RateLimiter:
+    """Pembatas request dan token per menit sisi klien yang mengikuti header Groq.
+
+    Kuota awal berasal dari config; setiap respons memperbarui bucket token dari
+    header x-ratelimit-{limit,remaining,reset}-tokens (per menit). Header
+    *-requests di Groq berlaku per hari, sehingga tidak dipakai untuk bucket
+    request per menit; jika kuota harian habis semua request ditahan sampai
+    reset-nya. Saat 429, semua request ditahan sampai retry-after berlalu,
+    bukan hanya request yang gagal.
+    """
+
+    def __init__(self, requests_per_minute=GROQ_REQUESTS_PER_MINUTE, tokens_per_minute=GROQ_TOKENS_PER_MINUTE):
+        self.buckets = {
+            "requests": TokenBucket(requests_per_minute),
+            "tokens": TokenBucket(tokens_per_minute),
+        }
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        # Lock dipegang selama menunggu sehingga request dilayani berurutan (FIFO)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self.paused_until - now,
+                    self.buckets["requests"].wait_time(1, now),
+                    self.buckets["tokens"].wait_time(tokens, now),
+                )
+                if wait <= 0:
+                    break
+                self.waited += wait
+                await asyncio.sleep(wait)
+            self.buckets["requests"].take(1, now)
+            self.buckets["tokens"].take(tokens, now)
+
+    def update(self, headers):
+        now = time.monotonic()
+        self.buckets["tokens"].sync(
+            headers.get("x-ratelimit-limit-tokens"),
+            headers.get("x-ratelimit-remaining-tokens"),
+            parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            now,
+        )
+        daily_remaining = headers.get("x-ratelimit-remaining-requests")
+        if daily_remaining is not None and float(daily_remaining) <= 0:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                print(f"⏳ Kuota request harian Groq habis, menunggu {reset:.1f} detik")
+                self.pause(reset)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def retry_delay(headers, attempt):
+    """Lama menunggu setelah 429: retry-after, lalu reset kuota token (per menit) atau
+    request (per hari), lalu backoff eksponensial."""
+    for name in ("retry-after", "x-ratelimit-reset-tokens", "x-ratelimit-reset-requests"):
+        delay = parse_duration(headers.get(name))
+        if delay:
+            return delay
+    return backoff_delay(attempt)
+
+
+def backoff_delay(attempt):
+    return min(60.0, 2.0 ** attempt) + random.uniform(0, 1)
+
+
+class SemanticBreakScheduler:
+    """Deteksi batas unit makna untuk banyak tafsir sekaligus lewat Groq.
+
+    Tafsir yang sudah ada di BreakCache tidak dikirim lagi; sisanya dikemas
+    beberapa bagian per prompt (bagian bernomor, jawaban JSON) dan dikirim
+    bersamaan di bawah RateLimiter. Bagian yang hilang dari jawaban dikirim
+    ulang sendiri-sendiri satu kali. Hasil kosong karena kegagalan tidak disimpan.
+    """
+
+    def __init__(self, cache=None, limiter=None, concurrency=GROQ_BREAK_CONCURRENCY,
+                 max_sections=GROQ_PACK_MAX_SECTIONS, max_tokens=GROQ_PACK_MAX_TOKENS,
+                 max_retries=GROQ_MAX_RETRIES, api_url=GROQ_API_URL):
+        self.cache = cache
+        self.limiter = limiter or RateLimiter()
+        self.concurrency = concurrency
+        self.max_sections = max_sections
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.api_url = api_url
+        self.stats = {"requests": 0, "rate_limited": 0, "sections": 0, "retried_sections": 0, "failed": 0}
+
+    @staticmethod
+    def render_section(number, sentences):
+        lines = "\n".join(f"{i + 1}. {s}" for i, s in enumerate(sentences))
+        return f"### Bagian {number}\n{lines}"
+
+    def pack(self, passages):
+        """Kelompokkan (index, kalimat) menjadi prompt dalam batas jumlah bagian dan token."""
+        packs = []
+        current = []
+        current_tokens = 0
+        for index, sentences in passages:
+            tokens = estimate_tokens(self.render_section(len(current) + 1, sentences))
+            if current and (len(current) >= self.max_sections or current_tokens + tokens > self.max_tokens):
+                packs.append(current)
+                current = []
+                current_tokens = 0
+            current.append((index, sentences))
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    async def _complete(self, client, prompt, max_tokens):
+        cost = estimate_tokens(prompt) + max_tokens
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(cost)
+            self.stats["requests"] += 1
+            try:
+                response = await client.post(
+                    self.api_url,
+                    json={
+                        "model": GROQ_MODEL,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": 0.3,
+                        "max_tokens": max_tokens,
+                    },
+                )
+            except httpx.HTTPError as e:
+                delay = backoff_delay(attempt)
+                print(f"❌ Error saat akses Groq API: {str(e)}, mencoba lagi dalam {delay:.1f} detik")
+                await asyncio.sleep(delay)
+                continue
+
+            self.limiter.update(response.headers)
             if response.status_code == 429:
-                wait_time = 60 + random.randint(5, 15)
-                print(f"⏳ Rate limit tercapai (429), menunggu {wait_time} detik... [Percobaan ke-{attempt+1}]")
-                time.sleep(wait_time)
+                delay = retry_delay(response.headers, attempt)
+                self.stats["rate_limited"] += 1
+                print(f"⏳ Rate limit tercapai (429), semua request ditunda {delay:.1f} detik... "
+                      f"[Percobaan ke-{attempt + 1}]")
+                self.limiter.pause(delay)
                 continue
-            response.raise_for_status()
-            result = response.json()
-            content = result["choices"][0]["message"]["content"]
+            if response.status_code >= 500:
+                delay = backoff_delay(attempt)
+                print(f"❌ Groq API error {response.status_code}, mencoba lagi dalam {delay:.1f} detik")
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code != 200:
+                print(f"❌ Error dari Groq: {response.status_code}, {response.text}")
+                return None
+            return response.json()["choices"][0]["message"]["content"]
 
-            # Ekstrak angka dari respons LLM
-            try:
-                breaks = [int(num.strip()) for num in content.split('\n') if num.strip().isdigit()]
-                return breaks
-            except Exception as e:
-                print("❌ Gagal parse response LLM:", content)
-                return []
-        except requests.RequestException as e:
-            print(f"❌ Error saat akses Groq API: {str(e)}")
-            time.sleep(5 + attempt * 2)
-
-    print("❌ Gagal mendapatkan respons setelah beberapa kali percobaan.")
-    return []
+        print("❌ Gagal mendapatkan respons setelah beberapa kali percobaan.")
+        return None
+
+    async def _run_pack(self, client, semaphore, pack, results):
+        prompt = BREAK_PROMPT.format(
+            sections="\n\n".join(self.render_section(i + 1, sentences) for i, (_, sentences) in enumerate(pack))
+        )
+        async with semaphore:
+            content = await self._complete(client, prompt, OUTPUT_TOKENS_PER_SECTION * len(pack) + 20)
+        if content is None:
+            return
+        parsed = parse_packed_breaks(content, [len(sentences) for _, sentences in pack])
+        for (index, _), breaks in zip(pack, parsed):
+            if breaks is not None:
+                results[index] = breaks
+        self.stats["sections"] += len(pack)
+
+    async def _run(self, passages, results):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(
+            timeout=RESPONSE_TIMEOUT,
+            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        ) as client:
+            packs = self.pack(passages)
+            await asyncio.gather(*(self._run_pack(client, semaphore, pack, results) for pack in packs))
+
+            # Bagian yang tidak dijawab di prompt gabungan dicoba ulang sendiri-sendiri
+            missing = [(index, sentences) for pack in packs if len(pack) > 1
+                       for index, sentences in pack if results[index] is None]
+            if missing:
+                self.stats["retried_sections"] += len(missing)
+                await asyncio.gather(*(self._run_pack(client, semaphore, [item], results) for item in missing))
+
+    async def detect_many(self, passages):
+        """Batas unit makna (nomor kalimat, mulai 1) untuk setiap daftar kalimat di passages."""
+        passages = [list(sentences) for sentences in passages]
+        results = [None] * len(passages)
+        cached = self.cache.get_many(passages) if self.cache is not None else [None] * len(passages)
+
+        # Teks yang sama hanya dikirim sekali
+        pending = {}
+        for i, (sentences, breaks) in enumerate(zip(passages, cached)):
+            if breaks is not None:
+                results[i] = breaks
+            elif len(sentences) <= 1:
+                results[i] = []
+            else:
+                pending.setdefault(json.dumps(sentences, ensure_ascii=False), []).append(i)
+
+        unique = [(indexes[0], passages[indexes[0]]) for indexes in pending.values()]
+        if unique:
+            await self._run(unique, results)
+
+        answered = [i for i, _ in unique if results[i] is not None]
+        if self.cache is not None and answered:
+            self.cache.put_many([passages[i] for i in answered], [results[i] for i in answered])
+        for indexes in pending.values():
+            if results[indexes[0]] is None:
+                self.stats["failed"] += 1
+            for i in indexes:
+                results[i] = results[indexes[0]] or []
+        return results
+
+    def report(self):
+        s = self.stats
+        print(
+            f"📊 Groq: {s['requests']} request untuk {s['sections']} bagian, {s['rate_limited']} kali 429, "
+            f"{s['retried_sections']} bagian dicoba ulang, {s['failed']} gagal, "
+            f"menunggu kuota {self.limiter.waited:.1f} detik"
+        )
+        if self.cache is not None:
+            c = self.cache.stats()
+            print(f"🗄️ Cache batas: {c['hits']} hit, {c['misses']} miss, {c['entries']} entri tersimpan")
+
+
+def detect_semantic_breaks_many(passages, cache_path=GROQ_BREAK_CACHE_PATH, **kwargs):
+    """Versi sinkron SemanticBreakScheduler.detect_many dengan cache di disk."""
+    cache = BreakCache(cache_path) if cache_path else None
+    scheduler = SemanticBreakScheduler(cache=cache, **kwargs)
+    try:
+        return asyncio.run(scheduler.detect_many(passages))
+    finally:
+        scheduler.report()
+        if cache is not None:
+            cache.close()
+
+
+def detect_semantic_breaks(sentences, max_retries=GROQ_MAX_RETRIES):
+    return detect_semantic_breaks_many([sentences], max_retries=max_retries)[0]
+
+
+def iter_kemenag_tafsir(data_path=QURAN_DATA_PATH):
+    for record in iter_ayat_records(data_path):
+        if record["tafsir"]:
+            yield record["surah"]["number"], record["ayah_key"], record["tafsir"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deteksi batas unit makna seluruh tafsir Kemenag lewat Groq")
+    parser.add_argument("--path", default=QURAN_DATA_PATH,
+                        help="quran.json, salinan .gz/JSON-lines, direktori shard, atau pola glob")
+    parser.add_argument("--limit", type=int, default=None, help="Jumlah tafsir maksimum yang diproses")
+    parser.add_argument("--no-cache", action="store_true", help="Jangan baca/tulis cache batas")
+    parser.add_argument("--api-url", default=GROQ_API_URL,
+                        help="Endpoint chat completions, mis. server tiruan dari groq_stub.py")
+    args = parser.parse_args()
+
+    passages = [split_sentences(text) for _, _, text in islice(iter_kemenag_tafsir(args.path), args.limit)]
+
+    start = time.time()
+    breaks_list = detect_semantic_breaks_many(
+        passages, cache_path=None if args.no_cache else GROQ_BREAK_CACHE_PATH, api_url=args.api_url
+    )
+    total_units = sum(len(chunks_from_breaks(p, b)) for p, b in zip(passages, breaks_list))
+    print(f"✅ {len(passages)} tafsir → {total_units} unit makna dalam {time.time() - start:.1f} detik")
@@ -0,0 +1,137 @@
+# groq_stub.py
+import argparse
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECTION_PATTERN = re.compile(r"^### Bagian (\d+)\n((?:\d+\. .*\n?)*)", re.MULTILINE)
+
+
+class StubState:
+    """Kuota tiruan ala Groq: request per menit (429 jika lewat), token per menit, request per hari."""
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, requests_per_day=1000,
+                 fail_every=0, drop_every=0, latency=0.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_day = requests_per_day
+        self.fail_every = fail_every  # Setiap request ke-n dijawab 429 walaupun kuota masih ada
+        self.drop_every = drop_every  # Setiap jawaban ke-n kehilangan bagian terakhirnya
+        self.latency = latency
+        self.requests = deque()  # (waktu, token) dalam 60 detik terakhir
+        self.day_count = 0
+        self.count = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    def admit(self, tokens):
+        """(status, header) untuk satu request; status 429 jika kuota per menit terlampaui."""
+        with self.lock:
+            now = time.monotonic()
+            while self.requests and now - self.requests[0][0] >= 60:
+                self.requests.popleft()
+            self.count += 1
+            used_tokens = sum(t for _, t in self.requests)
+            if self.fail_every and self.count % self.fail_every == 0:
+                self.rate_limited += 1
+                return 429, {"retry-after": "1"}
+            if len(self.requests) >= self.requests_per_minute or used_tokens + tokens > self.tokens_per_minute:
+                self.rate_limited += 1
+                # Sampai request tertua keluar dari jendela 60 detik
+                retry_after = 60 - (now - self.requests[0][0]) if self.requests else 1.0
+                return 429, {"retry-after": f"{max(retry_after, 0.1):.2f}"}
+
+            self.requests.append((now, tokens))
+            self.day_count += 1
+            used_tokens += tokens
+            # Header request berlaku per hari, header token per menit (seperti Groq)
+            return 200, {
+                "x-ratelimit-limit-requests": str(self.requests_per_day),
+                "x-ratelimit-remaining-requests": str(max(0, self.requests_per_day - self.day_count)),
+                "x-ratelimit-reset-requests": f"{86400 / self.requests_per_day:.2f}s",
+                "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+                "x-ratelimit-remaining-tokens": str(max(0, self.tokens_per_minute - used_tokens)),
+                "x-ratelimit-reset-tokens": f"{60 * used_tokens / self.tokens_per_minute:.2f}s",
+            }
+
+
+def answer_breaks(prompt, drop_last=False):
+    """Jawaban tiruan BREAK_PROMPT: setiap bagian dipotong per dua kalimat."""
+    answer = {}
+    for number, lines in SECTION_PATTERN.findall(prompt):
+        n_sentences = len([line for line in lines.splitlines() if line.strip()])
+        answer[number] = list(range(2, n_sentences, 2))
+    if drop_last and len(answer) > 1:
+        answer.pop(max(answer, key=int))
+    return f"```json\n{json.dumps(answer)}\n```\nCatatan: batas dipilih per {{dua kalimat}}."
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, headers, body=b""):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = payload["messages"][0]["content"]
+            tokens = len(prompt) // 4 + payload.get("max_tokens", 0)
+            status, headers = state.admit(tokens)
+            if status == 429:
+                body = json.dumps({"error": {"message": "Rate limit reached", "type": "tokens"}}).encode()
+                self._send(429, {**headers, "Content-Type": "application/json"}, body)
+                return
+
+            if state.latency:
+                time.sleep(state.latency)
+            drop_last = bool(state.drop_every and state.day_count % state.drop_every == 0)
+            body = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": answer_breaks(prompt, drop_last)}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 20},
+            }).encode()
+            self._send(200, {**headers, "Content-Type": "application/json"}, body)
+
+    return Handler
+
+
+def start_stub_server(state=None, host="127.0.0.1", port=0):
+    """Jalankan server tiruan di thread latar; kembalikan (server, url endpoint chat completions)."""
+    state = state or StubState()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/openai/v1/chat/completions"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Server tiruan Groq chat completions (header rate limit + 429) untuk groq_llm.py --api-url"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=int, default=30, help="Request per menit sebelum 429")
+    parser.add_argument("--tpm", type=int, default=6000, help="Token per menit sebelum 429")
+    parser.add_argument("--rpd", type=int, default=1000, help="Request per hari (header *-requests)")
+    parser.add_argument("--fail-every", type=int, default=0, help="Jawab 429 untuk setiap request ke-n")
+    parser.add_argument("--drop-every", type=int, default=0, help="Hilangkan bagian terakhir setiap jawaban ke-n")
+    parser.add_argument("--latency", type=float, default=0.0, help="Jeda per jawaban (detik)")
+    args = parser.parse_args()
+
+    stub_state = StubState(args.rpm, args.tpm, args.rpd, args.fail_every, args.drop_every, args.latency)
+    server, url = start_stub_server(stub_state, port=args.port)
+    print(f"🧪 Server tiruan Groq berjalan di {url} (Ctrl+C untuk berhenti)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"📊 {stub_state.count} request, {stub_state.rate_limited} kali 429")
+        server.shutdown()
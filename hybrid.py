@@ -0,0 +1,48 @@
+# hybrid.py
+import re
+
+# Kata umum pertanyaan yang tidak membantu pencocokan leksikal
+STOPWORDS = {
+    "apa", "apakah", "yang", "dan", "di", "dalam", "dari", "ke", "kepada", "tentang", "terhadap",
+    "jelaskan", "sebutkan", "adalah", "itu", "ini", "bagaimana", "mengapa", "kenapa", "menurut",
+    "terkait", "isi", "maksud", "makna", "arti", "penjelasan", "tafsir", "surat", "surah", "ayat",
+    "pada", "untuk", "dengan", "oleh", "sebagai", "atau", "juga", "ada", "saja", "tersebut",
+    # Artikel nama surah dan potongan "Qur'an" muncul di hampir semua chunk
+    "al", "an", "ar", "as", "asy", "at", "ad", "az", "qur",
+}
+
+# Karakter khusus sintaks query Lucene
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+def build_lucene_query(query_text):
+    """Ubah pertanyaan bebas menjadi query full-text (OR antar term penting).
+
+    Nama surah ditulis dengan tanda hubung/apostrof (Al-Baqarah, An-Nisa') dipecah
+    oleh analyzer Lucene, jadi cukup mengambil token kata dan angkanya.
+    """
+    tokens = re.findall(r"\w+", query_text.lower())
+    terms = [t for t in dict.fromkeys(tokens) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+    return " OR ".join(_LUCENE_SPECIAL.sub(r"\\\1", t) for t in terms)
+
+
+def record_to_dict(record):
+    return record if isinstance(record, dict) else record.data()
+
+
+def reciprocal_rank_fusion(legs, top_k, k=60):
+    """Gabungkan beberapa daftar hasil terurut dengan Reciprocal Rank Fusion.
+
+    legs: {nama_leg: [record, ...]} dengan record memiliki chunk_id dan score.
+    Skor akhir = Σ 1 / (k + rank); skor asli tiap leg disimpan di "<nama>_score".
+    """
+    fused = {}
+    for name, records in legs.items():
+        for rank, record in enumerate(records, start=1):
+            row = record_to_dict(record)
+            entry = fused.setdefault(row["chunk_id"], {**row, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+            entry[f"{name}_score"] = row["score"]
+
+    ranked = sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+    return ranked[:top_k]
@@ -0,0 +1,222 @@
+# ingest_pipeline.py
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, items, elapsed):
+        with self.lock:
+            self.items += items
+            self.busy_time += elapsed
+
+
+class QueueStats:
+    def __init__(self, name, q):
+        self.name = name
+        self.queue = q
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self):
+        depth = self.queue.qsize()
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def average(self):
+        return self.total_depth / self.samples if self.samples else 0.0
+
+
+class IngestPipeline:
+    """Pipeline ingestion parse → chunk/embed → tulis ke Neo4j dengan antrean terbatas.
+
+    - source: iterable baris Ayat hasil parse, tiap baris membawa baris Surah-nya
+      di row["surah"].
+    - embed_fn: fungsi yang mengisi row["chunks"] beserta embedding-nya untuk
+      sekumpulan baris Ayat.
+    - writer_factory: fungsi tanpa argumen yang membuat BatchWriter baru untuk
+      setiap worker penulis.
+
+    Antrean berukuran tetap memberi backpressure: parser berhenti membaca jika
+    embedder tertinggal, dan embedder berhenti jika penulis Neo4j tertinggal.
+    """
+
+    def __init__(self, source, embed_fn, writer_factory, embed_workers=2, write_workers=1,
+                 embed_batch_size=16, queue_size=8, stats_interval=30.0, on_written=None):
+        self.source = source
+        self.embed_fn = embed_fn
+        self.writer_factory = writer_factory
+        self.embed_workers = embed_workers
+        self.write_workers = write_workers
+        self.embed_batch_size = embed_batch_size
+        self.stats_interval = stats_interval
+        self.on_written = on_written
+
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self.stages = {name: StageStats(name) for name in ("parse", "embed", "write")}
+        self.queues = [QueueStats("embed", self.embed_queue), QueueStats("write", self.write_queue)]
+
+        self.stop_event = threading.Event()
+        self.errors = []
+        self.surahs_written = set()
+        self.surah_lock = threading.Lock()
+        self.writers = []
+        self.start_time = None
+
+    # ----- stage -----
+
+    def _put(self, q, item):
+        # put dengan timeout agar thread tidak macet jika stage lain gagal
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage, error):
+        print(f"❌ Stage {stage} gagal: {error}")
+        self.errors.append(error)
+        self.stop_event.set()
+
+    def _parse_stage(self):
+        try:
+            batch = []
+            start = time.time()
+            for row in self.source:
+                batch.append(row)
+                if len(batch) >= self.embed_batch_size:
+                    self.stages["parse"].record(len(batch), time.time() - start)
+                    if not self._put(self.embed_queue, batch):
+                        return
+                    batch = []
+                    start = time.time()
+            if batch:
+                self.stages["parse"].record(len(batch), time.time() - start)
+                self._put(self.embed_queue, batch)
+        except Exception as e:
+            self._fail("parse", e)
+        finally:
+            for _ in range(self.embed_workers):
+                self._put(self.embed_queue, _DONE)
+
+    def _embed_stage(self):
+        try:
+            while True:
+                batch = self._get(self.embed_queue)
+                if batch is _DONE:
+                    return
+                start = time.time()
+                self.embed_fn(batch)
+                self.stages["embed"].record(len(batch), time.time() - start)
+                if not self._put(self.write_queue, batch):
+                    return
+        except Exception as e:
+            self._fail("embed", e)
+
+    def _ensure_surah(self, writer, surah_row):
+        # Surah harus sudah tertulis sebelum Ayat-nya di-MATCH oleh writer mana pun
+        if surah_row["number"] in self.surahs_written:
+            return
+        with self.surah_lock:
+            if surah_row["number"] not in self.surahs_written:
+                writer.add_surah(surah_row)
+                writer.flush()
+                self.surahs_written.add(surah_row["number"])
+
+    def _write_stage(self, writer):
+        try:
+            while True:
+                batch = self._get(self.write_queue)
+                if batch is _DONE:
+                    break
+                start = time.time()
+                for row in batch:
+                    self._ensure_surah(writer, row["surah"])
+                    writer.add_ayat({k: v for k, v in row.items() if k != "surah"})
+                self.stages["write"].record(len(batch), time.time() - start)
+                if self.on_written:
+                    self.on_written(len(batch))
+            start = time.time()
+            writer.flush()
+            self.stages["write"].record(0, time.time() - start)
+        except Exception as e:
+            self._fail("write", e)
+
+    # ----- statistik -----
+
+    def _report(self, final=False):
+        elapsed = time.time() - self.start_time
+        parts = []
+        for stage in self.stages.values():
+            rate = stage.items / elapsed if elapsed else 0.0
+            parts.append(f"{stage.name}: {stage.items} ayat ({rate:.1f}/s, sibuk {stage.busy_time:.1f}s)")
+        depths = ", ".join(
+            f"{q.name}={q.queue.qsize()} (rata-rata {q.average():.1f}, maks {q.max_depth})" for q in self.queues
+        )
+        label = "📊 Ringkasan pipeline" if final else "📊 Pipeline"
+        print(f"\n{label} [{elapsed:.1f}s] " + " | ".join(parts) + f" | antrean {depths}")
+
+    def _monitor(self):
+        last_report = time.time()
+        while not self.stop_event.wait(0.5):
+            for q in self.queues:
+                q.sample()
+            if self.stats_interval and time.time() - last_report >= self.stats_interval:
+                self._report()
+                last_report = time.time()
+
+    # ----- eksekusi -----
+
+    def run(self):
+        self.start_time = time.time()
+        threads = [threading.Thread(target=self._parse_stage, name="parse")]
+        threads += [threading.Thread(target=self._embed_stage, name=f"embed-{i}") for i in range(self.embed_workers)]
+
+        writer_threads = []
+        for i in range(self.write_workers):
+            writer = self.writer_factory()
+            self.writers.append(writer)
+            writer_threads.append(threading.Thread(target=self._write_stage, args=(writer,), name=f"write-{i}"))
+
+        monitor = threading.Thread(target=self._monitor, name="monitor", daemon=True)
+        monitor.start()
+        for t in threads + writer_threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+        # Semua embedder selesai: beri tanda berhenti ke setiap penulis
+        for _ in writer_threads:
+            self._put(self.write_queue, _DONE)
+        for t in writer_threads:
+            t.join()
+
+        self.stop_event.set()
+        monitor.join()
+        self._report(final=True)
+
+        if self.errors:
+            raise self.errors[0]
+        for writer in self.writers:
+            writer.close()
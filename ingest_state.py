@@ -0,0 +1,50 @@
+# ingest_state.py
+import hashlib
+
+
+def ayat_content_hash(*parts, signature=""):
+    """Hash isi satu ayat (teks, terjemahan, tafsir) beserta signature pipeline.
+
+    Signature memuat model embedding dan parameter chunking, sehingga perubahan
+    konfigurasi juga memicu chunk ulang dan embed ulang ayat tersebut.
+    """
+    h = hashlib.sha256(signature.encode("utf-8"))
+    for part in parts:
+        h.update(b"\0")
+        h.update((part or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+# Setiap pipeline menyimpan hash-nya di properti sendiri agar tidak saling menimpa:
+# insert_data.py (chunk) → content_hash, insert_word2vec.py (embedding Ayat/Surah) → embedding_hash
+CHUNK_HASH_PROPERTY = "content_hash"
+EMBEDDING_HASH_PROPERTY = "embedding_hash"
+
+
+def fetch_ayat_hashes(driver, prop=CHUNK_HASH_PROPERTY):
+    """Ambil hash pipeline (properti `prop`) setiap ayat yang sudah tersimpan: {(surah, ayat): hash}."""
+    records, _, _ = driver.execute_query(
+        """
+        MATCH (s:Surah)-[:HAS_AYAT]->(a:Ayat)
+        RETURN s.number AS surah_number, a.number AS ayat_number, a[$prop] AS content_hash
+        """,
+        {"prop": prop}
+    )
+    return {(r["surah_number"], r["ayat_number"]): r["content_hash"] for r in records}
+
+
+def prune_missing_ayat(driver, keys):
+    """Hapus Ayat (beserta Chunk-nya) yang sudah tidak ada di sumber data."""
+    if not keys:
+        return 0
+    rows = [{"surah_number": s, "ayat_number": a} for s, a in keys]
+    driver.execute_query(
+        """
+        UNWIND $rows AS row
+        MATCH (s:Surah {number: row.surah_number})-[:HAS_AYAT]->(a:Ayat {number: row.ayat_number})
+        OPTIONAL MATCH (a)-[:HAS_CHUNK]->(c:Chunk)
+        DETACH DELETE c, a
+        """,
+        {"rows": rows}
+    )
+    return len(rows)
@@ -1,21 +1,50 @@
 # insert_data.py
 
-import json
+import argparse
 import numpy as np
-from uuid import uuid4
 from tqdm import tqdm
-from config import driver, DIMENSION
+from config import (
+    driver, DIMENSION, WRITE_BATCH_SIZE, EMBED_WORKERS, WRITE_WORKERS, PIPELINE_QUEUE_SIZE, QURAN_DATA_PATH,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP
+)
 from groq_embedder import Embedder
-from utils import chunk_text
+from embedding_transform import Transform
+from neo4j_writer import BatchWriter
+from ingest_pipeline import IngestPipeline
+from schema import ensure_schema
+from query_cache import mark_corpus_updated
+from ingest_state import ayat_content_hash, fetch_ayat_hashes, prune_missing_ayat
+from semantic_chunker import get_chunker
+from bulk_export import CsvExport, chunk_id
+from quran_reader import iter_ayat_records, count_ayat
 
+# Chunker sesuai config CHUNKER ("window" atau "semantic")
+Chunker = get_chunker(max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP)
 
-def embed_chunk(text):
-    vector = Embedder.embed_text(text)
+# Bagian dari content_hash: mengganti model, chunker, atau parameter chunking memicu proses ulang
+PIPELINE_SIGNATURE = f"chunks|{Embedder.model}|{Transform.signature()}|{Chunker.signature()}"
+
+
+def validate_vector(vector):
     if not isinstance(vector, list) or len(vector) != DIMENSION:
         raise ValueError("❌ Invalid embedding vector")
     return vector
 
 
+def embed_chunk(text):
+    return validate_vector(Embedder.embed_text(text))
+
+
+def embed_chunks(texts):
+    """Embed banyak chunk dalam satu panggilan batch (urutan dipertahankan).
+
+    Vektor divalidasi pada dimensi asli model, lalu diproyeksikan/dikuantisasi
+    sesuai konfigurasi EMBEDDING_TRANSFORM sebelum disimpan.
+    """
+    vectors = [validate_vector(vector) for vector in Embedder.embed_texts(texts)]
+    return Transform.apply_many(vectors)
+
+
 def extract_ayah_number(ayah_key: str) -> int:
     """Ekstrak angka dari key seperti 'Ayat 1'."""
     try:
@@ -24,117 +53,195 @@ def extract_ayah_number(ayah_key: str) -> int:
         raise ValueError(f"❌ Gagal parsing ayat: {ayah_key}")
 
 
-def insert_quran_chunks():
-    with open("quran.json", "r", encoding="utf-8") as file:
-        quran_data = json.load(file)
+def source_chunk_rows(surah_number, surah_name_latin, ayah_num, source, chunks):
+    """Baris Chunk untuk potongan satu sumber; embedding diisi kemudian.
+
+    ID chunk deterministik (surah:ayat:sumber:urutan) sehingga ekspor CSV dan
+    run ulang menghasilkan ID yang sama.
+    """
+    return [
+        {
+            "id": chunk_id(surah_number, ayah_num, source, index),
+            "text": f"[{source} {surah_name_latin}:{ayah_num}] {chunk}",
+            "embedding": None,
+            "source": source
+        }
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+def build_chunk_rows(surah_number, surah_name_latin, ayah_num, sources, chunker=None):
+    """Potong setiap sumber (teks asli, terjemahan, tafsir) satu ayat dalam satu panggilan chunker."""
+    chunker = chunker or Chunker
+    sources = {source: content for source, content in sources.items() if content.strip()}
+    rows = []
+    for source, chunks in zip(sources, chunker.split_many(list(sources.values()))):
+        rows += source_chunk_rows(surah_number, surah_name_latin, ayah_num, source, chunks)
+    return rows
+
+
+def attach_chunks(ayat_rows, chunker=None):
+    """Potong row["sources"] semua ayat dalam batch menjadi row["chunks"].
+
+    Berjalan di stage embed (bukan di generator parse) karena chunker semantik
+    meng-embed kalimat lewat HTTP: dengan begitu ikut diparalelkan oleh --embed-workers,
+    dan seluruh kalimat satu batch ayat di-embed dalam satu panggilan split_many.
+    """
+    chunker = chunker or Chunker
+    pieces = [
+        (row, source, content)
+        for row in ayat_rows
+        for source, content in row.pop("sources").items()
+        if content.strip()
+    ]
+    for row in ayat_rows:
+        row["chunks"] = []
+    for (row, source, _), chunks in zip(pieces, chunker.split_many([content for _, _, content in pieces])):
+        row["chunks"] += source_chunk_rows(row["surah_number"], row["surah_name"], row["number"], source, chunks)
+
+
+def attach_embeddings(ayat_rows):
+    """Potong lalu embed semua chunk dari sekumpulan ayat sekaligus dan pasang ke baris chunk-nya."""
+    attach_chunks(ayat_rows)
+    chunk_rows = [chunk for row in ayat_rows for chunk in row["chunks"]]
+    vectors = embed_chunks([chunk["text"] for chunk in chunk_rows])
+    for chunk, vector in zip(chunk_rows, vectors):
+        chunk["embedding"] = vector
+
 
+def iter_ayat_rows(records, stored_hashes, seen_keys, on_skipped=None):
+    """Stage parse: hasilkan baris Ayat untuk ayat yang berubah; sumber chunk-nya di row["sources"].
+
+    `records` berasal dari quran_reader.iter_ayat_records sehingga hanya satu surah
+    yang berada di memori. Tafsir selain Kemenag menjadi sumber chunk tambahan
+    ("tafsir_<nama>") dan ikut content_hash hanya jika ada.
+    """
+    for record in records:
+        surah_row = record["surah"]
+        surah_id = surah_row["number"]
+        surah_name_latin = surah_row["name_latin"]
+        try:
+            ayah_num = extract_ayah_number(record["ayah_key"])
+        except ValueError as e:
+            print(str(e))
+            continue
+
+        ayah_text = record["text"]
+        translation = record["translation"]
+        tafsir = record["tafsir"]
+        extra_tafsirs = {
+            f"tafsir_{name}": text for name, text in sorted(record["tafsirs"].items()) if name != "kemenag"
+        }
+
+        content_hash = ayat_content_hash(
+            ayah_text, translation, tafsir, *extra_tafsirs.values(), signature=PIPELINE_SIGNATURE
+        )
+        seen_keys.add((surah_id, ayah_num))
+        if stored_hashes.get((surah_id, ayah_num)) == content_hash:
+            # Ayat tidak berubah (atau sudah selesai diproses sebelum terhenti)
+            if on_skipped:
+                on_skipped()
+            continue
+
+        yield {
+            "surah": surah_row,
+            "surah_number": surah_id,
+            "surah_name": surah_name_latin,
+            "number": ayah_num,
+            "text": ayah_text,
+            "translation": translation,
+            "tafsir": tafsir,
+            "content_hash": content_hash,
+            # Dipotong oleh attach_embeddings di stage embed
+            "sources": {
+                "text": ayah_text,
+                "translation": translation,
+                "tafsir": tafsir,
+                **extra_tafsirs
+            }
+        }
+
+
+def export_quran_csv(directory, batch_size=WRITE_BATCH_SIZE, embed_workers=EMBED_WORKERS,
+                     write_workers=WRITE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, data_path=QURAN_DATA_PATH):
+    """Bangun ulang penuh secara offline: tulis CSV untuk neo4j-admin database import.
+
+    Pipeline parse → embed sama dengan insert_quran_chunks, tetapi writer-nya
+    menulis file CSV sehingga Neo4j tidak disentuh sama sekali.
+    """
+    export = CsvExport(directory)
+    progress = tqdm(total=count_ayat(data_path), desc="Mengekspor Ayat")
+    try:
+        pipeline = IngestPipeline(
+            source=iter_ayat_rows(iter_ayat_records(data_path), {}, set()),
+            embed_fn=attach_embeddings,
+            writer_factory=lambda: export.writer(batch_size=batch_size),
+            embed_workers=embed_workers,
+            write_workers=write_workers,
+            queue_size=queue_size,
+            on_written=progress.update
+        )
+        pipeline.run()
+    finally:
+        progress.close()
+        export.close()
+    if Embedder.cache is not None:
+        Embedder.cache.report()
+
+
+def insert_quran_chunks(batch_size=WRITE_BATCH_SIZE, rebuild=False, embed_workers=EMBED_WORKERS,
+                        write_workers=WRITE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, data_path=QURAN_DATA_PATH):
+    """Masukkan data Al-Quran ke Neo4j.
+
+    Secara default berjalan dalam mode upsert: hanya ayat yang content_hash-nya
+    berubah yang di-chunk dan di-embed ulang, dan proses yang terhenti bisa
+    dilanjutkan cukup dengan menjalankan ulang. rebuild=True menghapus seluruh
+    graph terlebih dahulu (termasuk relasi RELATED_TO dan KG).
+    """
     try:
-        with driver.session() as session:
-            # Hapus semua data sebelumnya
-            session.run("MATCH (n) DETACH DELETE n")
-            session.run("CREATE (:Quran {name: 'Al-Quran'})")
-
-            total_ayat = sum(len(surah["text"]) for surah in quran_data)
-            progress = tqdm(total=total_ayat, desc="Memproses Ayat")
-
-            for surah in quran_data:
-                surah_id = int(surah["number"])
-                surah_name = surah["name"]
-                surah_name_latin = surah["name_latin"]
-                number_of_ayah = int(surah["number_of_ayah"])
-
-                # Simpan node Surah
-                session.run(
-                    """
-                    MATCH (q:Quran {name: 'Al-Quran'})
-                    CREATE (s:Surah {
-                        number: $number,
-                        name: $name,
-                        name_latin: $name_latin,
-                        number_of_ayah: $number_of_ayah
-                    })
-                    CREATE (q)-[:HAS_SURAH]->(s)
-                    """,
-                    {
-                        "number": surah_id,
-                        "name": surah_name,
-                        "name_latin": surah_name_latin,
-                        "number_of_ayah": number_of_ayah
-                    }
-                )
-
-                for ayah_key, ayah_text in surah["text"].items():
-                    try:
-                        ayah_num = extract_ayah_number(ayah_key)
-                    except ValueError as e:
-                        print(str(e))
-                        continue
-
-                    translation = surah.get("translations", {}).get("id", {}).get("text", {}).get(ayah_key, "")
-                    tafsir = surah.get("tafsir", {}).get("id", {}).get("kemenag", {}).get("text", {}).get(ayah_key, "")
-
-                    # Simpan node Ayat
-                    session.run(
-                        """
-                        MATCH (s:Surah {number: $surah_number})
-                        CREATE (a:Ayat {
-                            number: $number,
-                            text: $text,
-                            translation: $translation,
-                            tafsir: $tafsir
-                        })
-                        CREATE (s)-[:HAS_AYAT]->(a)
-                        """,
-                        {
-                            "surah_number": surah_id,
-                            "number": ayah_num,
-                            "text": ayah_text,
-                            "translation": translation,
-                            "tafsir": tafsir
-                        }
-                    )
-
-                    # Proses setiap sumber (teks asli, terjemahan, tafsir)
-                    for source, content in {
-                        "text": ayah_text,
-                        "translation": translation,
-                        "tafsir": tafsir
-                    }.items():
-                        if content.strip():
-                            chunks = chunk_text(content)
-                            for chunk in chunks:
-                                prefixed_chunk = f"[{source} {surah_name_latin}:{ayah_num}] {chunk}"
-                                embedding = embed_chunk(prefixed_chunk)
-                                session.run(
-                                    """
-                                    MATCH (s:Surah {number: $surah_number})-[:HAS_AYAT]->(a:Ayat {number: $ayat_number})
-                                    CREATE (c:Chunk {
-                                        id: $id,
-                                        text: $chunk_text,
-                                        embedding: $embedding,
-                                        source: $source,
-                                        ayat_number: $ayat_number,
-                                        surah_name: $surah_name,
-                                        surah_number: $surah_number
-                                    })
-                                    CREATE (a)-[:HAS_CHUNK]->(c)
-                                    """,
-                                    {
-                                        "id": str(uuid4()),
-                                        "chunk_text": prefixed_chunk,
-                                        "embedding": embedding,
-                                        "source": source,
-                                        "ayat_number": ayah_num,
-                                        "surah_name": surah_name_latin,
-                                        "surah_number": surah_id
-                                    }
-                                )
-
-
-                    progress.update(1)
-
-            progress.close()
-            print("\n✅ Semua data Al-Quran dan chunk embedding berhasil dimasukkan ke Neo4j.")
+        if rebuild:
+            with driver.session() as session:
+                # Hapus semua data sebelumnya
+                session.run("MATCH (n) DETACH DELETE n")
+        # Constraint dan index harus ada sebelum penulisan massal
+        ensure_schema(driver)
+        if rebuild:
+            with driver.session() as session:
+                session.run("CREATE (:Quran {name: 'Al-Quran'})")
+            stored_hashes = {}
+        else:
+            stored_hashes = fetch_ayat_hashes(driver)
+            print(f"🔎 {len(stored_hashes)} ayat sudah tersimpan di Neo4j")
+
+        seen_keys = set()
+        skipped = []
+
+        progress = tqdm(total=count_ayat(data_path), desc="Memproses Ayat")
+
+        def on_skipped():
+            skipped.append(1)
+            progress.update(1)
+
+        # parse → chunk + embed (paralel) → tulis batch ke Neo4j, dengan antrean terbatas di antaranya
+        pipeline = IngestPipeline(
+            source=iter_ayat_rows(iter_ayat_records(data_path), stored_hashes, seen_keys, on_skipped=on_skipped),
+            embed_fn=attach_embeddings,
+            writer_factory=lambda: BatchWriter(driver, batch_size=batch_size, upsert=not rebuild),
+            embed_workers=embed_workers,
+            write_workers=write_workers,
+            queue_size=queue_size,
+            on_written=progress.update
+        )
+        pipeline.run()
+        progress.close()
+
+        if not rebuild:
+            removed = prune_missing_ayat(driver, set(stored_hashes) - seen_keys)
+            print(f"⏭️ {len(skipped)} ayat tidak berubah dilewati, {removed} ayat usang dihapus")
+        if Embedder.cache is not None:
+            Embedder.cache.report()
+        mark_corpus_updated()  # Buang cache pencarian di proses lain (app/search)
+        print("\n✅ Semua data Al-Quran dan chunk embedding berhasil dimasukkan ke Neo4j.")
 
     except Exception as e:
         print(f"❌ Error saat insert: {str(e)}")
@@ -143,4 +250,38 @@ def insert_quran_chunks():
 
 
 if __name__ == "__main__":
-    insert_quran_chunks()
+    parser = argparse.ArgumentParser(description="Masukkan data Al-Quran dan chunk embedding ke Neo4j")
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE,
+                        help="Jumlah baris (Ayat + Chunk) per transaksi UNWIND")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Hapus seluruh graph lalu bangun ulang (default: upsert inkremental)")
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS,
+                        help="Jumlah worker embedding yang berjalan bersamaan")
+    parser.add_argument("--write-workers", type=int, default=WRITE_WORKERS,
+                        help="Jumlah worker penulis Neo4j")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="Kapasitas antrean antar-stage (dalam batch)")
+    parser.add_argument("--data", default=QURAN_DATA_PATH,
+                        help="quran.json, salinan .gz/JSON-lines, direktori shard, atau pola glob")
+    parser.add_argument("--export-csv", metavar="DIR", default=None,
+                        help="Tulis CSV untuk neo4j-admin database import alih-alih menulis ke Neo4j")
+    args = parser.parse_args()
+
+    if args.export_csv:
+        export_quran_csv(
+            args.export_csv,
+            batch_size=args.batch_size,
+            embed_workers=args.embed_workers,
+            write_workers=args.write_workers,
+            queue_size=args.queue_size,
+            data_path=args.data
+        )
+    else:
+        insert_quran_chunks(
+            batch_size=args.batch_size,
+            rebuild=args.rebuild,
+            embed_workers=args.embed_workers,
+            write_workers=args.write_workers,
+            queue_size=args.queue_size,
+            data_path=args.data
+        )
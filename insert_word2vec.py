@@ -1,21 +1,22 @@
-import json
+import argparse
 import numpy as np
 from neo4j import GraphDatabase
 from tqdm import tqdm
-from config import driver, DIMENSION
+from config import driver, DIMENSION, QURAN_DATA_PATH
 from word2vec import FastTextEmbedder as Embedder  # Ganti ke HybridEmbedder  
+from schema import ensure_schema
+from query_cache import mark_corpus_updated
+from ingest_state import ayat_content_hash, fetch_ayat_hashes, prune_missing_ayat, EMBEDDING_HASH_PROPERTY
+from quran_reader import iter_surahs, count_ayat
+from bulk_export import save_embeddings
+import utils
+
+# Bagian dari embedding_hash (properti sendiri, tidak menimpa content_hash milik insert_data.py):
+# mengganti embedder atau parameter chunking memicu proses ulang
+PIPELINE_SIGNATURE = f"word2vec|{Embedder.__name__}|300|50"
 
 def chunk_text(text, max_tokens=300, overlap=50):
-    words = text.split()
-    chunks = []
-    start = 0
-    
-    while start < len(words):
-        end = min(start + max_tokens, len(words))
-        chunks.append(" ".join(words[start:end]))
-        start += max_tokens - overlap  # Geser ke depan dengan overlap
-    
-    return chunks
+    return utils.chunk_text(text, max_tokens=max_tokens, overlap=overlap)
 
 def validate_embedding(vector):
     if not isinstance(vector, list):
@@ -29,52 +30,87 @@ def validate_embedding(vector):
     
     return vector
 
+def embed_texts(embedder, texts):
+    # FastTextEmbedder hanya punya embed_text; vektor FastText lokal dan murah per teks
+    return [embedder.embed_text(text) for text in texts]
+
 def flatten_embeddings(embeddings):
     """Mengambil rata-rata dari beberapa embedding untuk menjaga dimensi tetap 768."""
     avg_embedding = np.mean(embeddings, axis=0).tolist()
     return validate_embedding(avg_embedding)  # Pastikan tetap 768 dimensi
 
-def insert_quran_data():
-    with open("quran.json", "r", encoding="utf-8") as file:
-        quran_data = json.load(file)
-    
+def surah_embedding(embedder, surah):
+    surah_text = f"Surah {surah['name']} ({surah['name_latin']}), jumlah ayat {int(surah['number_of_ayah'])}"
+    surah_chunks = chunk_text(surah_text)  # Membagi teks surah menjadi potongan-potongan
+
+    for chunk in surah_chunks:  # Loop untuk setiap chunk
+        print(f"Processing chunk: {chunk}")  # Debug: Print chunk
+    surah_embeddings = embed_texts(embedder, surah_chunks)  # Embed semua chunk sekaligus
+
+    # Ambil rata-rata embedding agar sesuai format yang diterima Neo4j
+    return flatten_embeddings(surah_embeddings)
+
+def iter_ayat_items(surah):
+    """(nomor ayat, teks, terjemahan, tafsir Kemenag, embedding_hash) untuk setiap ayat satu surah."""
+    for ayah_num, ayah_text in surah["text"].items():
+        translation = surah.get("translations", {}).get("id", {}).get("text", {}).get(ayah_num, "")
+        tafsir = surah.get("tafsir", {}).get("id", {}).get("kemenag", {}).get("text", {}).get(ayah_num, "")
+        content_hash = ayat_content_hash(ayah_text, translation, tafsir, signature=PIPELINE_SIGNATURE)
+        yield ayah_num, ayah_text, translation, tafsir, content_hash
+
+def ayat_embeddings(embedder, surah_name, items):
+    """Embedding rata-rata per ayat; seluruh chunk ayat dalam satu surah di-embed sekaligus."""
+    ayat_chunks = []
+    for ayah_num, ayah_text, translation, tafsir, _ in items:
+        # Format teks yang akan di-embed (termasuk nomor ayat)
+        combined_text = f"Surah {surah_name} Ayat {ayah_num}: {ayah_text} | Terjemahan: {translation} | Tafsir: {tafsir}"
+        ayat_chunks.append(chunk_text(combined_text))  # Membagi teks ayat menjadi potongan-potongan
+
+    all_chunks = [chunk for chunks in ayat_chunks for chunk in chunks]
+    all_embeddings = embed_texts(embedder, all_chunks)
+
+    embeddings = []
+    offset = 0
+    for chunks in ayat_chunks:
+        # Ambil rata-rata embedding agar sesuai format yang diterima Neo4j
+        embeddings.append(flatten_embeddings(all_embeddings[offset:offset + len(chunks)]))
+        offset += len(chunks)
+    return embeddings
+
+def insert_quran_data(rebuild=False, data_path=QURAN_DATA_PATH):
+    """Default mode upsert: hanya ayat yang embedding_hash-nya berubah yang di-embed ulang."""
     embedder = Embedder()  # <-- Inisialisasi instance di sini
     
     try:
         with driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")  # Hapus semua data sebelumnya
-            session.run("CREATE (:Quran {name: 'Al-Quran'})")  # Buat root node Al-Quran
+            if rebuild:
+                session.run("MATCH (n) DETACH DELETE n")  # Hapus semua data sebelumnya
+                stored_hashes = {}
+            else:
+                stored_hashes = fetch_ayat_hashes(driver, EMBEDDING_HASH_PROPERTY)
+            ensure_schema(driver)  # Constraint dan index harus ada sebelum penulisan massal
+            session.run("MERGE (:Quran {name: 'Al-Quran'})")  # Buat root node Al-Quran
+            seen_keys = set()
+            skipped = 0
             
-            total_ayat = sum(len(surah["text"]) for surah in quran_data)
-            progress_bar = tqdm(total=total_ayat, desc="Memproses Ayat")
+            progress_bar = tqdm(total=count_ayat(data_path), desc="Memproses Ayat")
             
-            for surah in quran_data:
+            for surah in iter_surahs(data_path):  # Satu surah di memori pada satu waktu
                 surah_id = int(surah["number"])
                 surah_name = surah["name"]
                 surah_name_latin = surah["name_latin"]
                 number_of_ayah = int(surah["number_of_ayah"])
                 
-                surah_text = f"Surah {surah_name} ({surah_name_latin}), jumlah ayat {number_of_ayah}"
-                surah_chunks = chunk_text(surah_text)  # Membagi teks surah menjadi potongan-potongan
-                
-                surah_embeddings = []
-                for chunk in surah_chunks:  # Loop untuk setiap chunk
-                    print(f"Processing chunk: {chunk}")  # Debug: Print chunk
-                    surah_embeddings.append(Embedder.embed_text(chunk))  # Embed teks tiap chunk
-                
-                # Ambil rata-rata embedding agar sesuai format yang diterima Neo4j
-                flattened_surah_embedding = flatten_embeddings(surah_embeddings)
-                
+                flattened_surah_embedding = surah_embedding(embedder, surah)
+
                 session.run(
                     """MATCH (q:Quran {name: 'Al-Quran'})
-                        CREATE (s:Surah {
-                            number: $number,
-                            name: $name,
-                            name_latin: $name_latin,
-                            number_of_ayah: $number_of_ayah,
-                            embedding: $embedding
-                        })
-                        CREATE (q)-[:HAS_SURAH]->(s)
+                        MERGE (s:Surah {number: $number})
+                        SET s.name = $name,
+                            s.name_latin = $name_latin,
+                            s.number_of_ayah = $number_of_ayah,
+                            s.embedding = $embedding
+                        MERGE (q)-[:HAS_SURAH]->(s)
                     """,
                     {
                         "number": surah_id,
@@ -85,29 +121,29 @@ def insert_quran_data():
                     }
                 )
                 
-                for ayah_num, ayah_text in surah["text"].items():
-                    translation = surah.get("translations", {}).get("id", {}).get("text", {}).get(ayah_num, "")
-                    tafsir = surah.get("tafsir", {}).get("id", {}).get("kemenag", {}).get("text", {}).get(ayah_num, "")
+                ayat_items = []
+                for item in iter_ayat_items(surah):
+                    ayah_num, content_hash = item[0], item[-1]
+                    seen_keys.add((surah_id, int(ayah_num)))
+                    if stored_hashes.get((surah_id, int(ayah_num))) == content_hash:
+                        skipped += 1  # Ayat tidak berubah sejak proses sebelumnya
+                        progress_bar.update(1)
+                        continue
+                    ayat_items.append(item)
 
-                    # Format teks yang akan di-embed (termasuk nomor ayat)
-                    combined_text = f"Surah {surah_name} Ayat {ayah_num}: {ayah_text} | Terjemahan: {translation} | Tafsir: {tafsir}"
-                    
-                    ayah_chunks = chunk_text(combined_text)  # Membagi teks ayat menjadi potongan-potongan
-                    ayah_embeddings = [Embedder.embed_text(chunk) for chunk in ayah_chunks]
-                    
-                    # Ambil rata-rata embedding agar sesuai format yang diterima Neo4j
-                    flattened_ayah_embedding = flatten_embeddings(ayah_embeddings)
-                    
+                embeddings = ayat_embeddings(embedder, surah_name, ayat_items)
+                for (ayah_num, ayah_text, translation, tafsir, content_hash), flattened_ayah_embedding in zip(
+                    ayat_items, embeddings
+                ):
                     session.run(
                         """MATCH (s:Surah {number: $surah_number})
-                            CREATE (a:Ayat {
-                                number: $number,
-                                text: $text,
-                                translation: $translation,
-                                tafsir: $tafsir,
-                                embedding: $embedding
-                            })
-                            CREATE (s)-[:HAS_AYAT]->(a)
+                            MERGE (s)-[:HAS_AYAT]->(a:Ayat {number: $number})
+                            SET a.surah_number = $surah_number,
+                                a.text = $text,
+                                a.translation = $translation,
+                                a.tafsir = $tafsir,
+                                a.embedding = $embedding,
+                                a.embedding_hash = $embedding_hash
                         """,
                         {
                             "surah_number": surah_id,
@@ -115,13 +151,20 @@ def insert_quran_data():
                             "text": ayah_text,
                             "translation": translation,
                             "tafsir": tafsir,
-                            "embedding": flattened_ayah_embedding
+                            "embedding": flattened_ayah_embedding,
+                            "embedding_hash": content_hash
                         }
                     )
                     
                     progress_bar.update(1)
             
             progress_bar.close()
+            if not rebuild:
+                removed = prune_missing_ayat(driver, set(stored_hashes) - seen_keys)
+                print(f"⏭️ {skipped} ayat tidak berubah dilewati, {removed} ayat usang dihapus")
+            if getattr(embedder, "cache", None) is not None:
+                embedder.cache.report()
+            mark_corpus_updated()  # Buang cache pencarian di proses lain (app/search)
             print("✅ Data berhasil dimasukkan!")
     
     except Exception as e:
@@ -129,5 +172,48 @@ def insert_quran_data():
     finally:
         driver.close()
 
+def export_embeddings(directory, data_path=QURAN_DATA_PATH):
+    """Rebuild offline: simpan embedding Surah/Ayat ke directory tanpa menyentuh Neo4j.
+
+    Jalankan sebelum insert_data.py --export-csv DIR (yang menulisnya ke surah.csv/ayat.csv)
+    dan knn.py --export-csv DIR (yang menghitung relasi dari file ini), lihat bulk_export.CsvExport.
+    """
+    embedder = Embedder()
+    surah_ids, surah_vectors = [], []
+    ayat_ids, ayat_hashes, ayat_vectors = [], [], []
+
+    progress_bar = tqdm(total=count_ayat(data_path), desc="Mengekspor Embedding Ayat")
+    for surah in iter_surahs(data_path):
+        surah_id = int(surah["number"])
+        surah_ids.append(surah_id)
+        surah_vectors.append(np.asarray(surah_embedding(embedder, surah), dtype=np.float32))
+
+        items = list(iter_ayat_items(surah))
+        for item, embedding in zip(items, ayat_embeddings(embedder, surah["name"], items)):
+            ayat_ids.append((surah_id, int(item[0])))
+            ayat_hashes.append(item[-1])
+            ayat_vectors.append(np.asarray(embedding, dtype=np.float32))
+            progress_bar.update(1)
+    progress_bar.close()
+
+    save_embeddings(directory, "Surah", surah_ids, [""] * len(surah_ids), surah_vectors)
+    save_embeddings(directory, "Ayat", ayat_ids, ayat_hashes, ayat_vectors)
+    if getattr(embedder, "cache", None) is not None:
+        embedder.cache.report()
+    print(f"📦 Embedding {len(surah_ids)} surah dan {len(ayat_ids)} ayat ditulis ke {directory}; "
+          f"lanjutkan dengan insert_data.py --export-csv {directory}")
+
 if __name__ == "__main__":
-    insert_quran_data()
+    parser = argparse.ArgumentParser(description="Masukkan data Al-Quran dengan embedding FastText ke Neo4j")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Hapus seluruh graph lalu bangun ulang (default: upsert inkremental)")
+    parser.add_argument("--data", default=QURAN_DATA_PATH,
+                        help="quran.json, salinan .gz/JSON-lines, direktori shard, atau pola glob")
+    parser.add_argument("--export-csv", metavar="DIR", default=None,
+                        help="Simpan embedding Surah/Ayat untuk rebuild offline (sebelum insert_data.py --export-csv)")
+    args = parser.parse_args()
+
+    if args.export_csv:
+        export_embeddings(args.export_csv, data_path=args.data)
+    else:
+        insert_quran_data(rebuild=args.rebuild, data_path=args.data)
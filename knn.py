@@ -1,140 +1,398 @@
+import argparse
 import json
+import os
 import numpy as np
 from neo4j import GraphDatabase
 from tqdm import tqdm
-from config import driver, DIMENSION
+from config import driver, DIMENSION, KNN_MEMORY_LIMIT_MB, KNN_WRITE_BATCH_SIZE, EMBEDDING_MATRIX_DIR
 from groq_embedder import Embedder
-from sklearn.metrics.pairwise import cosine_similarity
+from schema import ensure_schema
+from query_cache import bump_version
+from bulk_export import write_relationship_csv, ayat_id, load_embeddings
+from embedding_store import EmbeddingMatrix, load_embedding_matrix, sync_embedding_matrix, save_snapshot, load_snapshot
 import time
 
+# Relasi ditulis dua arah; Ayat dicari lewat index Ayat(surah_number, number)
+RELATION_WRITE_QUERY = """
+UNWIND $batch AS relation
+MATCH (a:Ayat {surah_number: relation.surah_number_1, number: relation.ayah_number_1})
+MATCH (b:Ayat {surah_number: relation.surah_number_2, number: relation.ayah_number_2})
+MERGE (a)-[r1:RELATED_TO]->(b)
+SET r1.similarity = relation.similarity
+MERGE (b)-[r2:RELATED_TO]->(a)
+SET r2.similarity = relation.similarity
+"""
+
+
+DELETE_PAIRS_QUERY = """
+UNWIND $batch AS relation
+MATCH (a:Ayat {surah_number: relation.surah_number_1, number: relation.ayah_number_1})
+      -[r:RELATED_TO]-(b:Ayat {surah_number: relation.surah_number_2, number: relation.ayah_number_2})
+DELETE r
+"""
+
+# Nama snapshot (ID + embedding_hash) ayat yang dipakai saat relasi terakhir dibangun
+RELATIONS_SNAPSHOT = "ayat_relations"
+# Daftar top-k setiap ayat pada build terakhir, untuk pembaruan inkremental yang hasilnya sama dengan build penuh
+NEIGHBOURS_PATH = os.path.join(EMBEDDING_MATRIX_DIR, f"{RELATIONS_SNAPSHOT}_neighbours.npz")
+
+
+def knn_block_size(n_rows, memory_limit_mb):
+    # Satu blok = matriks similarity (blok × n) float32 plus indeks argpartition int64 dengan ukuran sama
+    bytes_per_row = max(1, n_rows) * (4 + 8)
+    return max(1, min(n_rows, int(memory_limit_mb * 2**20 // bytes_per_row)))
+
+
+def knn_blocks(matrix, k, block_size, rows=None):
+    """Yield (id baris, id tetangga, skor) per blok; tetangga terurut dari yang paling mirip.
+
+    matrix harus sudah ternormalisasi. rows membatasi baris yang dihitung
+    (default semua); ayat itu sendiri tidak pernah menjadi tetangganya.
+    """
+    n = len(matrix)
+    rows = np.arange(n) if rows is None else np.asarray(rows)
+    k = min(k, n - 1)
+    if k <= 0:
+        return
+    for start in range(0, len(rows), block_size):
+        row_ids = rows[start:start + block_size]
+        similarities = matrix[row_ids] @ matrix.T
+        similarities[np.arange(len(row_ids)), row_ids] = -np.inf
+
+        top = np.argpartition(similarities, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        yield row_ids, np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def collect_pairs(pairs, row_ids, neighbour_ids, scores, threshold):
+    """Kumpulkan pasangan (i, j) di atas threshold; pasangan timbal balik cukup ditulis sekali."""
+    for row, neighbours, sims in zip(row_ids, neighbour_ids, scores):
+        for neighbour, similarity in zip(neighbours, sims):
+            if similarity < threshold:
+                break
+            pairs[(min(row, neighbour), max(row, neighbour))] = float(similarity)
+
+
+def export_relations_csv(directory, keys, pairs):
+    """Tulis relasi ke related_to.csv (dua arah) untuk neo4j-admin database import."""
+    rows = []
+    for (i, j), similarity in pairs.items():
+        a, b = ayat_id(*keys[i]), ayat_id(*keys[j])
+        rows.append([a, b, similarity])
+        rows.append([b, a, similarity])
+    return write_relationship_csv(directory, "RELATED_TO", rows)
+
+
+def relation_rows(pairs):
+    """Pasangan {(key_1, key_2): similarity} → parameter UNWIND."""
+    return [
+        {
+            "surah_number_1": a[0],
+            "ayah_number_1": a[1],
+            "surah_number_2": b[0],
+            "ayah_number_2": b[1],
+            "similarity": similarity,
+        }
+        for (a, b), similarity in pairs.items()
+    ]
+
+
+def write_relations(driver, keys, pairs, write_batch_size):
+    """Tulis relasi dalam batch UNWIND besar; kembalikan jumlah relasi (dua arah)."""
+    rows = relation_rows({(keys[i], keys[j]): similarity for (i, j), similarity in pairs.items()})
+    for start in tqdm(range(0, len(rows), write_batch_size), desc="Menulis Relasi"):
+        driver.execute_query(RELATION_WRITE_QUERY, {"batch": rows[start:start + write_batch_size]})
+    return len(rows) * 2  # x2 karena relasi timbal balik
+
+
+def delete_relations(driver, key_pairs, write_batch_size):
+    rows = relation_rows({pair: None for pair in key_pairs})
+    for start in range(0, len(rows), write_batch_size):
+        driver.execute_query(DELETE_PAIRS_QUERY, {"batch": rows[start:start + write_batch_size]})
+    return len(rows) * 2
+
+
+def save_neighbour_lists(ids, neighbours, scores, path=NEIGHBOURS_PATH):
+    """Simpan daftar top-k (indeks baris ke `ids`, -1 = kosong) beserta skornya."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, ids=ids, neighbours=neighbours, scores=scores)
+
+
+def load_neighbour_lists(path=NEIGHBOURS_PATH):
+    """{key: [(key tetangga, skor), ...]} dari build terakhir, atau None jika belum ada."""
+    try:
+        data = np.load(path)
+    except FileNotFoundError:
+        return None
+    keys = [tuple(k) for k in data["ids"].tolist()]
+    return {
+        key: [(keys[j], float(score)) for j, score in zip(row, scores) if j >= 0]
+        for key, row, scores in zip(keys, data["neighbours"], data["scores"])
+    }
+
+
+def key_pairs(lists, threshold):
+    """Relasi tak berarah {(key_1, key_2): similarity} dari daftar top-k (sama dengan collect_pairs)."""
+    pairs = {}
+    for key, neighbours in lists.items():
+        for neighbour, similarity in neighbours:
+            if similarity < threshold:
+                break
+            pairs[(min(key, neighbour), max(key, neighbour))] = similarity
+    return pairs
+
+
+def rows_to_recompute(matrix, keys, previous, changed, removed, k, memory_limit_mb):
+    """Baris yang daftar top-k-nya mungkin berbeda dari build terakhir.
+
+    - ayat berubah/baru (changed);
+    - ayat yang daftar lamanya memuat ayat berubah atau terhapus;
+    - ayat yang similarity-nya ke salah satu ayat berubah melebihi skor tetangga
+      ke-k lamanya (ayat berubah kini masuk top-k), dicari dengan satu pass
+      matrix @ matrix[changed].T per blok.
+    Baris lain tidak bisa berubah karena vektornya dan semua kandidat teratasnya tetap.
+    """
+    position = {key: i for i, key in enumerate(keys)}
+    changed_rows = np.array(sorted(position[key] for key in changed), dtype=np.int64)
+    stale = set(changed) | set(removed)
+    rows = set(changed_rows.tolist())
+
+    kth = np.full(len(keys), -np.inf, dtype=np.float32)
+    for key, neighbours in previous.items():
+        if key not in position:
+            continue
+        if any(neighbour in stale for neighbour, _ in neighbours):
+            rows.add(position[key])
+        elif len(neighbours) >= min(k, len(keys) - 1):
+            kth[position[key]] = neighbours[-1][1]
+    # Ayat tanpa daftar lama (baru) sudah termasuk changed; kth -inf untuk daftar yang belum penuh
+
+    if len(changed_rows):
+        block = max(1, int(memory_limit_mb * 2**20 // (len(changed_rows) * 4)))
+        changed_matrix = matrix[changed_rows]
+        for start in range(0, len(keys), block):
+            similarities = matrix[start:start + block] @ changed_matrix.T
+            # Similarity baris ke dirinya sendiri tidak dihitung
+            own = (changed_rows >= start) & (changed_rows < start + block)
+            similarities[changed_rows[own] - start, np.nonzero(own)[0]] = -np.inf
+            best = similarities.max(axis=1)
+            rows.update((start + np.nonzero(best > kth[start:start + block])[0]).tolist())
+    return sorted(rows)
+
+
 class QuranRelator:
     def __init__(self, driver, threshold=0.75, k=10):
         self.driver = driver
         self.threshold = threshold
         self.k = k  # Jumlah tetangga terdekat yang akan dihubungkan
-        self.ayat_embeddings = {}
-        self.ayat_data = []  # Untuk menyimpan data dalam format yang mudah diolah
+        self.store = None  # EmbeddingMatrix: matriks float32 + array ID (surah_number, number)
+        self.keys = []
+        self.timings = {}  # Durasi fase load / compute / write (detik)
 
-    def load_embeddings(self):
-        """Ambil embedding semua ayat yang ada di database"""
+    def load_embeddings(self, mmap=False, reuse=True):
+        """Ambil embedding semua ayat ke matriks float32 ternormalisasi (lihat embedding_store).
+
+        Matriks disimpan di EMBEDDING_MATRIX_DIR dan dipakai lagi pada run berikutnya
+        selama korpus tidak berubah; mmap=True menjaga matriks tetap di disk.
+        """
         try:
-            with self.driver.session() as session:
-                query = """
-                    MATCH (s:Surah)-[:HAS_AYAT]->(a:Ayat)
-                    RETURN s.number AS surah_number, a.number AS ayah_number, a.embedding AS embedding
-                """
-                result = session.run(query)
-                for record in result:
-                    surah_num = record["surah_number"]
-                    ayah_num = record["ayah_number"]
-                    embedding = record["embedding"]
-                    
-                    # Simpan embedding dalam dict untuk akses cepat
-                    self.ayat_embeddings[(surah_num, ayah_num)] = embedding
-                    
-                    # Simpan informasi dalam format array untuk komputasi batch
-                    self.ayat_data.append({
-                        'surah_number': surah_num,
-                        'ayah_number': ayah_num,
-                        'embedding': embedding
-                    })
-            
+            load_start = time.time()
+            self.store = load_embedding_matrix(self.driver, "Ayat", mmap=mmap, reuse=reuse)
+            self.keys = self.store.keys()
+            self.timings["load"] = time.time() - load_start
             print("✅ Embedding berhasil dimuat!")
-            print(f"Jumlah embedding yang dimuat: {len(self.ayat_embeddings)}")
+            print(f"Jumlah embedding yang dimuat: {len(self.keys)}")
         except Exception as e:
             print(f"❌ Error saat memuat embedding: {str(e)}")
             import traceback
             traceback.print_exc()
 
-    def batch_process_knn(self, batch_size=100):
-        """Proses KNN dalam batch untuk menghemat memori"""
+    def load_exported_embeddings(self, directory):
+        """Embedding ayat dari insert_word2vec.py --export-csv, bukan dari Neo4j yang akan ditimpa impor."""
+        exported = load_embeddings(directory, "Ayat")
+        if exported is None:
+            raise FileNotFoundError(
+                f"❌ Embedding ayat belum diekspor: jalankan insert_word2vec.py --export-csv {directory} lebih dulu"
+            )
+        ids, hashes, matrix = exported
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        self.store = EmbeddingMatrix("Ayat", ids, hashes, matrix, {"normalized": True})
+        self.keys = self.store.keys()
+        print(f"✅ {len(self.keys)} embedding ayat dimuat dari {directory}")
+
+    def batch_process_knn(self, batch_size=None, memory_limit_mb=KNN_MEMORY_LIMIT_MB,
+                          write_batch_size=KNN_WRITE_BATCH_SIZE, export_dir=None):
+        """Bangun relasi KNN: matmul float32 per blok atas matriks ternormalisasi, top-k dengan argpartition.
+
+        Ukuran blok mengikuti memory_limit_mb (matriks similarity satu blok) kecuali
+        batch_size diberikan. Relasi ditulis dalam batch UNWIND besar, atau ke CSV
+        untuk neo4j-admin jika export_dir diberikan.
+        """
         try:
-            total_ayat = len(self.ayat_data)
-            total_relations = 0
             start_time = time.time()
-            
-            # Siapkan array numpy untuk semua embedding
-            all_embeddings = np.array([data['embedding'] for data in self.ayat_data])
-            
-            with self.driver.session() as session:
-                # Proses dalam batch untuk menghemat memori
-                for i in tqdm(range(0, total_ayat, batch_size), desc="Memproses Batch KNN"):
-                    end_idx = min(i + batch_size, total_ayat)
-                    batch_embeddings = all_embeddings[i:end_idx]
-                    
-                    # Hitung similarity matrix untuk batch saat ini dengan semua ayat
-                    # Ini menghitung similarity dari setiap ayat di batch dengan semua ayat di dataset
-                    similarity_matrix = cosine_similarity(batch_embeddings, all_embeddings)
-                    
-                    # Untuk setiap ayat dalam batch
-                    for batch_idx, sim_scores in enumerate(similarity_matrix):
-                        global_idx = i + batch_idx
-                        ayat1 = self.ayat_data[global_idx]
-                        
-                        # Dapatkan K tetangga terdekat
-                        # Urutkan berdasarkan similarity score
-                        # -1 karena kita tidak ingin memasukkan ayat itu sendiri (similarity=1.0)
-                        top_indices = np.argsort(sim_scores)[-self.k-1:-1][::-1]
-                        
-                        batch_relations = []
-                        for neighbor_idx in top_indices:
-                            # Skip jika itu adalah ayat yang sama
-                            if neighbor_idx == global_idx:
-                                continue
-                                
-                            ayat2 = self.ayat_data[neighbor_idx]
-                            similarity = sim_scores[neighbor_idx]
-                            
-                            # Hanya buat relasi jika di atas threshold
-                            if similarity >= self.threshold:
-                                batch_relations.append({
-                                    "surah_number_1": ayat1['surah_number'],
-                                    "ayah_number_1": ayat1['ayah_number'],
-                                    "surah_number_2": ayat2['surah_number'],
-                                    "ayah_number_2": ayat2['ayah_number'],
-                                    "similarity": float(similarity)
-                                })
-                        
-                        # Buat relasi dalam batch untuk kinerja yang lebih baik
-                        if batch_relations:
-                            query = """
-                            UNWIND $batch AS relation
-                            MATCH (a:Ayat), (b:Ayat)
-                            WHERE a.number = relation.ayah_number_1 AND EXISTS {
-                                MATCH (s:Surah)-[:HAS_AYAT]->(a) WHERE s.number = relation.surah_number_1
-                            }
-                            AND b.number = relation.ayah_number_2 AND EXISTS {
-                                MATCH (s:Surah)-[:HAS_AYAT]->(b) WHERE s.number = relation.surah_number_2
-                            }
-                            MERGE (a)-[:RELATED_TO {similarity: relation.similarity}]->(b)
-                            MERGE (b)-[:RELATED_TO {similarity: relation.similarity}]->(a)
-                            """
-                            session.run(query, {"batch": batch_relations})
-                            total_relations += len(batch_relations) * 2  # x2 karena relasi timbal balik
-                
-                elapsed_time = time.time() - start_time
-                print(f"✅ Relasi KNN berhasil dibuat! Total relasi: {total_relations}")
-                print(f"Waktu yang dibutuhkan: {elapsed_time:.2f} detik")
-                
+            keys = self.keys
+            matrix = self.store.matrix  # Sudah dinormalisasi L2 saat dimuat
+            block_size = batch_size or knn_block_size(len(matrix), memory_limit_mb)
+
+            compute_start = time.time()
+            pairs = {}
+            all_neighbours = np.full((len(matrix), self.k), -1, dtype=np.int32)
+            all_scores = np.full((len(matrix), self.k), -np.inf, dtype=np.float32)
+            progress = tqdm(total=len(matrix), desc="Memproses Blok KNN")
+            for row_ids, neighbour_ids, scores in knn_blocks(matrix, self.k, block_size):
+                collect_pairs(pairs, row_ids, neighbour_ids, scores, self.threshold)
+                all_neighbours[row_ids, :neighbour_ids.shape[1]] = neighbour_ids
+                all_scores[row_ids, :scores.shape[1]] = scores
+                progress.update(len(row_ids))
+            progress.close()
+            self.timings["compute"] = time.time() - compute_start
+
+            write_start = time.time()
+            if export_dir:
+                total_relations = export_relations_csv(export_dir, keys, pairs)
+            else:
+                total_relations = write_relations(self.driver, keys, pairs, write_batch_size)
+            self.timings["write"] = time.time() - write_start
+
+            save_snapshot(self.store, RELATIONS_SNAPSHOT)
+            save_neighbour_lists(self.store.ids, all_neighbours, all_scores)
+
+            elapsed_time = time.time() - start_time
+            print(f"✅ Relasi KNN berhasil dibuat! Total relasi: {total_relations}")
+            print(f"Waktu yang dibutuhkan: {elapsed_time:.2f} detik (blok {block_size} ayat)")
+            self.report_timings()
+
         except Exception as e:
             print(f"❌ Error saat membuat relasi KNN: {str(e)}")
             import traceback
             traceback.print_exc()
 
+    def incremental_update(self, changed=None, mmap=False, memory_limit_mb=KNN_MEMORY_LIMIT_MB,
+                           write_batch_size=KNN_WRITE_BATCH_SIZE):
+        """Perbarui relasi hanya untuk ayat yang terdampak perubahan sejak build terakhir.
+
+        Ayat berubah (C) = embedding_hash berbeda dari snapshot terakhir, ditambah ayat baru,
+        atau daftar `changed` [(surah, ayat), ...] jika diberikan. Daftar top-k dihitung
+        ulang untuk C dan semua ayat yang daftarnya bisa berubah (lihat rows_to_recompute),
+        termasuk bekas tetangga ayat yang terhapus. Relasi baru dibandingkan dengan relasi
+        build terakhir: yang hilang dihapus, yang baru atau menyentuh C ditulis dengan MERGE,
+        sehingga hasilnya sama dengan build penuh.
+
+        Mengembalikan False jika belum ada snapshot (perlu build penuh).
+        """
+        previous = load_snapshot(RELATIONS_SNAPSHOT)
+        previous_lists = load_neighbour_lists()
+        if previous is None or previous_lists is None:
+            print("⚠️ Snapshot relasi belum ada, jalankan build penuh terlebih dahulu")
+            return False
+
+        load_start = time.time()
+        self.store = sync_embedding_matrix(self.driver, "Ayat", mmap=mmap)
+        self.keys = self.store.keys()
+        position = {key: i for i, key in enumerate(self.keys)}
+        self.timings["load"] = time.time() - load_start
+
+        removed = [key for key in previous_lists if key not in position]
+        if changed is None:
+            changed = [key for key, h in zip(self.keys, self.store.hashes.tolist()) if previous.get(key) != h]
+        changed = {tuple(key) for key in changed if tuple(key) in position}
+        changed.update(key for key in self.keys if key not in previous_lists)
+        if not changed and not removed:
+            print("✅ Tidak ada ayat yang berubah, relasi tetap")
+            save_snapshot(self.store, RELATIONS_SNAPSHOT)
+            return True
+
+        compute_start = time.time()
+        matrix = self.store.matrix
+        rows = rows_to_recompute(matrix, self.keys, previous_lists, changed, removed, self.k, memory_limit_mb)
+
+        lists = {key: neighbours for key, neighbours in previous_lists.items() if key in position}
+        block_size = knn_block_size(len(self.keys), memory_limit_mb)
+        for row_ids, neighbour_ids, scores in knn_blocks(matrix, self.k, block_size, rows=rows):
+            for row, neighbours, sims in zip(row_ids, neighbour_ids, scores):
+                lists[self.keys[row]] = [(self.keys[j], float(sim)) for j, sim in zip(neighbours, sims)]
+
+        old_pairs = key_pairs(previous_lists, self.threshold)
+        new_pairs = key_pairs(lists, self.threshold)
+        to_delete = [pair for pair in old_pairs if pair not in new_pairs]
+        to_write = {
+            pair: similarity for pair, similarity in new_pairs.items()
+            if pair not in old_pairs or pair[0] in changed or pair[1] in changed
+        }
+        self.timings["compute"] = time.time() - compute_start
+
+        write_start = time.time()
+        deleted = delete_relations(self.driver, to_delete, write_batch_size)
+        total_relations = write_relations(
+            self.driver, self.keys,
+            {(position[a], position[b]): similarity for (a, b), similarity in to_write.items()},
+            write_batch_size
+        )
+        self.timings["write"] = time.time() - write_start
+
+        neighbours = np.full((len(self.keys), self.k), -1, dtype=np.int32)
+        scores = np.full((len(self.keys), self.k), -np.inf, dtype=np.float32)
+        for key, items in lists.items():
+            row = position[key]
+            for column, (neighbour, similarity) in enumerate(items):
+                neighbours[row, column] = position[neighbour]
+                scores[row, column] = similarity
+        save_snapshot(self.store, RELATIONS_SNAPSHOT)
+        save_neighbour_lists(self.store.ids, neighbours, scores)
+
+        print(
+            f"✅ Relasi diperbarui: {len(changed)} ayat berubah, {len(removed)} terhapus, "
+            f"{len(rows)} daftar tetangga dihitung ulang; {total_relations} relasi ditulis, {deleted} dihapus"
+        )
+        self.report_timings()
+        return True
+
+    def report_timings(self):
+        print("⏱️ Waktu per fase: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.timings.items()))
+
     def cleanup_old_relations(self):
-        """Hapus relasi RELATED_TO yang lama sebelum membuat yang baru"""
+        """Hapus relasi RELATED_TO antar ayat yang lama sebelum membuat yang baru (relasi antar Chunk tetap)"""
         try:
             with self.driver.session() as session:
                 print("Menghapus relasi lama...")
-                session.run("MATCH ()-[r:RELATED_TO]->() DELETE r")
+                session.run("MATCH (:Ayat)-[r:RELATED_TO]->(:Ayat) DELETE r")
                 print("✅ Relasi lama berhasil dihapus")
         except Exception as e:
             print(f"❌ Error saat menghapus relasi lama: {str(e)}")
 
 # Main function to run the class methods
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bangun relasi RELATED_TO antar ayat (KNN)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Simpan matriks embedding di disk (memory-mapped) alih-alih di RAM")
+    parser.add_argument("--reload", action="store_true",
+                        help="Baca ulang embedding dari Neo4j walaupun matriks tersimpan masih valid")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Hanya perbarui relasi ayat yang embedding_hash-nya berubah sejak build terakhir")
+    parser.add_argument("--changed", default=None,
+                        help="Daftar ayat berubah, mis. '2:255,2:256' (mengaktifkan --incremental)")
+    parser.add_argument("--export-csv", metavar="DIR", default=None,
+                        help="Hitung relasi dari embedding insert_word2vec.py --export-csv DIR dan tulis ke CSV "
+                             "untuk neo4j-admin database import alih-alih ke Neo4j")
+    args = parser.parse_args()
+
     # Gunakan threshold yang lebih tinggi (0.75) dan batasi maksimal 10 tetangga terdekat
     relator = QuranRelator(driver, threshold=0.75, k=10)
-    relator.load_embeddings()  # Memuat embedding ayat
-    relator.cleanup_old_relations()  # Hapus relasi lama
-    relator.batch_process_knn(batch_size=100)  # Buat relasi baru dengan metode batch
\ No newline at end of file
+    if args.export_csv:
+        relator.load_exported_embeddings(args.export_csv)
+        relator.batch_process_knn(export_dir=args.export_csv)
+        print(f"📦 Relasi ditulis ke {args.export_csv}; impor bersama CSV dari insert_data.py --export-csv")
+    else:
+        ensure_schema(driver)  # Lookup Ayat saat menulis relasi butuh index
+        changed = None
+        if args.changed:
+            changed = [tuple(int(n) for n in ref.split(":")) for ref in args.changed.split(",") if ref.strip()]
+
+        if not ((args.incremental or changed) and relator.incremental_update(changed=changed, mmap=args.mmap)):
+            relator.load_embeddings(mmap=args.mmap, reuse=not args.reload)  # Memuat embedding ayat
+            relator.cleanup_old_relations()  # Hapus relasi lama
+            relator.batch_process_knn()  # Buat relasi baru per blok sesuai KNN_MEMORY_LIMIT_MB
+        bump_version("relations")  # Adjacency RELATED_TO di search.py dimuat ulang
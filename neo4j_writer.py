@@ -0,0 +1,156 @@
+# neo4j_writer.py
+import time
+
+SURAH_QUERY = """
+UNWIND $rows AS row
+MATCH (q:Quran {name: 'Al-Quran'})
+CREATE (s:Surah {
+    number: row.number,
+    name: row.name,
+    name_latin: row.name_latin,
+    number_of_ayah: row.number_of_ayah
+})
+CREATE (q)-[:HAS_SURAH]->(s)
+"""
+
+# Ayat dan Chunk ditulis dalam satu query sehingga node Ayat tidak perlu
+# dicari ulang (MATCH Surah-[:HAS_AYAT]->Ayat) untuk setiap chunk.
+# Embedding chunk ditulis lewat setNodeVectorProperty agar disimpan sebagai float32,
+# bukan list float64 biasa (separuh ukuran, sama seperti kolom float[] bulk_export).
+AYAT_QUERY = """
+UNWIND $rows AS row
+MATCH (s:Surah {number: row.surah_number})
+CREATE (a:Ayat {
+    number: row.number,
+    surah_number: row.surah_number,
+    text: row.text,
+    translation: row.translation,
+    tafsir: row.tafsir,
+    content_hash: row.content_hash
+})
+CREATE (s)-[:HAS_AYAT]->(a)
+WITH a, row
+UNWIND row.chunks AS chunk
+CREATE (c:Chunk {
+    id: chunk.id,
+    text: chunk.text,
+    source: chunk.source,
+    ayat_number: row.number,
+    surah_name: row.surah_name,
+    surah_number: row.surah_number
+})
+CREATE (a)-[:HAS_CHUNK]->(c)
+WITH c, chunk
+CALL db.create.setNodeVectorProperty(c, 'embedding', chunk.embedding)
+"""
+
+# Mode upsert: node yang sudah ada diperbarui, relasi lain (RELATED_TO, KG) tetap utuh.
+# content_hash ditulis dalam transaksi yang sama dengan chunk-nya, sehingga ayat yang
+# hash-nya sudah cocok pasti sudah lengkap dan bisa dilewati saat melanjutkan proses.
+SURAH_UPSERT_QUERY = """
+UNWIND $rows AS row
+MERGE (q:Quran {name: 'Al-Quran'})
+MERGE (s:Surah {number: row.number})
+SET s.name = row.name,
+    s.name_latin = row.name_latin,
+    s.number_of_ayah = row.number_of_ayah
+MERGE (q)-[:HAS_SURAH]->(s)
+"""
+
+AYAT_UPSERT_QUERY = """
+UNWIND $rows AS row
+MATCH (s:Surah {number: row.surah_number})
+MERGE (s)-[:HAS_AYAT]->(a:Ayat {number: row.number})
+SET a.surah_number = row.surah_number,
+    a.text = row.text,
+    a.translation = row.translation,
+    a.tafsir = row.tafsir,
+    a.content_hash = row.content_hash
+WITH a, row
+CALL {
+    WITH a
+    OPTIONAL MATCH (a)-[:HAS_CHUNK]->(old:Chunk)
+    DETACH DELETE old
+}
+WITH a, row
+UNWIND row.chunks AS chunk
+CREATE (c:Chunk {
+    id: chunk.id,
+    text: chunk.text,
+    source: chunk.source,
+    ayat_number: row.number,
+    surah_name: row.surah_name,
+    surah_number: row.surah_number
+})
+CREATE (a)-[:HAS_CHUNK]->(c)
+WITH c, chunk
+CALL db.create.setNodeVectorProperty(c, 'embedding', chunk.embedding)
+"""
+
+
+class BatchWriter:
+    """Menulis Surah, Ayat, dan Chunk ke Neo4j dalam transaksi UNWIND berukuran batch."""
+
+    def __init__(self, driver, batch_size=200, flush_per_surah=False, upsert=False):
+        self.driver = driver
+        self.surah_query = SURAH_UPSERT_QUERY if upsert else SURAH_QUERY
+        self.ayat_query = AYAT_UPSERT_QUERY if upsert else AYAT_QUERY
+        self.batch_size = batch_size
+        self.flush_per_surah = flush_per_surah
+        self.surah_rows = []
+        self.ayat_rows = []
+        self.pending_rows = 0
+        self.rows_written = 0
+        self.transactions = 0
+        self.write_time = 0.0
+        self.start_time = time.time()
+
+    def add_surah(self, row):
+        self.surah_rows.append(row)
+        self.pending_rows += 1
+
+    def add_ayat(self, row):
+        """Tambahkan satu baris Ayat beserta daftar chunk-nya (row['chunks'])."""
+        self.ayat_rows.append(row)
+        self.pending_rows += 1 + len(row.get("chunks", []))
+        if not self.flush_per_surah and self.pending_rows >= self.batch_size:
+            self.flush()
+
+    def end_surah(self):
+        if self.flush_per_surah:
+            self.flush()
+
+    def flush(self):
+        if not self.surah_rows and not self.ayat_rows:
+            return
+
+        start = time.time()
+        with self.driver.session() as session:
+            # Surah harus sudah ada sebelum Ayat di-MATCH
+            if self.surah_rows:
+                session.execute_write(self._run, self.surah_query, self.surah_rows)
+                self.transactions += 1
+            if self.ayat_rows:
+                session.execute_write(self._run, self.ayat_query, self.ayat_rows)
+                self.transactions += 1
+        self.write_time += time.time() - start
+
+        self.rows_written += self.pending_rows
+        self.surah_rows = []
+        self.ayat_rows = []
+        self.pending_rows = 0
+
+    @staticmethod
+    def _run(tx, query, rows):
+        tx.run(query, rows=rows).consume()
+
+    def rows_per_second(self):
+        return self.rows_written / self.write_time if self.write_time else 0.0
+
+    def close(self):
+        self.flush()
+        elapsed = time.time() - self.start_time
+        print(
+            f"📝 {self.rows_written} baris ditulis dalam {self.transactions} transaksi "
+            f"({self.rows_per_second():.1f} baris/detik saat menulis, total {elapsed:.2f} detik)"
+        )
@@ -0,0 +1,89 @@
+# query_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config import DATA_VERSION_DIR
+
+_MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    """Normalisasi pertanyaan agar variasi huruf besar/spasi memakai entri cache yang sama."""
+    return " ".join(text.lower().split())
+
+
+class TTLCache:
+    """Cache LRU in-process dengan batas umur (TTL) per entri; aman dipakai antar-thread."""
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at >= time.monotonic():
+                    self.data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.data),
+            }
+
+
+# ----- Versi data lintas-proses -----
+# Script ingestion berjalan di proses terpisah dari app Streamlit, jadi invalidasi
+# dilakukan lewat file penanda versi: penulis menaikkan versi, pembaca membaca
+# versi tersebut dan membuang cache miliknya jika versinya berubah.
+
+def _version_path(kind):
+    return os.path.join(DATA_VERSION_DIR, f".{kind}_version")
+
+
+def bump_version(kind="corpus"):
+    version = str(time.time_ns())
+    with open(_version_path(kind), "w", encoding="utf-8") as f:
+        f.write(version)
+    return version
+
+
+def current_version(kind="corpus"):
+    try:
+        with open(_version_path(kind), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+
+def mark_corpus_updated():
+    """Dipanggil script ingestion setelah graph ditulis ulang agar cache pencarian dibuang."""
+    return bump_version("corpus")
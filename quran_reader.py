@@ -0,0 +1,152 @@
+# quran_reader.py
+import glob
+import gzip
+import json
+import os
+import re
+
+from config import QURAN_DATA_PATH
+
+READ_SIZE = 1 << 20  # Karakter per pembacaan file
+WHITESPACE = re.compile(r"\s*")
+DATA_EXTENSIONS = (".json", ".jsonl", ".json.gz", ".jsonl.gz")
+
+
+def _natural_key(path):
+    # surah_9.json sebelum surah_10.json
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+
+def data_files(path=QURAN_DATA_PATH):
+    """File data untuk `path`: satu file, direktori berisi shard, atau pola glob (urutan natural)."""
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in os.listdir(path) if name.endswith(DATA_EXTENSIONS)]
+    elif glob.has_magic(path):
+        files = glob.glob(path)
+    else:
+        return [path]
+    if not files:
+        raise FileNotFoundError(f"❌ Tidak ada file data Al-Quran di {path}")
+    return sorted(files, key=_natural_key)
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_json_values(path):
+    """Alirkan nilai JSON dari satu file tanpa memuat seluruh isinya.
+
+    Array di level teratas ([{...}, {...}]) dialirkan per elemen; selain itu
+    file dibaca sebagai deretan nilai (JSON-lines atau satu objek per shard).
+    Hanya satu elemen yang di-decode pada satu waktu dengan JSONDecoder.raw_decode.
+    """
+    decoder = json.JSONDecoder()
+    with _open(path) as file:
+        buffer = ""
+        pos = 0
+        eof = False
+        in_array = None
+
+        def fill(size=READ_SIZE):
+            nonlocal buffer, pos, eof
+            chunk = file.read(size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                if eof:
+                    break
+                fill()
+                continue
+
+            if in_array is None:
+                in_array = buffer[pos] == "["
+                if in_array:
+                    pos += 1
+                continue
+            if in_array and buffer[pos] == "]":
+                break
+            if in_array and buffer[pos] == ",":
+                pos += 1
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Elemen belum lengkap di buffer: baca lagi (ukuran berlipat agar tidak kuadratik)
+                fill(max(READ_SIZE, len(buffer) - pos))
+                continue
+            if end == len(buffer) and not eof and not isinstance(value, (dict, list, str)):
+                # Angka/literal di ujung buffer bisa saja terpotong
+                fill()
+                continue
+            pos = end
+            if isinstance(value, list) and not in_array:
+                yield from value
+            else:
+                yield value
+
+
+def iter_surahs(path=QURAN_DATA_PATH):
+    """Surah satu per satu dari quran.json (boleh .gz, JSON-lines, direktori shard, atau glob)."""
+    for file_path in data_files(path):
+        yield from iter_json_values(file_path)
+
+
+def surah_meta(surah):
+    return {
+        "number": int(surah["number"]),
+        "name": surah["name"],
+        "name_latin": surah["name_latin"],
+        "number_of_ayah": int(surah["number_of_ayah"]),
+    }
+
+
+def tafsir_sources(surah):
+    """{nama sumber: {ayah_key: teks}} untuk semua tafsir satu surah.
+
+    Sumber berbahasa Indonesia memakai namanya saja (mis. "kemenag"), bahasa lain
+    diberi awalan kode bahasa (mis. "en_ibnkathir").
+    """
+    sources = {}
+    for lang, by_name in surah.get("tafsir", {}).items():
+        for name, source in by_name.items():
+            key = name if lang == "id" else f"{lang}_{name}"
+            sources[key] = source.get("text", {})
+    return sources
+
+
+def iter_ayat_records(path=QURAN_DATA_PATH):
+    """Record per ayat: metadata surah (dipakai bersama), teks, terjemahan, dan semua tafsir.
+
+    "tafsir" berisi tafsir Kemenag (sumber utama); "tafsirs" memuat setiap sumber
+    tafsir yang tersedia untuk ayat tersebut.
+    """
+    for surah in iter_surahs(path):
+        meta = surah_meta(surah)
+        translations = surah.get("translations", {}).get("id", {}).get("text", {})
+        tafsirs = tafsir_sources(surah)
+        for ayah_key, ayah_text in surah["text"].items():
+            by_source = {name: texts.get(ayah_key, "") for name, texts in tafsirs.items()}
+            yield {
+                "surah": meta,
+                "ayah_key": ayah_key,
+                "text": ayah_text,
+                "translation": translations.get(ayah_key, ""),
+                "tafsir": by_source.get("kemenag", ""),
+                "tafsirs": {name: text for name, text in by_source.items() if text},
+            }
+
+
+def count_ayat(path=QURAN_DATA_PATH):
+    """Jumlah ayat (untuk progress bar) dengan satu pembacaan streaming."""
+    return sum(len(surah["text"]) for surah in iter_surahs(path))
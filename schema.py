@@ -0,0 +1,171 @@
+# schema.py
+from config import DIMENSION
+from embedding_transform import Transform
+
+SCHEMA_NAME = "quran"
+
+
+# Dimensi tiap vector index. Chunk mengikuti EMBEDDING_TRANSFORM (bisa direduksi),
+# Ayat/Surah tetap memakai dimensi penuh model.
+VECTOR_DIMENSIONS = {
+    "ayat_embeddings": DIMENSION,
+    "surah_embeddings": DIMENSION,
+    "chunk_embeddings": Transform.output_dim,
+}
+
+
+def _vector_index(name, label, var):
+    return {
+        "name": name,
+        "kind": "vector",
+        "cypher": f"""
+            CREATE VECTOR INDEX {name} IF NOT EXISTS
+            FOR ({var}:{label})
+            ON ({var}.embedding)
+            OPTIONS {{
+                indexConfig: {{
+                    `vector.dimensions`: ${name}_dim,
+                    `vector.similarity_function`: 'cosine'
+                }}
+            }}
+        """,
+    }
+
+
+# Setiap migrasi diterapkan berurutan; semua statement idempotent (IF NOT EXISTS)
+# sehingga aman dijalankan ulang. Nomor versi terakhir disimpan di node :SchemaVersion.
+MIGRATIONS = [
+    (1, "constraint, range index, vector index, dan full-text index dasar", [
+        # Constraint unik (otomatis membuat range index pendukung)
+        {"name": "quran_name_unique", "kind": "constraint", "cypher": """
+            CREATE CONSTRAINT quran_name_unique IF NOT EXISTS
+            FOR (q:Quran) REQUIRE q.name IS UNIQUE
+        """},
+        {"name": "surah_number_unique", "kind": "constraint", "cypher": """
+            CREATE CONSTRAINT surah_number_unique IF NOT EXISTS
+            FOR (s:Surah) REQUIRE s.number IS UNIQUE
+        """},
+        {"name": "chunk_id_unique", "kind": "constraint", "cypher": """
+            CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS
+            FOR (c:Chunk) REQUIRE c.id IS UNIQUE
+        """},
+        # Range index untuk lookup Ayat dan Chunk berdasarkan nomor surah/ayat
+        {"name": "ayat_number", "kind": "index", "cypher": """
+            CREATE INDEX ayat_number IF NOT EXISTS
+            FOR (a:Ayat) ON (a.number)
+        """},
+        {"name": "ayat_surah_number", "kind": "index", "cypher": """
+            CREATE INDEX ayat_surah_number IF NOT EXISTS
+            FOR (a:Ayat) ON (a.surah_number, a.number)
+        """},
+        {"name": "chunk_surah_ayat", "kind": "index", "cypher": """
+            CREATE INDEX chunk_surah_ayat IF NOT EXISTS
+            FOR (c:Chunk) ON (c.surah_number, c.ayat_number)
+        """},
+        # Vector index yang dipakai pencarian semantik
+        _vector_index("ayat_embeddings", "Ayat", "a"),
+        _vector_index("surah_embeddings", "Surah", "s"),
+        _vector_index("chunk_embeddings", "Chunk", "c"),
+        # Full-text index atas teks chunk (pencarian leksikal)
+        {"name": "chunk_text_fulltext", "kind": "index", "cypher": """
+            CREATE FULLTEXT INDEX chunk_text_fulltext IF NOT EXISTS
+            FOR (c:Chunk) ON EACH [c.text]
+        """},
+        # Lengkapi surah_number pada Ayat yang dibuat sebelum properti ini ada
+        {"name": None, "kind": "data", "cypher": """
+            MATCH (s:Surah)-[:HAS_AYAT]->(a:Ayat)
+            WHERE a.surah_number IS NULL
+            SET a.surah_number = s.number
+        """},
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def expected_objects():
+    """Nama semua constraint dan index yang dideklarasikan: {nama: jenis}."""
+    return {
+        step["name"]: step["kind"]
+        for _, _, steps in MIGRATIONS
+        for step in steps
+        if step["name"]
+    }
+
+
+def current_version(session):
+    record = session.run(
+        "MATCH (v:SchemaVersion {name: $name}) RETURN v.version AS version",
+        name=SCHEMA_NAME
+    ).single()
+    return record["version"] if record else 0
+
+
+def apply_schema(driver, from_version=None):
+    """Terapkan migrasi yang belum dijalankan dan catat versinya."""
+    with driver.session() as session:
+        version = current_version(session) if from_version is None else from_version
+        for number, description, steps in MIGRATIONS:
+            if number <= version:
+                continue
+            print(f"🛠️ Migrasi skema v{number}: {description}")
+            params = {f"{name}_dim": dim for name, dim in VECTOR_DIMENSIONS.items()}
+            for step in steps:
+                session.run(step["cypher"], params).consume()
+            session.run(
+                "MERGE (v:SchemaVersion {name: $name}) SET v.version = $version",
+                name=SCHEMA_NAME, version=number
+            ).consume()
+        # Tunggu sampai semua index selesai dibangun
+        session.run("CALL db.awaitIndexes(300)").consume()
+
+
+def vector_dimension(options):
+    return ((options or {}).get("indexConfig") or {}).get("vector.dimensions")
+
+
+def drop_mismatched_vector_indexes(driver):
+    """Hapus vector index yang dimensinya tidak sesuai konfigurasi (mis. setelah ganti transformasi)."""
+    with driver.session() as session:
+        for record in session.run("SHOW INDEXES YIELD name, options WHERE type = 'VECTOR'"):
+            name = record["name"]
+            if name in VECTOR_DIMENSIONS and vector_dimension(record["options"]) != VECTOR_DIMENSIONS[name]:
+                print(f"🧹 Menghapus index {name} (dimensi berubah)")
+                session.run(f"DROP INDEX {name} IF EXISTS").consume()
+
+
+def verify_schema(driver):
+    """Kembalikan daftar masalah skema (kosong jika semua constraint/index ada dan ONLINE)."""
+    problems = []
+    with driver.session() as session:
+        indexes = {r["name"]: (r["state"], r["options"]) for r in session.run("SHOW INDEXES YIELD name, state, options")}
+        constraints = {r["name"] for r in session.run("SHOW CONSTRAINTS YIELD name")}
+        version = current_version(session)
+
+    for name, kind in expected_objects().items():
+        if kind == "constraint" and name not in constraints:
+            problems.append(f"constraint {name} tidak ada")
+        elif kind in ("index", "vector") and name not in indexes:
+            problems.append(f"index {name} tidak ada")
+        elif kind in ("index", "vector") and indexes[name][0] != "ONLINE":
+            problems.append(f"index {name} berstatus {indexes[name][0]}")
+        elif kind == "vector" and vector_dimension(indexes[name][1]) != VECTOR_DIMENSIONS[name]:
+            problems.append(
+                f"index {name} berdimensi {vector_dimension(indexes[name][1])}, seharusnya {VECTOR_DIMENSIONS[name]}"
+            )
+    if version < LATEST_VERSION:
+        problems.append(f"versi skema {version}, seharusnya {LATEST_VERSION}")
+    return problems
+
+
+def ensure_schema(driver):
+    """Pastikan skema lengkap sebelum penulisan massal; terapkan migrasi jika perlu."""
+    problems = verify_schema(driver)
+    if not problems:
+        return
+    # Terapkan ulang semua migrasi jika ada objek yang hilang (misalnya dihapus manual)
+    drop_mismatched_vector_indexes(driver)
+    apply_schema(driver, from_version=0)
+    problems = verify_schema(driver)
+    if problems:
+        raise RuntimeError("❌ Skema Neo4j tidak lengkap: " + "; ".join(problems))
@@ -1,63 +1,390 @@
 # search.py
 
 import json
+import time
 import traceback
 import requests
 import os
-from config import driver, INDEX_NAME, GROQ_API_KEY, GROQ_MODEL
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import (
+    driver, INDEX_NAME, GROQ_API_KEY, GROQ_MODEL, GROQ_API_URL, QUERY_CACHE_SIZE, QUERY_CACHE_TTL,
+    SEARCH_MODE, RRF_K, HYBRID_CANDIDATE_FACTOR, HYBRID_VECTOR_BUDGET, HYBRID_LEXICAL_BUDGET,
+    VERSE_REF_FAST_PATH, GRAPH_NEIGHBOURS, GRAPH_MIN_SIMILARITY, ANSWER_CACHE_ENABLED
+)
 from groq_embedder import Embedder
+from embedding_transform import Transform
+from query_cache import TTLCache, normalize_query, current_version
+from hybrid import build_lucene_query, reciprocal_rank_fusion
+from graph_expansion import AdjacencyCache, expand_hits
+from context_builder import build_context
+from answer_cache import AnswerCache
+from verse_ref import SurahNameIndex, parse_verse_query, fetch_reference_chunks, merge_with_remainder
 
-def vector_search_chunks(query_text, top_k=5, min_score=0.6):
+# Cache in-process: embedding query dan hasil vector search
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+search_result_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+_cached_corpus_version = (current_version(), current_version("relations"))
+
+# Cache jawaban LLM di disk, dicari berdasarkan kemiripan embedding pertanyaan
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
+
+
+def invalidate_search_cache():
+    """Buang hasil pencarian yang di-cache dan tabel nama surah (embedding query tetap valid)."""
+    global _surah_index
+    search_result_cache.clear()
+    _surah_index = None
+
+
+def _check_corpus_version():
+    # Korpus atau relasi RELATED_TO ditulis ulang oleh script lain → hasil lama tidak valid
+    global _cached_corpus_version
+    version = (current_version(), current_version("relations"))
+    if version != _cached_corpus_version:
+        invalidate_search_cache()
+        _cached_corpus_version = version
+
+
+def search_cache_stats():
+    stats = {
+        "query_embedding": query_embedding_cache.stats(),
+        "search_result": search_result_cache.stats(),
+    }
+    if answer_cache is not None:
+        stats["answer"] = answer_cache.stats()
+    return stats
+
+
+def embed_query_cached(query_text):
+    key = normalize_query(query_text)
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        # Query harus melalui transformasi yang sama dengan embedding chunk
+        vector = Transform.apply(Embedder.embed_query(query_text))
+        query_embedding_cache.put(key, vector)
+    return vector
+
+
+def embed_queries_cached(queries):
+    """Embed banyak query sekaligus (satu batch ke Ollama untuk yang belum di-cache)."""
+    keys = [normalize_query(q) for q in queries]
+    vectors = {key: query_embedding_cache.get(key) for key in dict.fromkeys(keys)}
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        texts = {key: q for q, key in zip(queries, keys)}
+        computed = Transform.apply_many(Embedder.embed_texts([texts[key] for key in missing]))
+        for key, vector in zip(missing, computed):
+            query_embedding_cache.put(key, vector)
+            vectors[key] = vector
+    return [vectors[key] for key in keys]
+
+
+CHUNK_VECTOR_QUERY = """
+CALL db.index.vector.queryNodes('chunk_embeddings', $top_k, $query_vector)
+YIELD node, score
+RETURN node.text AS chunk_text,
+       node.source AS source,
+       node.ayat_number AS ayat_number,
+       node.surah_name AS surah,
+       node.surah_number AS surah_number,
+       node.id AS chunk_id,
+       score
+ORDER BY score DESC
+"""
+
+# Banyak query vektor dalam satu round-trip: satu subquery index per vektor, hasil ditandai query_index
+CHUNK_VECTOR_BATCH_QUERY = """
+UNWIND range(0, size($query_vectors) - 1) AS query_index
+CALL {
+    WITH query_index
+    CALL db.index.vector.queryNodes('chunk_embeddings', $top_k, $query_vectors[query_index])
+    YIELD node, score
+    RETURN node, score
+}
+RETURN query_index,
+       node.text AS chunk_text,
+       node.source AS source,
+       node.ayat_number AS ayat_number,
+       node.surah_name AS surah,
+       node.surah_number AS surah_number,
+       node.id AS chunk_id,
+       score
+ORDER BY query_index, score DESC
+"""
+
+CHUNK_FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes('chunk_text_fulltext', $query, {limit: $top_k})
+YIELD node, score
+RETURN node.text AS chunk_text,
+       node.source AS source,
+       node.ayat_number AS ayat_number,
+       node.surah_name AS surah,
+       node.surah_number AS surah_number,
+       node.id AS chunk_id,
+       score
+ORDER BY score DESC
+"""
+
+# Executor bersama untuk menjalankan leg vektor dan leksikal secara paralel
+_leg_executor = ThreadPoolExecutor(max_workers=8)
+
+
+def report_records(records):
+    if not records:
+        print("⚠️ Tidak ada chunk yang melewati ambang skor minimal.")
+    else:
+        print("📦 Chunk relevan ditemukan:")
+        for r in records:
+            legs = ", ".join(
+                f"{name}={r[f'{name}_score']:.4f}" for name in ("vector", "lexical") if r.get(f"{name}_score") is not None
+            )
+            print(f"- ({r['surah']}:{r['ayat_number']}) [{r['source']}] | score={r['score']:.4f}" + (f" ({legs})" if legs else ""))
+
+
+def filter_and_report(records, min_score):
+    # Filter by score threshold
+    filtered = [r for r in records if r["score"] >= min_score]
+    report_records(filtered)
+    return filtered
+
+
+def _vector_leg(query_text, top_k, min_score):
+    vector = embed_query_cached(query_text)
+    result = driver.execute_query(CHUNK_VECTOR_QUERY, {"query_vector": vector, "top_k": top_k})
+    return [r for r in (result.records or []) if r["score"] >= min_score]
+
+
+def _lexical_leg(query_text, top_k):
+    lucene_query = build_lucene_query(query_text)
+    if not lucene_query:
+        return []
+    result = driver.execute_query(CHUNK_FULLTEXT_QUERY, {"query": lucene_query, "top_k": top_k})
+    return result.records or []
+
+
+def _leg_result(future, deadline, name):
+    """Ambil hasil satu leg dalam anggaran waktunya sebagai (records, ok).
+
+    Leg yang gagal/terlambat dianggap kosong dengan ok=False, agar hasil gabungan
+    yang tidak lengkap itu tidak disimpan ke cache.
+    """
     try:
-        vector = Embedder.embed_text(query_text)
-
-        result = driver.execute_query(
-            """
-            CALL db.index.vector.queryNodes('chunk_embeddings', $top_k, $query_vector)
-            YIELD node, score
-            RETURN node.text AS chunk_text,
-                   node.source AS source,
-                   node.ayat_number AS ayat_number,
-                   node.surah_name AS surah,
-                   score
-            ORDER BY score DESC
-            """,
-            {"query_vector": vector, "top_k": top_k}
-        )
+        return future.result(timeout=max(0.0, deadline - time.monotonic())), True
+    except FutureTimeoutError:
+        print(f"⏱️ Leg {name} melewati anggaran waktu, dilewati")
+    except Exception:
+        print(f"❌ Leg {name} error: {traceback.format_exc()}")
+    return [], False
+
+
+def fuse_legs(vector_leg, lexical_leg, top_k):
+    """Gabungkan (records, ok) leg vektor dan leksikal dengan RRF; kembalikan (records, degraded).
+
+    Leg leksikal tidak punya ambang skor, jadi hasilnya hanya dipakai jika leg vektor
+    menemukan sesuatu di atas min_score. Satu kata yang kebetulan sama dengan sebuah
+    chunk tidak cukup untuk dikirim ke LLM. Jika leg vektor gagal, hasil leksikal
+    tetap dipakai sebagai cadangan, tetapi ditandai degraded.
+    """
+    (vector_hits, vector_ok), (lexical_hits, lexical_ok) = vector_leg, lexical_leg
+    if vector_ok and not vector_hits:
+        report_records([])
+        return [], False
+    fused = reciprocal_rank_fusion({"vector": vector_hits, "lexical": lexical_hits}, top_k, k=RRF_K)
+    report_records(fused)
+    return fused, not (vector_ok and lexical_ok)
+
+
+def hybrid_search_chunks(query_text, top_k=5, min_score=0.6):
+    """Leg vektor (chunk_embeddings) + leg leksikal (full-text) digabung dengan RRF.
+
+    Mengembalikan (records, degraded); degraded=True jika ada leg yang gagal atau terlambat.
+    """
+    start = time.monotonic()
+    candidates = top_k * HYBRID_CANDIDATE_FACTOR
+    vector_future = _leg_executor.submit(_vector_leg, query_text, candidates, min_score)
+    lexical_future = _leg_executor.submit(_lexical_leg, query_text, candidates)
+
+    return fuse_legs(
+        _leg_result(vector_future, start + HYBRID_VECTOR_BUDGET, "vector"),
+        _leg_result(lexical_future, start + HYBRID_LEXICAL_BUDGET, "lexical"),
+        top_k,
+    )
+
+
+def get_cached_results(cache_key):
+    _check_corpus_version()
+    cached = search_result_cache.get(cache_key)
+    if cached is not None:
+        print(f"♻️ Hasil pencarian diambil dari cache ({len(cached)} chunk)")
+        return list(cached)
+    return None
+
+
+_surah_index = None
+
+
+def get_surah_index():
+    # Tabel nama surah → nomor dari node Surah; dimuat ulang setelah korpus ditulis ulang
+    global _surah_index
+    _check_corpus_version()
+    if _surah_index is None:
+        _surah_index = SurahNameIndex.load(driver)
+    return _surah_index
+
+
+# Adjacency RELATED_TO dalam memori untuk mode graph; dimuat ulang setelah knn.py menulis relasi baru
+adjacency_cache = AdjacencyCache()
+
+
+def graph_search_chunks(query_text, top_k=5, min_score=0.6):
+    """Hit vektor teratas diperluas satu hop lewat RELATED_TO, lalu diurutkan ulang."""
+    hits, _ = _search_free_text(query_text, top_k, min_score, "vector")
+    if not hits:
+        return [], False
+    expanded = expand_hits(
+        driver, adjacency_cache.get(driver), hits, top_k,
+        neighbours_per_hit=GRAPH_NEIGHBOURS, min_similarity=GRAPH_MIN_SIMILARITY
+    )
+    added = sum(1 for r in expanded if "expanded_from" in r)
+    print(f"🕸️ Ekspansi graph menambahkan {added} chunk dari ayat tetangga")
+    return expanded, False
+
+
+def _search_free_text(query_text, top_k, min_score, mode):
+    """Pencarian tanpa jalur referensi ayat; mengembalikan (records, degraded)."""
+    if mode == "hybrid":
+        return hybrid_search_chunks(query_text, top_k=top_k, min_score=min_score)
+    if mode == "graph":
+        return graph_search_chunks(query_text, top_k=top_k, min_score=min_score)
+
+    vector = embed_query_cached(query_text)
 
-        records = result.records if result.records else []
+    result = driver.execute_query(
+        CHUNK_VECTOR_QUERY,
+        {"query_vector": vector, "top_k": top_k}
+    )
 
-        # Filter by score threshold
-        filtered = [r for r in records if r["score"] >= min_score]
+    records = result.records if result.records else []
+    return filter_and_report(records, min_score), False
 
-        if not filtered:
-            print("⚠️ Tidak ada chunk yang melewati ambang skor minimal.")
+
+def _search_verse_reference(verse_query, top_k, min_score, mode):
+    """Ayat yang disebut eksplisit diambil lewat lookup index tanpa embedding;
+    pencarian vektor/hybrid hanya dijalankan untuk sisa pertanyaan yang bebas."""
+    ref_records = fetch_reference_chunks(driver, verse_query.refs)
+    print(f"🎯 Referensi ayat {verse_query.refs} → {len(ref_records)} chunk lewat lookup langsung")
+    remainder_records, degraded = [], False
+    if verse_query.has_free_text():
+        remainder_records, degraded = _search_free_text(verse_query.remainder, top_k, min_score, mode)
+    return merge_with_remainder(ref_records, remainder_records, top_k), degraded
+
+
+def vector_search_chunks(query_text, top_k=5, min_score=0.6, mode=None):
+    """Cari chunk relevan. mode "vector" = cosine saja, "hybrid" = vektor + full-text (RRF),
+    "graph" = vektor + tetangga RELATED_TO satu hop."""
+    mode = mode or SEARCH_MODE
+    cache_key = (normalize_query(query_text), top_k, min_score, mode)
+    cached = get_cached_results(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        verse_query = parse_verse_query(query_text, get_surah_index()) if VERSE_REF_FAST_PATH else None
+        if verse_query and verse_query.refs:
+            records, degraded = _search_verse_reference(verse_query, top_k, min_score, mode)
         else:
-            print("📦 Chunk relevan ditemukan:")
-            for r in filtered:
-                print(f"- ({r['surah']}:{r['ayat_number']}) [{r['source']}] | score={r['score']:.4f}")
+            records, degraded = _search_free_text(query_text, top_k, min_score, mode)
 
-        return filtered
+        # Hasil dari leg yang gagal/terlambat tidak di-cache, supaya gangguan sesaat tidak menempel selama TTL
+        if not degraded:
+            search_result_cache.put(cache_key, records)
+        return list(records)
 
     except Exception as e:
         print(f"❌ Vector search chunk error: {traceback.format_exc()}")
         return []
 
 
+def _vector_lookup_batch(queries, top_k, min_score, batch_size):
+    """Mode "vector" untuk banyak pertanyaan bebas: satu batch embedding ke Ollama, lalu
+    satu query UNWIND per batch_size query. Hasil di-cache dengan key yang sama seperti
+    vector_search_chunks(mode="vector"); mengembalikan {query: records}."""
+    cache_keys = {q: (normalize_query(q), top_k, min_score, "vector") for q in queries}
+    results = {}
+    pending = {}
+    for query, key in cache_keys.items():
+        cached = search_result_cache.get(key)
+        if cached is not None:
+            results[query] = cached
+        else:
+            pending.setdefault(key, []).append(query)
+    if not pending:
+        return results
+
+    pending_keys = list(pending)
+    vectors = embed_queries_cached([pending[key][0] for key in pending_keys])
+    for start in range(0, len(pending_keys), batch_size):
+        part = pending_keys[start:start + batch_size]
+        records, _, _ = driver.execute_query(
+            CHUNK_VECTOR_BATCH_QUERY,
+            {"query_vectors": vectors[start:start + batch_size], "top_k": top_k}
+        )
+        hits = {key: [] for key in part}
+        for record in records:
+            row = record.data()
+            if row["score"] >= min_score:
+                hits[part[row.pop("query_index")]].append(row)
+        for key, rows in hits.items():
+            search_result_cache.put(key, rows)
+            for query in pending[key]:
+                results[query] = rows
+    return results
+
+
+def vector_search_chunks_batch(queries, top_k=5, min_score=0.6, mode=None, batch_size=64):
+    """Versi batch vector_search_chunks untuk evaluasi dan job offline.
+
+    Hasilnya sama dengan memanggil vector_search_chunks(q, top_k, min_score, mode) per
+    query, sesuai urutan input. Pertanyaan dengan referensi ayat tetap lewat jalur lookup
+    langsung. Untuk pertanyaan bebas, embedding dihitung dalam satu batch; pada mode
+    "vector" lookup index juga digabung, sedangkan hybrid/graph memakai embedding yang
+    sudah di-cache itu di pencarian per query.
+    """
+    mode = mode or SEARCH_MODE
+    _check_corpus_version()
+    index = get_surah_index() if VERSE_REF_FAST_PATH else None
+    free = [q for q in dict.fromkeys(queries) if index is None or not parse_verse_query(q, index).refs]
+
+    results = {}
+    if mode == "vector":
+        results = _vector_lookup_batch(free, top_k, min_score, batch_size)
+    elif free:
+        embed_queries_cached(free)
+    return [
+        list(results[q]) if q in results else vector_search_chunks(q, top_k=top_k, min_score=min_score, mode=mode)
+        for q in queries
+    ]
+
+
 def build_chunk_context(records):
-    context = ""
-    for r in records:
-        context += f"""
-📖 Surah: {r.get('surah')}
-Ayat {r.get('ayat_number')} | Sumber: {r.get('source')}
-➷ \"{r.get('chunk_text')}\"
-"""
-    return context
+    """Konteks per ayat tanpa duplikasi, dipangkas sesuai CONTEXT_TOKEN_BUDGET."""
+    context = build_context(records)
+    context.report()
+    return context.text
+
+
+def report_usage(usage):
+    # Jumlah token sebenarnya menurut API, untuk dibandingkan dengan perkiraan konteks
+    if usage:
+        print(f"🧾 Token Groq: prompt {usage.get('prompt_tokens')}, jawaban {usage.get('completion_tokens')}")
+
+NO_CONTEXT_ANSWER = "❌ Maaf, saya tidak menemukan potongan yang relevan untuk menjawab pertanyaan ini."
+API_ERROR_ANSWER = "⚠️ Gagal mendapatkan respons dari AI."
 
 def call_groq_api(prompt, api_key, model):
     try:
         response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+            GROQ_API_URL,
             headers={"Authorization": f"Bearer {api_key}"},
             json={
                 "model": model,
@@ -68,21 +395,58 @@ def call_groq_api(prompt, api_key, model):
             timeout=30
         )
         response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-        
+        payload = response.json()
+        report_usage(payload.get("usage"))
+        return payload["choices"][0]["message"]["content"]
+
     except Exception as e:
         print(f"❌ Groq API error: {str(e)}")
-        return "⚠️ Gagal mendapatkan respons dari AI."
+        return API_ERROR_ANSWER
 
-def process_query(query_text):
-    print(f"\n💬 Query: '{query_text}'")
-    records = vector_search_chunks(query_text, top_k=10, min_score=0.6)
+def call_groq_api_stream(prompt, api_key, model):
+    """Versi streaming call_groq_api: yield potongan teks jawaban begitu diterima (SSE)."""
+    yielded = False
+    try:
+        with requests.post(
+            GROQ_API_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.3,
+                "max_tokens": 2000,
+                "stream": True
+            },
+            timeout=30,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                # Format SSE: baris "data: {json}", diakhiri "data: [DONE]"
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                payload = json.loads(data)
+                # Groq menyertakan usage pada event terakhir (x_groq.usage)
+                report_usage((payload.get("x_groq") or {}).get("usage") or payload.get("usage"))
+                if not payload.get("choices"):
+                    continue
+                delta = payload["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yielded = True
+                    yield delta
 
-    if not records:
-        return "❌ Maaf, saya tidak menemukan potongan yang relevan untuk menjawab pertanyaan ini."
+    except Exception as e:
+        print(f"❌ Groq API error: {str(e)}")
+        # Sebelum ada token: sama persis dengan call_groq_api; di tengah stream: tambahkan peringatan
+        yield API_ERROR_ANSWER if not yielded else f"\n\n{API_ERROR_ANSWER}"
 
+def build_prompt(query_text, records):
     context = build_chunk_context(records)
-    prompt = f"""
+    return f"""
 **Instruksi Sistem**
 Berikan penjelasan tafsir berdasarkan potongan konten berikut:
 
@@ -94,7 +458,67 @@ Berikan penjelasan tafsir berdasarkan potongan konten berikut:
 Jika potongan konten tidak relevan dengan pertanyaan, mohon jawab bahwa Anda tidak dapat menjawab.
 """
 
-    return call_groq_api(prompt, GROQ_API_KEY, GROQ_MODEL)
+def lookup_answer(query_text, records):
+    """Cari jawaban tersimpan untuk pertanyaan serupa dengan chunk yang sama.
+
+    Mengembalikan (embedding query, jawaban atau None); embedding dipakai lagi saat menyimpan.
+    Pertanyaan yang menyebut ayat eksplisit dilewati: pencariannya tidak butuh embedding,
+    dan jawaban untuk ayat berbeda tidak boleh tertukar karena kalimatnya mirip.
+    """
+    if answer_cache is None:
+        return None, None
+    try:
+        if VERSE_REF_FAST_PATH and parse_verse_query(query_text, get_surah_index()).refs:
+            return None, None
+        vector = embed_query_cached(query_text)
+        return vector, answer_cache.get(vector, records)
+    except Exception:
+        print(f"❌ Cache jawaban error: {traceback.format_exc()}")
+        return None, None
+
+
+def store_answer(query_text, vector, records, answer):
+    # Jawaban gagal/terpotong tidak disimpan
+    if answer_cache is None or vector is None or not answer or API_ERROR_ANSWER in answer:
+        return
+    answer_cache.put(query_text, vector, records, answer)
+
+
+def process_query(query_text):
+    print(f"\n💬 Query: '{query_text}'")
+    records = vector_search_chunks(query_text, top_k=10, min_score=0.6)
+
+    if not records:
+        return NO_CONTEXT_ANSWER
+
+    vector, answer = lookup_answer(query_text, records)
+    if answer is not None:
+        return answer
+
+    answer = call_groq_api(build_prompt(query_text, records), GROQ_API_KEY, GROQ_MODEL)
+    store_answer(query_text, vector, records, answer)
+    return answer
+
+
+def process_query_stream(query_text):
+    """Seperti process_query, tetapi yield potongan jawaban secara bertahap."""
+    print(f"\n💬 Query: '{query_text}'")
+    records = vector_search_chunks(query_text, top_k=10, min_score=0.6)
+
+    if not records:
+        yield NO_CONTEXT_ANSWER
+        return
+
+    vector, answer = lookup_answer(query_text, records)
+    if answer is not None:
+        yield answer
+        return
+
+    parts = []
+    for token in call_groq_api_stream(build_prompt(query_text, records), GROQ_API_KEY, GROQ_MODEL):
+        parts.append(token)
+        yield token
+    store_answer(query_text, vector, records, "".join(parts))
 
 
 def main():
@@ -102,11 +526,17 @@ def main():
     while True:
         query = input("\n📅 Masukkan pertanyaan: ").strip()
         if query.lower() in ["exit", "keluar"]:
+            for name, stats in search_cache_stats().items():
+                print(f"🗄️ Cache {name}: hit rate {stats['hit_rate']:.1%} ({stats['hits']} hit, {stats['misses']} miss)")
             break
         if query:
-            answer = process_query(query)
+            stream = process_query_stream(query)
+            first = next(stream, "")
             print("\n🧐 Jawaban:")
-            print(answer)
+            print(first, end="", flush=True)
+            for token in stream:
+                print(token, end="", flush=True)
+            print()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+# semantic_chunker.py
+import numpy as np
+
+from config import (
+    CHUNKER,
+    CHUNK_TOKENIZER,
+    SEMANTIC_CHUNK_EMBEDDER,
+    SEMANTIC_CHUNK_MIN_TOKENS,
+    SEMANTIC_CHUNK_MAX_TOKENS,
+    SEMANTIC_BREAK_PERCENTILE,
+)
+from utils import chunk_text, load_token_counter, split_sentences
+
+
+def adjacent_similarities(matrix):
+    """Cosine antara setiap baris dan baris berikutnya: (n, d) → (n - 1,)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+    return np.einsum("ij,ij->i", matrix[:-1], matrix[1:])
+
+
+def chunk_starts(similarities, sizes, min_tokens, max_tokens, threshold):
+    """Indeks kalimat awal setiap chunk.
+
+    Chunk dipotong sebelum kalimat i jika similarity (i-1, i) di bawah threshold
+    dan chunk berjalan maupun sisa teks sudah mencapai min_tokens, atau jika
+    menambah kalimat i akan melewati max_tokens.
+    """
+    starts = [0]
+    current = sizes[0] if len(sizes) else 0
+    remaining = int(np.sum(sizes)) - current
+    for i in range(1, len(sizes)):
+        overflow = current + sizes[i] > max_tokens
+        drop = similarities[i - 1] < threshold and current >= min_tokens and remaining >= min_tokens
+        if overflow or drop:
+            starts.append(i)
+            current = 0
+        current += sizes[i]
+        remaining -= sizes[i]
+    return starts
+
+
+class WindowChunker:
+    """Chunk jendela tetap dengan overlap (utils.chunk_text), diukur dalam kata atau token tokenizer."""
+
+    def __init__(self, max_tokens=514, overlap=50, tokenizer=None):
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+        self.count_tokens = load_token_counter(tokenizer) if tokenizer else None
+
+    def signature(self):
+        # Tanpa tokenizer sama dengan format lama PIPELINE_SIGNATURE agar content_hash yang tersimpan tetap berlaku
+        base = f"{self.max_tokens}|{self.overlap}"
+        return f"{base}|{self.tokenizer}" if self.tokenizer else base
+
+    def split_many(self, texts):
+        return [
+            chunk_text(text, max_tokens=self.max_tokens, overlap=self.overlap, count_tokens=self.count_tokens)
+            for text in texts
+        ]
+
+
+class SemanticChunker:
+    """Chunk berdasarkan penurunan kemiripan antar kalimat yang berurutan.
+
+    Semua kalimat dari sekumpulan teks di-embed dalam satu panggilan batch,
+    lalu cosine antar kalimat bertetangga dihitung sekaligus dengan NumPy.
+    Teks dipotong di similarity yang berada di bawah persentil
+    `break_percentile` teks tersebut, dengan ukuran chunk (dalam kata) dijaga
+    di antara min_tokens dan max_tokens.
+    """
+
+    def __init__(self, embed_fn, embedder_name, min_tokens=SEMANTIC_CHUNK_MIN_TOKENS,
+                 max_tokens=SEMANTIC_CHUNK_MAX_TOKENS, break_percentile=SEMANTIC_BREAK_PERCENTILE):
+        self.embed_fn = embed_fn
+        self.embedder_name = embedder_name
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.break_percentile = break_percentile
+
+    def signature(self):
+        return f"semantic|{self.embedder_name}|{self.min_tokens}|{self.max_tokens}|{self.break_percentile}"
+
+    def sentences(self, text):
+        # Kalimat yang lebih panjang dari max_tokens dipecah per jendela kata
+        pieces = []
+        for sentence in split_sentences(text):
+            pieces.extend(chunk_text(sentence, max_tokens=self.max_tokens, overlap=0))
+        return pieces
+
+    def split_many(self, texts):
+        """Potong banyak teks sekaligus; hasilnya list chunk per teks sesuai urutan input."""
+        per_text = [self.sentences(text) for text in texts]
+        all_sentences = [s for sentences in per_text for s in sentences]
+        # Teks dengan satu kalimat tidak perlu di-embed
+        if not any(len(sentences) > 1 for sentences in per_text):
+            return [[" ".join(sentences)] if sentences else [] for sentences in per_text]
+
+        similarities = adjacent_similarities(self.embed_fn(all_sentences))
+        results = []
+        offset = 0
+        for sentences in per_text:
+            n = len(sentences)
+            if n <= 1:
+                results.append([" ".join(sentences)] if sentences else [])
+                offset += n
+                continue
+            # Similarity antar kalimat dalam teks ini saja (batas antar teks dilewati)
+            local = similarities[offset:offset + n - 1]
+            sizes = np.array([len(s.split()) for s in sentences])
+            threshold = np.percentile(local, self.break_percentile)
+            starts = chunk_starts(local, sizes, self.min_tokens, self.max_tokens, threshold)
+            results.append([" ".join(sentences[a:b]) for a, b in zip(starts, starts[1:] + [n])])
+            offset += n
+        return results
+
+    def split(self, text):
+        return self.split_many([text])[0]
+
+
+def load_embed_fn(name=SEMANTIC_CHUNK_EMBEDDER):
+    """Fungsi embed batch untuk chunker: "ollama" (groq_embedder) atau "fasttext".
+
+    Embedding kalimat hanya dipakai untuk mencari batas chunk, jadi tidak disimpan
+    di cache embedding bersama (yang dipakai ulang untuk chunk dan query).
+    """
+    if name == "ollama":
+        from groq_embedder import Embedder
+        return Embedder._embed_texts_uncached
+    if name == "fasttext":
+        from word2vec import FastTextEmbedder
+        embedder = FastTextEmbedder()
+        return lambda texts: [embedder.embed_text(text) for text in texts]
+    raise ValueError(f"❌ Embedder chunker tidak dikenal: {name}")
+
+
+def get_chunker(name=CHUNKER, max_tokens=514, overlap=50, tokenizer=CHUNK_TOKENIZER):
+    """Chunker sesuai config CHUNKER; max_tokens/overlap/tokenizer hanya dipakai chunker "window"."""
+    if name == "window":
+        return WindowChunker(max_tokens=max_tokens, overlap=overlap, tokenizer=tokenizer)
+    if name == "semantic":
+        return SemanticChunker(load_embed_fn(), SEMANTIC_CHUNK_EMBEDDER)
+    raise ValueError(f"❌ Chunker tidak dikenal: {name}")
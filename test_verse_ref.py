@@ -0,0 +1,41 @@
+# test_verse_ref.py
+import pytest
+
+from verse_ref import SurahNameIndex, parse_verse_query
+
+INDEX = SurahNameIndex([
+    (1, "Al-Fatihah", 7),
+    (2, "Al-Baqarah", 286),
+    (18, "Al-Kahf", 110),
+    (49, "Al-Hujurat", 18),
+])
+
+
+@pytest.mark.parametrize("query, refs", [
+    ("Jelaskan Al-Fatihah ayat 1", [(1, 1)]),
+    ("Al-Baqarah ayat ke-255", [(2, 255)]),
+    ("Jelaskan Al-Baqarah ayat 2 dan 255", [(2, 2), (2, 255)]),
+    ("Al-Baqarah ayat 1, 255", [(2, 1), (2, 255)]),
+    ("Al-Baqarah ayat 155 dan 156", [(2, 155), (2, 156)]),
+    ("Al-Baqarah ayat 1-3", [(2, 1), (2, 2), (2, 3)]),
+    ("Al-Baqarah ayat 1 sampai 3", [(2, 1), (2, 2), (2, 3)]),
+    ("Al-Baqarah ayat 1 s.d. 3", [(2, 1), (2, 2), (2, 3)]),
+    ("Al-Baqarah ayat 1, 4-5 dan 255", [(2, 1), (2, 4), (2, 5), (2, 255)]),
+    ("ayat 12 surat Al-Hujurat", [(49, 12)]),
+    ("Tafsir Al-Kahfi ayat 10", [(18, 10)]),
+    ("QS 2:255", [(2, 255)]),
+    ("Al-Fatihah ayat 9", []),
+    ("Apa hukum riba dalam Islam?", []),
+])
+def test_parse_verse_query(query, refs):
+    assert parse_verse_query(query, INDEX).refs == refs
+
+
+def test_parse_verse_query_caps_ranges():
+    refs = parse_verse_query("Al-Baqarah ayat 1-100", INDEX).refs
+    assert refs == [(2, a) for a in range(1, 21)]
+
+
+def test_parse_verse_query_keeps_free_text():
+    query = parse_verse_query("Al-Baqarah ayat 2 dan 255 tentang orang bertakwa", INDEX)
+    assert query.remainder == "tentang orang bertakwa"
@@ -1,13 +1,93 @@
 # utils.py
-def chunk_text(text, max_tokens=514, overlap=50):
-    words = text.split()
-    chunks = []
-    start = 0
-
-    while start < len(words):
-        end = min(start + max_tokens, len(words))
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start += max_tokens - overlap
-
-    return chunks
+import re
+from collections import deque
+from itertools import islice
+
+WORD_PATTERN = re.compile(r"\S+")
+
+
+def iter_word_tokens(text, count_tokens=None, block_size=514):
+    """(start, end, jumlah token) setiap kata dalam teks.
+
+    Dengan count_tokens (fungsi list kata → list jumlah token, lihat load_token_counter)
+    kata dihitung per blok block_size kata, yaitu satu panggilan tokenizer per
+    jendela, bukan satu panggilan per kata.
+    """
+    words = WORD_PATTERN.finditer(text)
+    if count_tokens is None:
+        for match in words:
+            yield match.start(), match.end(), 1
+        return
+    while True:
+        block = list(islice(words, block_size))
+        if not block:
+            return
+        for match, tokens in zip(block, count_tokens([m.group() for m in block])):
+            yield match.start(), match.end(), tokens
+
+
+def iter_chunk_spans(text, max_tokens=514, overlap=50, count_tokens=None):
+    """Hasilkan offset karakter (start, end) setiap jendela chunk secara streaming.
+
+    Teks dipindai kata demi kata tanpa membangun list kata atau string chunk;
+    yang disimpan hanya offset kata di jendela berjalan. Ukuran jendela dihitung
+    dalam kata, atau dalam token tokenizer jika count_tokens diberikan (lihat
+    iter_word_tokens). Jendela berikutnya mengulang kata terakhir sampai `overlap`
+    token. Jendela ekor di akhir teks dihasilkan persis seperti chunk_text lama.
+    """
+    window = deque()  # (start, end, token) setiap kata di jendela berjalan
+    size = 0
+    step = max(1, max_tokens - overlap)
+    fresh = False  # Jendela berisi kata yang belum pernah dihasilkan
+
+    def trim(incoming):
+        # Geser jendela minimal `step` token dan sampai kata baru muat
+        nonlocal size
+        dropped = 0
+        while window and (dropped < step or size + incoming > max_tokens):
+            tokens = window.popleft()[2]
+            size -= tokens
+            dropped += tokens
+
+    # Satu jendela memuat paling banyak max_tokens kata (setiap kata minimal satu token)
+    for start, end, tokens in iter_word_tokens(text, count_tokens, block_size=max(1, max_tokens)):
+        if window and size + tokens > max_tokens:
+            if fresh:
+                yield window[0][0], window[-1][1]
+            trim(tokens)
+        window.append((start, end, tokens))
+        size += tokens
+        fresh = True
+        if size >= max_tokens:
+            yield window[0][0], window[-1][1]
+            fresh = False
+            trim(0)
+
+    while window:
+        yield window[0][0], window[-1][1]
+        trim(0)
+
+
+def span_text(text, start, end):
+    """Teks satu jendela dengan spasi dinormalisasi (sama dengan chunk_text)."""
+    return " ".join(text[start:end].split())
+
+
+def chunk_text(text, max_tokens=514, overlap=50, count_tokens=None):
+    return [span_text(text, start, end) for start, end in iter_chunk_spans(text, max_tokens, overlap, count_tokens)]
+
+
+def load_token_counter(name):
+    """Fungsi list kata → jumlah token tiap kata dari tokenizer Hugging Face `name`.
+
+    Seluruh list ditokenisasi dalam satu panggilan batch (butuh paket transformers).
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    return lambda words: [len(ids) for ids in tokenizer(words, add_special_tokens=False)["input_ids"]]
+
+
+def split_sentences(text):
+    """Pecah teks menjadi kalimat berdasarkan tanda akhir kalimat (. ! ?) diikuti spasi."""
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
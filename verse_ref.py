@@ -0,0 +1,225 @@
+# verse_ref.py
+import re
+
+from hybrid import STOPWORDS
+
+ARTICLES = ("al", "an", "ar", "as", "asy", "ash", "at", "ad", "adz", "az")
+CONNECTORS = {"surat", "surah", "qs", "q.s.", "dari", "pada", "di", "dalam"}
+MAX_RANGE = 20  # Batas jumlah ayat dalam satu rentang agar lookup tetap kecil
+# Ejaan lain yang lazim di Indonesia untuk name_latin tertentu (key = compact_name)
+NAME_ALIASES = {
+    "alkahf": ("Al-Kahfi",),
+}
+
+# Hanya pemisah ini yang membentuk rentang; "dan" dan "," memisahkan daftar ayat tunggal
+RANGE_SEPARATOR = r"(?:-|–|—|s\.?d\.?|s/d|sampai|hingga)"
+AYAT_ITEM = rf"(?:ke\s*-?\s*)?\d{{1,3}}(?:\s*{RANGE_SEPARATOR}\s*(?:ke\s*-?\s*)?\d{{1,3}})?"
+# "ayat 255", "ayat ke-255", "ayat 1-5", "ayat 1 sampai 5", "ayat 155 dan 156", "ayat 1, 5-7 dan 255"
+AYAT_PATTERN = re.compile(
+    rf"\b(?:ayat|ayah|ay\.)\s*({AYAT_ITEM}(?:\s*(?:,\s*dan\b|,|\bdan\b)\s*{AYAT_ITEM})*)",
+    re.IGNORECASE,
+)
+# Satu butir dalam daftar AYAT_PATTERN: nomor tunggal atau rentang
+AYAT_ITEM_PATTERN = re.compile(
+    rf"(\d{{1,3}})(?:\s*{RANGE_SEPARATOR}\s*(?:ke\s*-?\s*)?(\d{{1,3}}))?", re.IGNORECASE
+)
+# "Al-Baqarah:255", "QS 2:255", "2:255-257"
+COLON_PATTERN = re.compile(r"([\w'’‘\-]+)\s*:\s*(\d{1,3})(?:\s*-\s*(\d{1,3}))?")
+
+
+def compact_name(name):
+    """Samakan varian penulisan nama surah: huruf kecil, tanpa apostrof/tanda hubung/spasi."""
+    name = str(name).lower().replace("’", "'").replace("‘", "'").replace("`", "'")
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def name_variants(name_latin):
+    """Varian key untuk satu nama surah (Al-Baqarah → albaqarah, baqarah, albaqara, ...)."""
+    base = compact_name(name_latin)
+    variants = {base}
+    # Tanpa artikel di depan ("Al-Baqarah" → "baqarah"), hanya jika ditulis dengan tanda hubung
+    head = re.split(r"[-\s]", str(name_latin).lower(), maxsplit=1)
+    if len(head) == 2 and head[0] in ARTICLES:
+        variants.add(compact_name(head[1]))
+    # Akhiran -h sering dihilangkan (Al-Fatihah / Al-Fatiha)
+    variants |= {v[:-1] for v in variants if v.endswith("h") and len(v) > 4}
+    return variants
+
+
+SURAH_NAMES_QUERY = """
+MATCH (s:Surah)
+RETURN s.number AS number, s.name_latin AS name_latin, s.number_of_ayah AS number_of_ayah
+"""
+
+
+class SurahNameIndex:
+    """Tabel nama surah → nomor, dibangun sekali dari node Surah."""
+
+    def __init__(self, rows):
+        self.by_key = {}
+        self.ayat_counts = {}  # Juga dipakai untuk nomor surah yang ditulis sebagai angka ("2:255")
+        ambiguous = set()
+        for number, name_latin, number_of_ayah in rows:
+            self.ayat_counts[number] = number_of_ayah
+            keys = set(name_variants(name_latin))
+            for alias in NAME_ALIASES.get(compact_name(name_latin), ()):
+                keys |= name_variants(alias)
+            for key in keys:
+                if key in self.by_key and self.by_key[key] != number:
+                    ambiguous.add(key)
+                self.by_key[key] = number
+        for key in ambiguous:
+            del self.by_key[key]
+
+    @classmethod
+    def from_records(cls, records):
+        return cls([(r["number"], r["name_latin"], r["number_of_ayah"]) for r in records])
+
+    @classmethod
+    def load(cls, driver):
+        records, _, _ = driver.execute_query(SURAH_NAMES_QUERY)
+        return cls.from_records(records)
+
+    def by_name_or_number(self, text):
+        if text.isdigit():
+            return int(text) if int(text) in self.ayat_counts else None
+        return self.by_key.get(compact_name(text))
+
+    def lookup(self, tokens):
+        """Nomor surah untuk rangkaian token (teks, awal, akhir) jika cocok dengan sebuah nama."""
+        return self.by_key.get(compact_name("".join(t[0] for t in tokens)))
+
+    def resolve_before(self, tokens):
+        """Cari nama surah tepat sebelum nomor ayat; coba jendela 1–4 token terdekat."""
+        tokens = [t for t in tokens if t[0].lower() not in CONNECTORS]
+        for size in range(1, min(4, len(tokens)) + 1):
+            number = self.lookup(tokens[-size:])
+            if number:
+                return number, tokens[-size][1]
+        return None, None
+
+    def resolve_after(self, tokens):
+        """Bentuk "ayat 255 surat Al-Baqarah": nama surah setelah nomor ayat."""
+        tokens = [t for t in tokens[:6] if t[0].lower().strip("?,.!") not in CONNECTORS]
+        for size in range(1, min(4, len(tokens)) + 1):
+            number = self.lookup(tokens[:size])
+            if number:
+                return number, tokens[size - 1][2]
+        return None, None
+
+
+class VerseQuery:
+    def __init__(self, refs, remainder):
+        self.refs = refs  # [(nomor surah, nomor ayat), ...] tanpa duplikat
+        self.remainder = remainder  # Sisa pertanyaan setelah referensi dihapus
+
+    def has_free_text(self):
+        words = [w for w in re.findall(r"\w+", self.remainder.lower()) if w not in STOPWORDS]
+        return len(words) >= 2
+
+
+def _ayat_numbers(start, end):
+    start = int(start)
+    end = int(end) if end else start
+    if end < start:
+        start, end = end, start
+    return list(range(start, min(end, start + MAX_RANGE - 1) + 1))
+
+
+def parse_verse_query(query_text, index):
+    """Temukan referensi surah/ayat eksplisit dalam pertanyaan."""
+    tokens = [(m.group(), m.start(), m.end()) for m in re.finditer(r"\S+", query_text)]
+    refs = []
+    spans = []
+
+    for match in AYAT_PATTERN.finditer(query_text):
+        number, name_start = index.resolve_before([t for t in tokens if t[2] <= match.start()])
+        if number:
+            spans.append((name_start, match.end()))
+        else:
+            number, name_end = index.resolve_after([t for t in tokens if t[1] >= match.end()])
+            if not number:
+                continue
+            spans.append((match.start(), name_end))
+        for item in AYAT_ITEM_PATTERN.finditer(match.group(1)):
+            refs += [(number, a) for a in _ayat_numbers(item.group(1), item.group(2))]
+
+    for match in COLON_PATTERN.finditer(query_text):
+        number = index.by_name_or_number(match.group(1))
+        if number:
+            spans.append((match.start(), match.end()))
+            refs += [(number, a) for a in _ayat_numbers(match.group(2), match.group(3))]
+
+    # Buang ayat di luar jumlah ayat surahnya dan duplikat
+    refs = [
+        (s, a) for s, a in dict.fromkeys(refs)
+        if 1 <= a <= (index.ayat_counts.get(s) or a)
+    ]
+
+    remainder = query_text
+    for start, end in sorted(spans, reverse=True):
+        remainder = remainder[:start] + " " + remainder[end:]
+    return VerseQuery(refs, " ".join(remainder.split()))
+
+
+REFERENCE_CHUNK_QUERY = """
+UNWIND range(0, size($refs) - 1) AS i
+WITH i, $refs[i] AS ref
+MATCH (c:Chunk)
+WHERE c.surah_number = ref.surah AND c.ayat_number = ref.ayat
+RETURN c.text AS chunk_text,
+       c.source AS source,
+       c.ayat_number AS ayat_number,
+       c.surah_name AS surah,
+       c.surah_number AS surah_number,
+       c.id AS chunk_id,
+       i AS ref_index,
+       1.0 AS score
+"""
+
+# Urutan sumber per ayat: terjemahan dan tafsir lebih berguna sebagai konteks daripada teks Arab
+SOURCE_ORDER = {"translation": 0, "tafsir": 1, "text": 2}
+
+
+def order_reference_records(records):
+    """Urutkan chunk per ayat (terjemahan, tafsir, teks), lalu round-robin antar ayat
+    supaya pemotongan top_k tetap mencakup semua ayat yang diminta."""
+    per_ref = {}
+    for r in records:
+        row = r if isinstance(r, dict) else r.data()
+        per_ref.setdefault(row.pop("ref_index"), []).append(row)
+    for rows in per_ref.values():
+        rows.sort(key=lambda r: SOURCE_ORDER.get(r["source"], len(SOURCE_ORDER)))
+
+    ordered = []
+    depth = max((len(rows) for rows in per_ref.values()), default=0)
+    for position in range(depth):
+        for i in sorted(per_ref):
+            if position < len(per_ref[i]):
+                ordered.append(per_ref[i][position])
+    return ordered
+
+
+def reference_params(refs):
+    return {"refs": [{"surah": s, "ayat": a} for s, a in refs]}
+
+
+def fetch_reference_chunks(driver, refs):
+    """Ambil chunk untuk setiap (surah, ayat) lewat index Chunk(surah_number, ayat_number)."""
+    if not refs:
+        return []
+    records, _, _ = driver.execute_query(REFERENCE_CHUNK_QUERY, reference_params(refs))
+    return order_reference_records(records)
+
+
+def merge_with_remainder(ref_records, remainder_records, top_k):
+    """Chunk referensi lebih dulu; sisa slot diisi hasil pencarian bagian bebas pertanyaan.
+
+    Jika ada teks bebas, paling sedikit separuh slot disediakan untuk hasilnya.
+    """
+    extra = [r if isinstance(r, dict) else r.data() for r in remainder_records]
+    seen = {r["chunk_id"] for r in ref_records}
+    extra = [r for r in extra if r["chunk_id"] not in seen]
+    ref_limit = top_k - min(len(extra), top_k // 2)
+    merged = ref_records[:ref_limit]
+    return merged + extra[:top_k - len(merged)]